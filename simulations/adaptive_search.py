@@ -0,0 +1,83 @@
+import numpy as np
+
+def _bisect_edges(constraints, a, lo, hi, column, pass_lo, tol):
+    """
+    Batched bisection of constraint edges.
+    Each bracket (a[i], lo[i], hi[i]) has opposite signs of the slack
+    column[i] at its ends (pass_lo[i]: met at lo). All brackets are refined
+    together until hi - lo <= tol, each on its own constraint only.
+    Returns the refined (lo, hi) and the number of evaluations spent.
+    """
+    lo = lo.copy()
+    hi = hi.copy()
+    n_evals = 0
+    while len(lo) and np.max(hi - lo) > tol:
+        active = (hi - lo) > tol
+        mid = 0.5 * (lo[active] + hi[active])
+        slack = constraints(a[active], mid)
+        pass_mid = slack[np.arange(len(mid)), column[active]] >= 0
+        n_evals += len(mid)
+
+        same_as_lo = pass_mid == pass_lo[active]
+        idx = np.flatnonzero(active)
+        lo[idx[same_as_lo]] = mid[same_as_lo]
+        hi[idx[~same_as_lo]] = mid[~same_as_lo]
+    return lo, hi, n_evals
+
+def feasible_K_intervals(constraints, a_values, K_min, K_max, tol=0.1, n_coarse=26):
+    """
+    Coarse-to-fine search for the feasible gain intervals of each lag pole a.
+
+    constraints(a, K): vectorized, returns the (n, m) slack matrix of the m
+    specs (>= 0: met; NaN counts as not met); a point is feasible when every
+    slack is >= 0.
+    A coarse uniform grid in K brackets every sign change of each slack
+    separately, and each bracket is bisected on its own constraint down to
+    tol. The feasible set is then read on the coarse points plus both ends
+    of every refined edge, so an interval narrower than the coarse spacing
+    is found as long as each constraint changes sign at most once between
+    neighbouring coarse points (true for the metrics monotone in K: Kv,
+    overshoot, margins).
+
+    Returns (intervals, n_evals): intervals maps a -> list of (K_lo, K_hi),
+    the bounds being feasible points within tol of the true edge.
+    """
+    a_values = np.asarray(a_values, dtype=float)
+    K_coarse = np.linspace(K_min, K_max, n_coarse)
+
+    a_grid, K_grid = np.meshgrid(a_values, K_coarse, indexing='ij')
+    slack = constraints(a_grid.ravel(), K_grid.ravel())
+    met = (slack >= 0).reshape(a_grid.shape + (slack.shape[1],))
+    n_evals = a_grid.size
+
+    # Brackets where one constraint flips between neighbouring coarse points
+    ia, ik, ic = np.nonzero(met[:, 1:] != met[:, :-1])
+    lo, hi, n_bisect = _bisect_edges(constraints, a_values[ia], K_coarse[ik], K_coarse[ik + 1],
+                                     ic, met[ia, ik, ic], tol)
+    n_evals += n_bisect
+
+    # Feasibility on the coarse grid and on both sides of every edge
+    edge_a = np.concatenate([ia, ia])
+    edge_K = np.concatenate([lo, hi])
+    edge_ok = np.all(constraints(a_values[edge_a], edge_K) >= 0, axis=1)
+    n_evals += len(edge_K)
+    point_a = np.concatenate([np.repeat(np.arange(len(a_values)), n_coarse), edge_a])
+    point_K = np.concatenate([K_grid.ravel(), edge_K])
+    point_ok = np.concatenate([met.all(axis=2).ravel(), edge_ok])
+
+    intervals = {}
+    for i, a in enumerate(a_values):
+        sel = point_a == i
+        order = np.argsort(point_K[sel], kind='stable')
+        Ks, ok = point_K[sel][order], point_ok[sel][order]
+        # Runs of consecutive feasible points
+        found = []
+        start = None
+        for j in range(len(Ks)):
+            if ok[j] and start is None:
+                start = Ks[j]
+            if start is not None and (j == len(Ks) - 1 or not ok[j + 1]):
+                found.append((start, Ks[j]))
+                start = None
+        intervals[a] = found
+    return intervals, n_evals
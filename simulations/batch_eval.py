@@ -0,0 +1,169 @@
+import numpy as np
+from scipy.linalg import expm
+from step_metrics import step_metrics
+
+# Dierson's search plant: G(s) = 849 / (s * (s + 13.2) * (s + 950))
+NUM_G = np.array([849.0])
+DEN_G = np.array([1.0, 13.2 + 950.0, 13.2 * 950.0, 0.0])
+
+def poly_mul(p, q):
+    """
+    Batched polynomial product.
+    p: (batch, m) and q: (batch, n) coefficient arrays (highest power first),
+    broadcast against each other. Returns (batch, m + n - 1).
+    """
+    p = np.atleast_2d(p)
+    q = np.atleast_2d(q)
+    batch = np.broadcast_shapes(p.shape[:-1], q.shape[:-1])
+    m, n = p.shape[-1], q.shape[-1]
+    out = np.zeros(batch + (m + n - 1,))
+    # Loop over the (short) degree of p only, never over the batch
+    for i in range(m):
+        out[..., i:i + n] += p[..., i:i + 1] * q
+    return out
+
+def poly_add(p, q):
+    """
+    Batched polynomial sum, right-aligned so that constant terms match.
+    """
+    p = np.atleast_2d(p)
+    q = np.atleast_2d(q)
+    n = max(p.shape[-1], q.shape[-1])
+    p = np.concatenate([np.zeros(p.shape[:-1] + (n - p.shape[-1],)), p], axis=-1)
+    q = np.concatenate([np.zeros(q.shape[:-1] + (n - q.shape[-1],)), q], axis=-1)
+    return p + q
+
+def lag_open_loop(a, b, K, num_G=NUM_G, den_G=DEN_G):
+    """
+    Open-loop polynomials of L = K*C*G with C(s) = (s+b)/(s+a), for arrays
+    of (a, b, K) of equal length. Returns (num_open, den_open), (batch, m).
+    """
+    a, b, K = np.broadcast_arrays(np.atleast_1d(np.asarray(a, dtype=float)),
+                                  np.atleast_1d(np.asarray(b, dtype=float)),
+                                  np.atleast_1d(np.asarray(K, dtype=float)))
+    ones = np.ones_like(a)
+    num_C = np.stack([ones, b], axis=-1)
+    den_C = np.stack([ones, a], axis=-1)
+
+    num_open = K[:, None] * poly_mul(num_G[None, :], num_C)
+    den_open = poly_mul(den_G[None, :], den_C)
+    return num_open, den_open
+
+def lag_closed_loop(a, b, K, num_G=NUM_G, den_G=DEN_G):
+    """
+    Closed-loop polynomials of T = K*C*G / (1 + K*C*G) with C(s) = (s+b)/(s+a),
+    for arrays of (a, b, K) of equal length.
+    Characteristic polynomial: den_G*den_C + K*num_G*num_C
+    Returns (num_cl, den_cl), both (batch, n+1) with den_cl monic.
+    """
+    num_open, den_open = lag_open_loop(a, b, K, num_G, den_G)
+    den_cl = poly_add(den_open, num_open)
+    num_cl = poly_add(np.zeros_like(den_cl), num_open)
+
+    lead = den_cl[:, :1]
+    return num_cl / lead, den_cl / lead
+
+def companion_ss(num_cl, den_cl):
+    """
+    Controllable canonical realization for a batch of strictly proper
+    transfer functions (monic denominators, same order).
+    Returns A (batch, n, n), B (n,), C (batch, n).
+    """
+    n = den_cl.shape[-1] - 1
+    batch = den_cl.shape[0]
+    A = np.zeros((batch, n, n))
+    A[:, np.arange(n - 1), np.arange(1, n)] = 1.0
+    A[:, -1, :] = -den_cl[:, :0:-1]
+    B = np.zeros(n)
+    B[-1] = 1.0
+    # Numerator coefficients in ascending powers (b0, b1, ..., b_{n-1})
+    C = num_cl[:, :0:-1].copy()
+    return A, B, C
+
+def batch_step_response(num_cl, den_cl, t):
+    """
+    Unit step responses of a batch of closed loops on a uniform time grid.
+    Uses the exact zero-order-hold discretization (the step is constant, so
+    it is exact at the samples). Returns y with shape (batch, len(t)).
+    """
+    t = np.asarray(t, dtype=float)
+    dt = t[1] - t[0]
+    A, B, C = companion_ss(num_cl, den_cl)
+    batch, n, _ = A.shape
+
+    # expm([[A, B], [0, 0]] * dt) = [[Ad, Bd], [0, I]]
+    M = np.zeros((batch, n + 1, n + 1))
+    M[:, :n, :n] = A * dt
+    M[:, :n, n] = B * dt
+    Phi = expm(M)
+    Ad = Phi[:, :n, :n]
+    Bd = Phi[:, :n, n]
+
+    # Batch on the last axis keeps every per-step operation contiguous
+    Ad = np.ascontiguousarray(Ad.transpose(1, 2, 0))
+    Bd = np.ascontiguousarray(Bd.T)
+    C = np.ascontiguousarray(C.T)
+    y = np.empty((len(t), batch))
+    x = np.zeros((n, batch))
+    for k in range(len(t)):
+        y[k] = np.einsum('ib,ib->b', C, x)
+        x = np.einsum('ijb,jb->ib', Ad, x) + Bd
+    return y.T
+
+def evaluate_lag_grid(a, b, K, t=None, keep_y=False, chunk_size=2048, method='zoh'):
+    """
+    Step responses and metrics for a whole (a, b, K) grid at once.
+    The grid is simulated in chunks so that memory stays bounded for very
+    large sweeps; the responses themselves are only kept if keep_y=True.
+    method='zoh' propagates the exact discretization on a uniform grid;
+    method='residue' evaluates the closed-form sum of exponentials
+    (residue_sim.py), which also accepts non-uniform time points.
+    t='auto' plans one (possibly non-uniform) grid for the whole grid of
+    candidates from their closed-loop modes (time_grid.py); it implies
+    method='residue'.
+    Returns a dict with t, the metric arrays Mp, ts, ess, Kv, er_ramp
+    and, optionally, y with shape (batch, len(t)).
+    """
+    if method not in ('zoh', 'residue'):
+        raise ValueError(f"method must be 'zoh' or 'residue', not {method!r}")
+    a, b, K = np.broadcast_arrays(np.atleast_1d(np.asarray(a, dtype=float)),
+                                  np.atleast_1d(np.asarray(b, dtype=float)),
+                                  np.atleast_1d(np.asarray(K, dtype=float)))
+    if t is None:
+        t = np.linspace(0, 3, 1501)
+    elif isinstance(t, str) and t == 'auto':
+        # Local imports: both modules build on this one
+        from residue_sim import input_residues
+        from time_grid import plan_time_grid
+        t = plan_time_grid(*input_residues(*lag_closed_loop(a, b, K)))
+        method = 'residue'
+    t = np.asarray(t, dtype=float)
+    n_total = len(a)
+
+    Mp = np.empty(n_total)
+    ts = np.empty(n_total)
+    ess = np.empty(n_total)
+    y_all = np.empty((n_total, len(t))) if keep_y else None
+
+    for start in range(0, n_total, chunk_size):
+        sl = slice(start, start + chunk_size)
+        num_cl, den_cl = lag_closed_loop(a[sl], b[sl], K[sl])
+        if method == 'residue':
+            from residue_sim import residue_response
+            y = residue_response(num_cl, den_cl, t, 'step')
+        else:
+            y = batch_step_response(num_cl, den_cl, t)
+        m = step_metrics(t, y, reference=1.0)
+        Mp[sl], ts[sl], ess[sl] = m["Mp"], m["ts"], m["ess"]
+        if keep_y:
+            y_all[sl] = y
+
+    # Type 1 loop: Kv = lim s->0 s*K*C(s)*G(s) = K * (b/a) * num_G / (am*ae)
+    Kv = K * (b / a) * NUM_G[-1] / DEN_G[-2]
+    with np.errstate(divide='ignore'):
+        er_ramp = np.where(Kv > 0, 1 / Kv, np.inf)
+
+    result = {"t": t, "Mp": Mp, "ts": ts, "ess": ess, "Kv": Kv, "er_ramp": er_ramp}
+    if keep_y:
+        result["y"] = y_all
+    return result
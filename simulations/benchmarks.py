@@ -0,0 +1,265 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import contextlib
+import io
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import control as ct
+from model import ASSETS_ENV
+
+# Benchmark cases: name -> setup function. setup() does the untimed work
+# (designs, data bundles) and returns the zero-argument callable that is
+# timed. Every repeat starts from empty memo caches, so it measures the
+# computation and not a cache lookup.
+# Baselines are JSON files written by "run --save" and checked with
+# "compare" (or "run --compare"): a case regresses when its median time
+# exceeds the baseline median by more than the threshold.
+
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.10
+BENCH_VERSION = 1
+
+def _quiet():
+    """
+    Silences the progress prints of the simulation modules.
+    """
+    return contextlib.redirect_stdout(io.StringIO())
+
+def clear_caches():
+    """
+    Empties every memo cache of the simulation modules.
+    """
+    import zoh_sim
+    import freq_response
+    import root_locus
+    zoh_sim.clear_discretization_cache()
+    freq_response.clear_cache()
+    root_locus.clear_cache()
+
+def _plant():
+    s = ct.TransferFunction.s
+    return 1.2 / (s * (s + 13.2) * (s + 950))
+
+def _controllers():
+    """
+    The designed controllers of controllers.py (name -> C(s)), from their
+    compute_* phase.
+    """
+    import controllers
+    sys = _plant()
+    with _quiet():
+        return {
+            "P": ct.tf(controllers.compute_p_controller(sys)["Kp"], 1),
+            "Lag": controllers.compute_lag_controller(sys)["ctrl"],
+            "Lead": controllers.compute_lead_controller(sys)["ctrl"],
+            "LeadLag": controllers.compute_lead_lag_controller(sys)["ctrl"],
+            "PID": controllers.compute_pid_controller(sys)["ctrl"],
+        }
+
+def _step_case(name):
+    def setup():
+        import zoh_sim
+        sys_cl = ct.feedback(_controllers()[name] * _plant(), 1)
+        t = np.linspace(0, 3, 1000)
+        return lambda: zoh_sim.step_response(sys_cl, t)
+    return setup
+
+def _lag_sweep():
+    import dierson_search
+
+    def run():
+        with _quiet():
+            dierson_search.run_search(dierson_search.a_values, dierson_search.K_values, workers=1)
+    return run
+
+def _monte_carlo():
+    import monte_carlo
+    ctrl = _controllers()["LeadLag"]
+    return lambda: monte_carlo.monte_carlo_robustness(ctrl, n_samples=5000, seed=0)
+
+def _robustness_scenarios():
+    import controllers
+    loops = _controllers()
+    loops = {name: loops[name] for name in ("P", "LeadLag", "PID")}
+
+    def run():
+        with _quiet():
+            controllers.compute_robustness(loops)
+    return run
+
+def _frequency_response():
+    import freq_response
+    sys = _plant()
+    loops = [ctrl * sys for ctrl in _controllers().values()]
+
+    def run():
+        freq_response.responses(loops, 1j * freq_response.OMEGA)
+        for L in loops:
+            freq_response.margins(L)
+            freq_response.nyquist(L)
+    return run
+
+def _render_case(mode):
+    def setup():
+        import controllers
+        sys = _plant()
+        with _quiet():
+            bundle = {"p": controllers.compute_p_controller(sys),
+                      "lead_lag": controllers.compute_lead_lag_controller(sys)}
+
+        def run():
+            with tempfile.TemporaryDirectory() as tmp, matplotlib.rc_context():
+                os.environ[ASSETS_ENV] = tmp
+                try:
+                    controllers.render_p_controller(bundle["p"], mode)
+                    controllers.render_lead_lag_controller(bundle["lead_lag"], mode)
+                finally:
+                    del os.environ[ASSETS_ENV]
+                    plt.close('all')
+        return run
+    return setup
+
+CASES = {
+    "step_P": _step_case("P"),
+    "step_Lag": _step_case("Lag"),
+    "step_Lead": _step_case("Lead"),
+    "step_LeadLag": _step_case("LeadLag"),
+    "step_PID": _step_case("PID"),
+    "lag_sweep": _lag_sweep,
+    "robustness_monte_carlo": _monte_carlo,
+    "robustness_scenarios": _robustness_scenarios,
+    "frequency_response": _frequency_response,
+    "render_dark": _render_case('dark'),
+    "render_light": _render_case('light'),
+}
+
+def time_case(setup, repeat=DEFAULT_REPEAT, warmup=1):
+    """
+    Times one case: warmup untimed calls (imports, first-call overheads),
+    then repeat timed calls, each after clear_caches().
+    Returns the list of wall times (s).
+    """
+    fn = setup()
+    times = []
+    for i in range(warmup + repeat):
+        clear_caches()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            times.append(elapsed)
+    return times
+
+def environment():
+    """
+    Machine and library versions recorded with every result.
+    """
+    import scipy
+    return {"python": platform.python_version(), "numpy": np.__version__, "scipy": scipy.__version__,
+            "control": ct.__version__, "matplotlib": matplotlib.__version__,
+            "platform": platform.platform(), "cpu_count": os.cpu_count()}
+
+def run_benchmarks(names=None, repeat=DEFAULT_REPEAT, progress=True):
+    """
+    Runs the selected cases (default all, in CASES order).
+    Returns the result dict saved as a baseline: version, date, environment
+    and cases (name -> min, median, mean, std and all times, in seconds).
+    """
+    names = list(CASES) if not names else names
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        raise ValueError(f"unknown benchmark cases: {', '.join(unknown)} (available: {', '.join(CASES)})")
+    cases = {}
+    for name in names:
+        times = time_case(CASES[name], repeat)
+        cases[name] = {"min": min(times), "median": float(np.median(times)), "mean": float(np.mean(times)),
+                       "std": float(np.std(times)), "times": times}
+        if progress:
+            print(f"  {name:<24} {1e3 * cases[name]['median']:10.2f} ms (mín {1e3 * cases[name]['min']:.2f} ms)")
+    return {"version": BENCH_VERSION, "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "environment": environment(), "repeat": repeat, "cases": cases}
+
+def save_results(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Median time of every case present in both results, current/baseline.
+    Returns a list of (name, base_s, current_s, ratio, status), status one of
+    'regressão' (ratio > 1 + threshold), 'melhoria' (ratio < 1 - threshold)
+    or 'ok'.
+    """
+    rows = []
+    for name, case in current["cases"].items():
+        if name not in baseline["cases"]:
+            continue
+        base, now = baseline["cases"][name]["median"], case["median"]
+        ratio = now / base if base > 0 else np.inf
+        status = 'regressão' if ratio > 1 + threshold else 'melhoria' if ratio < 1 - threshold else 'ok'
+        rows.append((name, base, now, ratio, status))
+    return rows
+
+def print_comparison(rows, threshold=DEFAULT_THRESHOLD):
+    """
+    Text table of compare(); returns the number of regressions.
+    """
+    print(f"\n{'caso':<24} {'base (ms)':>11} {'atual (ms)':>11} {'razão':>7}  (limiar {100 * threshold:.0f}%)")
+    for name, base, now, ratio, status in rows:
+        flag = '  <-- REGRESSÃO' if status == 'regressão' else '  (melhoria)' if status == 'melhoria' else ''
+        print(f"{name:<24} {1e3 * base:11.2f} {1e3 * now:11.2f} {ratio:7.2f}{flag}")
+    n_regressions = sum(status == 'regressão' for *_, status in rows)
+    print(f"\nRegressões: {n_regressions} de {len(rows)} casos")
+    return n_regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks das simulações, da busca e da renderização")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="executa os casos")
+    run_parser.add_argument("cases", nargs="*", help=f"casos (padrão: todos): {', '.join(CASES)}")
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                            help="repetições cronometradas por caso")
+    run_parser.add_argument("--save", default=None,
+                            help="grava o resultado em JSON (linha de base)")
+    run_parser.add_argument("--compare", default=None,
+                            help="compara com uma linha de base JSON")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                            help="aumento relativo da mediana considerado regressão")
+
+    compare_parser = commands.add_parser("compare", help="compara dois resultados JSON")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="aumento relativo da mediana considerado regressão")
+
+    commands.add_parser("list", help="lista os casos")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        print("\n".join(CASES))
+        sys.exit(0)
+    if args.command == "compare":
+        current = load_results(args.current)
+        baseline = load_results(args.baseline)
+    else:
+        print(f"Benchmarks ({args.repeat} repetições por caso, mediana):")
+        current = run_benchmarks(args.cases, args.repeat)
+        if args.save:
+            save_results(current, args.save)
+            print(f"Resultado gravado em {args.save}")
+        if not args.compare:
+            sys.exit(0)
+        baseline = load_results(args.compare)
+    sys.exit(1 if print_comparison(compare(baseline, current, args.threshold), args.threshold) else 0)
@@ -1,34 +1,61 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import control as ct
-from model import define_system, configure_plot_style, get_assets_dir, analyze_open_loop
+from model import define_system, configure_plot_style, get_assets_dir, compute_open_loop, render_open_loop
+from step_metrics import step_metrics
+import zoh_sim
+import freq_response
+import margins
+import monte_carlo
+import stability_map
+import kharitonov
+import root_locus
+import pid_tune
+import profiler
+from render_scheduler import render_jobs
+import argparse
+import copy
 import os
 
+# The pipeline is split in two phases:
+# - compute_*: all numerics (responses, root loci, frequency responses, metrics),
+#   independent of the theme, collected in a data bundle;
+# - render_*: draws one theme (mode) from that bundle, so any number of themes
+#   can be rendered from a single computation.
+# The design_* / analyze_* / generate_* functions keep their original
+# signatures and simply chain both phases.
+# render_all sends the render_* calls to a process pool (render_scheduler) and
+# skips those whose data, theme and plotting code hash matches the assets
+# manifest (figure_cache).
+
 def generate_nyquist_plot(sys_open_loop, filename, title, mode='dark'):
     """
     Generates a Nyquist plot for the given open-loop system.
+    sys_open_loop can also be a precomputed Nyquist response (freq_response.nyquist).
     """
     colors = configure_plot_style(mode)
     assets_dir = get_assets_dir(mode)
     grid_color = 'black' if mode == 'light' else 'white'
     grid_alpha = 0.3
     text_color = 'black' if mode == 'light' else 'white'
-    
+
     plt.figure(figsize=(8, 8))
-    
+
     # Calculate Nyquist response
     # ct.nyquist_plot arguments might conflict if linestyle is passed directly.
     # We call it without linestyle, then force solid lines on all plot lines.
-    ct.nyquist_plot(sys_open_loop, label='L(s)', color=colors[0])
-    
+    # (It rescales a precomputed response in place, hence the copy: the data
+    # bundle must stay unchanged between themes and for the figure cache.)
+    ct.nyquist_plot(copy.deepcopy(sys_open_loop), label='L(s)', color=colors[0])
+
     # Force all current lines to be solid (handles negative freq dashed default)
     for line in plt.gca().get_lines():
         line.set_linestyle('-')
-    
+
     # Draw Unit Circle for reference (Thicker and more visible)
     theta = np.linspace(0, 2*np.pi, 100)
     plt.plot(np.cos(theta), np.sin(theta), 'r--', linewidth=2.5, alpha=0.8, label='Círculo Unitário')
-    
+
     # Plot formatting
     plt.title(title, color=text_color)
     plt.xlabel('Eixo Real', color=text_color)
@@ -36,52 +63,71 @@ def generate_nyquist_plot(sys_open_loop, filename, title, mode='dark'):
     plt.grid(True, which='both', color=grid_color, alpha=grid_alpha)
     plt.axhline(0, color=grid_color, linewidth=0.5)
     plt.axvline(0, color=grid_color, linewidth=0.5)
-    
+
     # Mark -1 point (Highlighted)
     plt.plot(-1, 0, 'r+', markersize=14, markeredgewidth=3, label='Ponto Crítico (-1)')
-    
+
     # Simplified Legend (Unique entries only, moved to left)
     handles, labels = plt.gca().get_legend_handles_labels()
     by_label = dict(zip(labels, handles))
-    
+
     legend = plt.legend(by_label.values(), by_label.keys(),
-                       facecolor='black' if mode=='dark' else 'white', 
-                       edgecolor=text_color, 
+                       facecolor='black' if mode=='dark' else 'white',
+                       edgecolor=text_color,
                        labelcolor=text_color,
                        fontsize='small',
                        loc='center left')
-    
-    # Limit zoom to emphasize the -1 region if needed, but auto-scale is usually safer first
+
+    # Limit zoom to emphasize the -1 region (the contour is sampled for this window)
     # For this specific plant, the plot can be huge, so we might want to zoom in near origin
-    plt.xlim([-2.5, 0.5])
-    plt.ylim([-1.5, 1.5])
-    
+    plt.xlim(freq_response.NYQUIST_XLIM)
+    plt.ylim(freq_response.NYQUIST_YLIM)
+
     plt.savefig(os.path.join(assets_dir, filename))
     plt.close()
 
-def generate_comparative_nyquist(sys, Kp_p, ctrl_leadlag, ctrl_pid, mode='dark'):
+def compute_comparative_nyquist(sys, Kp_p, ctrl_leadlag, ctrl_pid):
     """
-    Generates a comparative Nyquist plot for Proportional, Lead-Lag, and PID.
+    Nyquist and sensitivity data of the Proportional, Lead-Lag and PID loops.
+    """
+    loops = [(Kp_p * sys, 'Proporcional', 0),
+             (ctrl_leadlag * sys, 'Lead-Lag', 2), # Greenish usually
+             (ctrl_pid * sys, 'PID', 3)]     # Reddish/Purple usually
+    data = {"loops": [(freq_response.nyquist(L), label, color_idx) for L, label, color_idx in loops],
+            "sensitivity": []}
+    # |S| and |T| from the same (memoized) evaluation of each loop
+    for L, label, color_idx in loops:
+        omega, S, T = freq_response.sensitivity(L)
+        data["sensitivity"].append((omega, 20 * np.log10(np.abs(S)), 20 * np.log10(np.abs(T)), label, color_idx))
+
+    # GM / PM / DM / Ms of the three loops in one batched call
+    polys = [freq_response.loop_polys(L) for L, _, _ in loops]
+    data["margins"] = margins.loop_margins([n for n, _ in polys], [d for _, d in polys], freq_response.OMEGA,
+                                           np.array([freq_response.frequency_response(L) for L, _, _ in loops]))
+    print(margins.margin_table([label for _, label, _ in loops], data["margins"]))
+
+    # Nyquist criterion from the encirclement count: Z = N + P
+    for L, label, _ in loops:
+        N, P, Z = freq_response.nyquist_stability(L)
+        print(f"Nyquist {label}: N={N}, P={P}, Z={Z} -> {'estável' if Z == 0 else 'instável'}")
+    return data
+
+def render_comparative_nyquist(data, mode='dark'):
+    """
+    Draws the comparative Nyquist plot from compute_comparative_nyquist data.
     """
     colors = configure_plot_style(mode)
     assets_dir = get_assets_dir(mode)
     grid_color = 'black' if mode == 'light' else 'white'
     text_color = 'black' if mode == 'light' else 'white'
-    
+
     plt.figure(figsize=(10, 8))
-    
-    # Systems to compare
-    systems = [
-        (Kp_p * sys, 'Proporcional', colors[0]),
-        (ctrl_leadlag * sys, 'Lead-Lag', colors[2]), # Greenish usually
-        (ctrl_pid * sys, 'PID', colors[3])     # Reddish/Purple usually
-    ]
-    
+
     # Plot curves
-    for loop, label, color in systems:
-        # Avoid linestyle conflict by not passing it
-        ct.nyquist_plot(loop, label=label, color=color)
-        
+    for response, label, color_idx in data["loops"]:
+        # Avoid linestyle conflict by not passing it (copy: plotting rescales the response in place)
+        ct.nyquist_plot(copy.deepcopy(response), label=label, color=colors[color_idx])
+
     # Force all plotted lines (nyquist curves) to be solid
     for line in plt.gca().get_lines():
         line.set_linestyle('-')
@@ -91,11 +137,11 @@ def generate_comparative_nyquist(sys, Kp_p, ctrl_leadlag, ctrl_pid, mode='dark')
     # Actually, if I plot unit circle NOW, it will be fine.
     # But wait, I iterate `get_lines()` above. If I plotted unit circle before, it would become solid.
     # So I must move unit circle plotting to AFTER the modification loop.
-    
+
     theta = np.linspace(0, 2*np.pi, 100)
     plt.plot(np.cos(theta), np.sin(theta), 'r--', linewidth=2.5, alpha=0.8)
     plt.plot(-1, 0, 'r+', markersize=14, markeredgewidth=3, label='Ponto Crítico (-1)')
-        
+
     # ... rest of formatting ...
     plt.title('Comparativo de Estabilidade (Nyquist)', color=text_color)
     plt.xlabel('Eixo Real', color=text_color)
@@ -103,53 +149,68 @@ def generate_comparative_nyquist(sys, Kp_p, ctrl_leadlag, ctrl_pid, mode='dark')
     plt.grid(True, which='both', color=grid_color, alpha=0.3)
     plt.axhline(0, color=grid_color, linewidth=0.5)
     plt.axvline(0, color=grid_color, linewidth=0.5)
-    
+
     # Zoom for detail around -1
-    plt.xlim([-2.5, 0.5]) # Slightly wider xlim to see entrant curves better
-    plt.ylim([-1.5, 1.5])
-    
+    plt.xlim(freq_response.NYQUIST_XLIM) # Slightly wider xlim to see entrant curves better
+    plt.ylim(freq_response.NYQUIST_YLIM)
+
     # Simplified Legend (Unique entries only, moved to left)
     handles, labels = plt.gca().get_legend_handles_labels()
     by_label = dict(zip(labels, handles))
-    
+
     legend = plt.legend(by_label.values(), by_label.keys(),
-                       facecolor='black' if mode=='dark' else 'white', 
+                       facecolor='black' if mode=='dark' else 'white',
                        edgecolor=text_color,
                        fontsize='small',
                        loc='center left')
     for text in legend.get_texts():
         text.set_color(text_color)
-            
+
     plt.savefig(os.path.join(assets_dir, '18_comparative_nyquist.png'))
     plt.close()
 
-def generate_comparative_plots(sys_input, Kp_p, ctrl_lag_input, mode='dark'):
+    # Sensitivity |S| and complementary sensitivity |T|
+    plt.figure(figsize=(10, 6))
+    for omega, S_db, T_db, label, color_idx in data["sensitivity"]:
+        plt.semilogx(omega, S_db, linewidth=2, color=colors[color_idx], label=f'|S| {label}')
+        plt.semilogx(omega, T_db, '--', linewidth=1.5, color=colors[color_idx], label=f'|T| {label}')
+    plt.title('Sensibilidade Comparativa', color=text_color)
+    plt.xlabel('Frequência (rad/s)', color=text_color)
+    plt.ylabel('Magnitude (dB)', color=text_color)
+    plt.grid(True, which='both', color=grid_color, alpha=0.3)
+    plt.ylim([-60, 20])
+    plt.legend(fontsize='small', loc='lower left')
+    plt.savefig(os.path.join(assets_dir, '18b_comparative_sensitivity.png'))
+    plt.close()
+
+def generate_comparative_nyquist(sys, Kp_p, ctrl_leadlag, ctrl_pid, mode='dark'):
     """
-    Generates detailed comparative plots based on Dierson Silva's specifications.
+    Generates a comparative Nyquist plot for Proportional, Lead-Lag, and PID.
+    """
+    render_comparative_nyquist(compute_comparative_nyquist(sys, Kp_p, ctrl_leadlag, ctrl_pid), mode)
+
+def compute_comparative_plots():
+    """
+    Step, ramp and Bode data for the comparison based on Dierson Silva's specifications.
     Parameters from request:
     km = 1.2, am = 13.2, ae = 950
     kcp = 77000
     aLag = 0.01, bLag = 0.1
     """
-    colors = configure_plot_style(mode)
-    assets_dir = get_assets_dir(mode)
-    grid_color = 'black' if mode == 'light' else 'white'
-    grid_alpha = 0.3
-    
     # --- Redefining System exactly as requested for Comparison ---
     s = ct.TransferFunction.s
     km = 1.2
     am = 13.2
     ae = 950
-    
+
     # Plant G(s)
     Gs = km/(s*(s+am)*(s+ae))
-    
+
     # Compensator Parameters
     kcp = 77000
     aLag = 0.01
     bLag = 10.0 * aLag # bLag = 0.1
-    
+
     # Lag Compensator C(s) without Gain (Gain is applied in loop)
     # The snippet implies Lkc = kcp * CLag * Gs, where CLag is just the pole/zero
     CLag = (s + bLag)/(s + aLag)
@@ -160,26 +221,56 @@ def generate_comparative_plots(sys_input, Kp_p, ctrl_lag_input, mode='dark'):
     # Gf = feedback(Gs, 1)      -> Uncompensated
     # Gkf = feedback(Lk, 1)     -> Proportional
     # Gkcf = feedback(Lkc, 1)   -> P + Lag
-    
+
     Lk = kcp * Gs
     Lkc = kcp * CLag * Gs
-    
+
     Gf = ct.feedback(Gs, 1)
     Gkf = ct.feedback(Lk, 1)
     Gkcf = ct.feedback(Lkc, 1)
 
+    data = {}
+
     # --- Resposta ao Degrau (Snippet implementation) ---
-    plt.figure(figsize=(10, 6))
     t1 = np.linspace(0, 3, 1000)
-    
-    t1, y1 = ct.step_response(Gf, T=t1)
-    t1, y2 = ct.step_response(Gkf, T=t1)
-    t1, y3 = ct.step_response(Gkcf, T=t1)
-    
+    data["t_step"] = t1
+    data["step"] = [zoh_sim.step_response(G, t1)[1] for G in (Gf, Gkf, Gkcf)]
+
+    # --- Resposta à Rampa (Snippet implementation) ---
+    t = np.linspace(0, 3, 1000)
+    rampa = t  # r(t) = t
+    # The ramp is piecewise linear, so the first-order hold is exact here
+    data["t_ramp"] = t
+    data["ramp"] = [zoh_sim.forced_response(G, t, rampa, hold='foh')[1] for G in (Gf, Gkf, Gkcf)]
+
+    # --- Bode (Standardized) ---
+    # Open Loops: uncompensated, P, P + Lag, on the shared frequency grid
+    freq_response.responses([Gs, Lk, Lkc], 1j * freq_response.OMEGA)
+    data["mag_db"] = []
+    data["phase_deg"] = []
+    for sys_ol in (Gs, Lk, Lkc):
+        omega, mag_db, phase_deg = freq_response.bode(sys_ol, 1e-3, 1e3)
+        data["mag_db"].append(mag_db)
+        data["phase_deg"].append(phase_deg)
+    data["omega"] = omega
+    return data
+
+def render_comparative_plots(data, mode='dark'):
+    """
+    Draws the comparative step, ramp and Bode plots from compute_comparative_plots data.
+    """
+    colors = configure_plot_style(mode)
+    assets_dir = get_assets_dir(mode)
+    grid_color = 'black' if mode == 'light' else 'white'
+    grid_alpha = 0.3
+
+    y1, y2, y3 = data["step"]
+    t1 = data["t_step"]
+    plt.figure(figsize=(10, 6))
     plt.plot(t1, y1, linewidth=2, label='G(s)', color=colors[1])
     plt.plot(t1, y2, linewidth=2, label='k*G(s)', color=colors[0])
     plt.plot(t1, y3, linewidth=2, label='k*G(s)*C(s)', color=colors[2])
-    
+
     plt.title('Resposta ao degrau do sistema em malha fechada', color='white' if mode=='dark' else 'black')
     plt.xlabel("Tempo (s)")
     plt.ylabel("Amplitude")
@@ -188,20 +279,15 @@ def generate_comparative_plots(sys_input, Kp_p, ctrl_lag_input, mode='dark'):
     plt.savefig(os.path.join(assets_dir, '07_compare_step.png'))
     plt.close()
 
-    # --- Resposta à Rampa (Snippet implementation) ---
+    y1_r, y2_r, y3_r = data["ramp"]
+    t_out = data["t_ramp"]
+    rampa = t_out
     plt.figure(figsize=(10, 6))
-    t = np.linspace(0, 3, 1000)
-    rampa = t  # r(t) = t
-    
-    t_out, y1_r = ct.forced_response(Gf, T=t, U=rampa)
-    t_out, y2_r = ct.forced_response(Gkf, T=t, U=rampa)
-    t_out, y3_r = ct.forced_response(Gkcf, T=t, U=rampa)
-    
     plt.plot(t_out, y1_r, linewidth=2, label="Saída G(s)", color=colors[1])
     plt.plot(t_out, y2_r, linewidth=2, label="Saída k*G(s)", color=colors[0])
     plt.plot(t_out, y3_r, linewidth=2, label="Saída k*G(s)*C(s)", color=colors[2])
     plt.plot(t_out, rampa, '--', linewidth=2, label="Entrada rampa", color=colors[3])
-    
+
     plt.title("Resposta à Rampa do sistema em malha fechada", color='white' if mode=='dark' else 'black')
     plt.xlabel("Tempo (s)")
     plt.ylabel("Amplitude")
@@ -209,29 +295,12 @@ def generate_comparative_plots(sys_input, Kp_p, ctrl_lag_input, mode='dark'):
     plt.legend()
     plt.savefig(os.path.join(assets_dir, '08_compare_ramp.png'))
     plt.close()
-    
-    # --- Bode (Standardized) ---
-    # Recalculating Bode for consistency with new parameters
+
+    omega = data["omega"]
+    mag_u_db, mag_p_db, mag_l_db = data["mag_db"]
+    phase_u_deg, phase_p_deg, phase_l_deg = data["phase_deg"]
     plt.figure(figsize=(10, 8))
-    omega = np.logspace(-3, 3, 1000)
-    
-    # Open Loops
-    sys_ol_uncomp = Gs
-    sys_ol_p = Lk
-    sys_ol_lag = Lkc
-    
-    mag_u, phase_u, _ = ct.frequency_response(sys_ol_uncomp, omega)
-    mag_p, phase_p, _ = ct.frequency_response(sys_ol_p, omega)
-    mag_l, phase_l, _ = ct.frequency_response(sys_ol_lag, omega)
-    
-    mag_u_db = 20 * np.log10(mag_u)
-    mag_p_db = 20 * np.log10(mag_p)
-    mag_l_db = 20 * np.log10(mag_l)
-    
-    phase_u_deg = np.degrees(np.unwrap(phase_u))
-    phase_p_deg = np.degrees(np.unwrap(phase_p))
-    phase_l_deg = np.degrees(np.unwrap(phase_l))
-    
+
     ax1 = plt.subplot(2, 1, 1)
     plt.semilogx(omega, mag_u_db, linewidth=2, label='G(s)', color=colors[1])
     plt.semilogx(omega, mag_p_db, linewidth=2, label='k*G(s)', color=colors[0])
@@ -240,7 +309,7 @@ def generate_comparative_plots(sys_input, Kp_p, ctrl_lag_input, mode='dark'):
     plt.ylabel('Magnitude (dB)')
     plt.title('Diagrama de Bode Comparativo', color='white' if mode=='dark' else 'black')
     plt.legend()
-    
+
     ax2 = plt.subplot(2, 1, 2)
     plt.semilogx(omega, phase_u_deg, linewidth=2, label='G(s)', color=colors[1])
     plt.semilogx(omega, phase_p_deg, linewidth=2, label='k*G(s)', color=colors[0])
@@ -248,18 +317,70 @@ def generate_comparative_plots(sys_input, Kp_p, ctrl_lag_input, mode='dark'):
     plt.grid(True, which='both', color=grid_color, alpha=grid_alpha)
     plt.ylabel('Fase (graus)')
     plt.xlabel('Frequência (rad/s)')
-    
+
     plt.tight_layout()
     plt.savefig(os.path.join(assets_dir, '05_compare_bode.png'))
     plt.close()
 
-def design_p_controller(sys, mode='dark'):
+def generate_comparative_plots(sys_input, Kp_p, ctrl_lag_input, mode='dark'):
     """
-    Design and simulate a Proportional Controller.
+    Generates detailed comparative plots based on Dierson Silva's specifications.
+    (The loops are redefined exactly as requested, see compute_comparative_plots.)
+    """
+    render_comparative_plots(compute_comparative_plots(), mode)
+
+def plot_rlocus(rlocus_data, poles, zeros, labels=False, xlim=None, ylim=None):
+    """
+    Draws a precomputed root locus (root_locus.root_locus) with enhanced
+    open-loop pole/zero markers. xlim/ylim select a zoomed view of the
+    same branches (default: root_locus.full_view).
+    """
+    if xlim is None:
+        xlim, ylim = root_locus.full_view(rlocus_data)
+    ct.root_locus_plot(rlocus_data, grid=True, xlim=xlim, ylim=ylim)
+    # Keep the equal aspect by resizing the axes box, not the limits, so the
+    # requested window is the one drawn
+    plt.gca().set_aspect('equal', adjustable='box')
+
+    # Enhanced visibility for poles and zeros
+    pole_label = 'Open Loop Poles' if labels else None
+    zero_label = 'Open Loop Zeros' if labels else None
+    plt.plot(np.real(poles), np.imag(poles), 'x', markersize=12, markeredgewidth=3, color='orange', label=pole_label)
+    plt.plot(np.real(zeros), np.imag(zeros), 'o', markersize=12, markeredgewidth=3, markerfacecolor='none', color='orange', label=zero_label)
+
+def compute_p_controller(sys):
+    """
+    Proportional Controller data.
     Updated Kp to 77000 as per discussion.
     """
     Kp = 77000
-    
+
+    # Root Locus
+    poles, zeros = ct.pzmap(sys, plot=False)
+    rlocus = root_locus.root_locus(sys)
+
+    # Step Response
+    sys_cl = ct.feedback(Kp * sys, 1)
+    t = np.linspace(0, 1.5, 1000)
+    t, y = zoh_sim.step_response(sys_cl, t)
+
+    metrics = step_metrics(t, y)
+    Mp = metrics['Mp'][0]
+    ts = metrics['ts'][0]
+
+    print(f"P Result (Kp={Kp}): Mp={Mp:.3f}%, ts={ts:.4f}s")
+
+    return {"Kp": Kp, "rlocus": rlocus, "poles": poles, "zeros": zeros,
+            "t": t, "y": y, "Mp": Mp, "ts": ts,
+            # Nyquist (Open Loop L = Kp * Sys)
+            "nyquist": freq_response.nyquist(Kp * sys)}
+
+def render_p_controller(data, mode='dark'):
+    """
+    Draws the Proportional Controller figures.
+    """
+    Kp, t, y, Mp, ts = data["Kp"], data["t"], data["y"], data["Mp"], data["ts"]
+
     colors = configure_plot_style(mode)
     assets_dir = get_assets_dir(mode)
     grid_color = 'black' if mode == 'light' else 'white'
@@ -267,13 +388,8 @@ def design_p_controller(sys, mode='dark'):
 
     # Root Locus
     plt.figure(figsize=(10, 10))
-    rlist, klist = ct.rlocus(sys, plot=True, grid=True)
-    
-    # Enhanced visibility for poles and zeros
-    poles, zeros = ct.pzmap(sys, plot=False)
-    plt.plot(np.real(poles), np.imag(poles), 'x', markersize=12, markeredgewidth=3, color='orange', label='Open Loop Poles')
-    plt.plot(np.real(zeros), np.imag(zeros), 'o', markersize=12, markeredgewidth=3, markerfacecolor='none', color='orange', label='Open Loop Zeros')
-    
+    plot_rlocus(data["rlocus"], data["poles"], data["zeros"], labels=True)
+
     plt.title(f'Lugar das Raízes (Kp={Kp})', color='white' if mode=='dark' else 'black')
     plt.xlabel('Eixo Real')
     plt.ylabel('Eixo Imaginário')
@@ -282,171 +398,188 @@ def design_p_controller(sys, mode='dark'):
     plt.legend()
     plt.savefig(os.path.join(assets_dir, '03_rlocus_P.png'))
     plt.close()
-    
+
     # Step Response
-    sys_cl = ct.feedback(Kp * sys, 1)
-    t = np.linspace(0, 1.5, 1000)
-    t, y = ct.step_response(sys_cl, T=t)
-    
-    info = ct.step_info(sys_cl)
-    Mp = info['Overshoot']
-    ts = info['SettlingTime']
-    
-    print(f"[{mode.upper()}] P Result (Kp={Kp}): Mp={Mp:.3f}%, ts={ts:.4f}s")
-    
     plt.figure(figsize=(10, 6))
     plt.plot(t, y, linewidth=2, color=colors[1])
     plt.title(f'Resposta ao Degrau (P, Kp={Kp})', color='white' if mode=='dark' else 'black')
     plt.grid(True, which='both', color=grid_color, alpha=grid_alpha)
-    
+
     text_color = 'white' if mode=='dark' else 'black'
     bg_color = 'black' if mode=='dark' else 'white'
-    plt.text(0.6 * np.max(t), 0.5 * np.max(y), f'Mp = {Mp:.2f}%\nts = {ts:.3f}s', 
+    plt.text(0.6 * np.max(t), 0.5 * np.max(y), f'Mp = {Mp:.2f}%\nts = {ts:.3f}s',
              bbox=dict(facecolor=bg_color, alpha=0.5, edgecolor=text_color), color=text_color)
-             
+
     plt.savefig(os.path.join(assets_dir, '04_step_response_P.png'))
     plt.close()
 
     # Nyquist Plot (Open Loop L = Kp * Sys)
-    generate_nyquist_plot(Kp * sys, '04b_nyquist_P.png', 
+    generate_nyquist_plot(data["nyquist"], '04b_nyquist_P.png',
                           f'Diagrama de Nyquist (P, Kp={Kp})', mode)
 
-    return Kp
+def design_p_controller(sys, mode='dark'):
+    """
+    Design and simulate a Proportional Controller.
+    Updated Kp to 77000 as per discussion.
+    """
+    data = compute_p_controller(sys)
+    render_p_controller(data, mode)
+    return data["Kp"]
 
-def design_lag_controller(sys, mode='dark'):
+def compute_lag_controller(sys):
     """
-    Design and simulate a Proportional-Lag Compensator.
+    Proportional-Lag Compensator data.
     Updated Parameters: Kp=77000, z=0.1 (bLag), p=0.01 (aLag)
     """
-    colors = configure_plot_style(mode)
-    assets_dir = get_assets_dir(mode)
-    grid_color = 'black' if mode == 'light' else 'white'
-    grid_alpha = 0.3
-
     # Dierson Parameters
     Kp = 77000
     z = 0.1   # bLag
     p = 0.01  # aLag
 
-    print(f"[{mode.upper()}] Lag Design (Dierson): Kp={Kp}, z={z}, p={p}")
+    print(f"Lag Design (Dierson): Kp={Kp}, z={z}, p={p}")
 
     # Lag Compensator Transfer Function (without gain Kp, Kp applied to loop)
     lag_tf = ct.tf([1, z], [1, p])
-    
+
     # Total Open Loop = Kp * Lag * Sys
     ctrl = Kp * lag_tf
-    
+
     sys_cl = ct.feedback(ctrl * sys, 1)
-    
+
     t = np.linspace(0, 3, 1000) # Increased to 3s per request
-    t, y = ct.step_response(sys_cl, T=t)
-    
-    y_final = y[-1]
-    y_peak = np.max(y)
-    Mp = (y_peak - y_final) / y_final * 100 if y_final != 0 else 0
-    
-    error = np.abs(y - y_final)
-    threshold = 0.02 * np.abs(y_final)
-    out_of_bounds = np.where(error > threshold)[0]
-    ts = t[out_of_bounds[-1]] if len(out_of_bounds) > 0 else 0
-    
-    print(f"[{mode.upper()}] Lag Design Results -> Mp: {Mp:.2f}%, ts: {ts:.4f}s")
+    t, y = zoh_sim.step_response(sys_cl, t)
+
+    metrics = step_metrics(t, y)
+    Mp = metrics['Mp'][0]
+    ts = metrics['ts'][0]
+
+    print(f"Lag Design Results -> Mp: {Mp:.2f}%, ts: {ts:.4f}s")
+
+    # Standard RL of the Lag*Sys: the full and the dipole detail plots are
+    # drawn from the same branches
+    sys_open_lag = lag_tf * sys
+    poles, zeros = ct.pzmap(sys_open_lag, plot=False)
+    detail_xlim, detail_ylim = [-0.5, 0.5], [-0.5, 0.5]
+
+    return {"Kp": Kp, "z": z, "p": p, "ctrl": ctrl, "t": t, "y": y, "Mp": Mp, "ts": ts,
+            "rlocus": root_locus.root_locus(sys_open_lag), "poles": poles, "zeros": zeros,
+            "detail_xlim": detail_xlim, "detail_ylim": detail_ylim}
+
+def render_lag_controller(data, mode='dark'):
+    """
+    Draws the Proportional-Lag Compensator figures.
+    """
+    Kp, z, p = data["Kp"], data["z"], data["p"]
+    t, y, Mp, ts = data["t"], data["y"], data["Mp"], data["ts"]
+
+    colors = configure_plot_style(mode)
+    assets_dir = get_assets_dir(mode)
+    grid_color = 'black' if mode == 'light' else 'white'
+    grid_alpha = 0.3
 
     plt.figure(figsize=(10, 6))
     plt.plot(t, y, linewidth=2, color=colors[2])
     plt.title(f'Resposta ao Degrau (P+Lag)\nKp={Kp}, z={z}, p={p}', color='white' if mode=='dark' else 'black')
     plt.grid(True, which='both', color=grid_color, alpha=grid_alpha)
-    
+
     text_color = 'white' if mode=='dark' else 'black'
     bg_color = 'black' if mode=='dark' else 'white'
-    
-    plt.text(0.6 * np.max(t), 0.5 * np.max(y), f'Mp = {Mp:.1f}%\nts = {ts:.2f}s', 
+
+    plt.text(0.6 * np.max(t), 0.5 * np.max(y), f'Mp = {Mp:.1f}%\nts = {ts:.2f}s',
              bbox=dict(facecolor=bg_color, alpha=0.5, edgecolor=text_color), color=text_color)
     plt.savefig(os.path.join(assets_dir, '06b_step_response_Lag.png'))
     plt.close()
 
     # Root Locus (Lag)
     plt.figure(figsize=(10, 10))
-    # Standard RL of the Lag*Sys
-    sys_open_lag = lag_tf * sys
-    ct.rlocus(sys_open_lag, plot=True, grid=True)
-    
-    # Enhanced visibility
-    poles, zeros = ct.pzmap(sys_open_lag, plot=False)
-    plt.plot(np.real(poles), np.imag(poles), 'x', markersize=12, markeredgewidth=3, color='orange')
-    plt.plot(np.real(zeros), np.imag(zeros), 'o', markersize=12, markeredgewidth=3, markerfacecolor='none', color='orange')
+    plot_rlocus(data["rlocus"], data["poles"], data["zeros"])
 
     plt.title(f'Lugar das Raízes (Compensador Lag) - Zero: {z}, Polo: {p}', color='white' if mode=='dark' else 'black')
     plt.savefig(os.path.join(assets_dir, '06a_rlocus_Lag.png'))
     plt.close()
-    
+
     # Root Locus Detail (Dipole)
     plt.figure(figsize=(10, 10))
-    ct.rlocus(sys_open_lag, plot=True, grid=True)
-    
-    # Enhanced visibility
-    plt.plot(np.real(poles), np.imag(poles), 'x', markersize=12, markeredgewidth=3, color='orange')
-    plt.plot(np.real(zeros), np.imag(zeros), 'o', markersize=12, markeredgewidth=3, markerfacecolor='none', color='orange')
-
-    plt.xlim([-0.5, 0.5]) 
-    plt.ylim([-0.5, 0.5])
+    plot_rlocus(data["rlocus"], data["poles"], data["zeros"],
+                xlim=data["detail_xlim"], ylim=data["detail_ylim"])
+
+    plt.xlim(data["detail_xlim"])
+    plt.ylim(data["detail_ylim"])
     plt.title(f'Lugar das Raízes (Detalhe do Dipolo)\nZero={z}, Polo={p}', color='white' if mode=='dark' else 'black')
     plt.grid(True, which='both', color=grid_color, alpha=grid_alpha)
     plt.savefig(os.path.join(assets_dir, '06_rlocus_lag_detail.png'))
     plt.close()
 
     # Nyquist Plot (DISABLED per request: "tira o nyquist que usa somente lead e somente lag")
-    # generate_nyquist_plot(ctrl * sys, '06c_nyquist_Lag.png', 
+    # generate_nyquist_plot(ctrl * sys, '06c_nyquist_Lag.png',
     #                      f'Diagrama de Nyquist (Lag)\nZero={z}, Polo={p}', mode)
 
-    return ctrl
+def design_lag_controller(sys, mode='dark'):
+    """
+    Design and simulate a Proportional-Lag Compensator.
+    Updated Parameters: Kp=77000, z=0.1 (bLag), p=0.01 (aLag)
+    """
+    data = compute_lag_controller(sys)
+    render_lag_controller(data, mode)
+    return data["ctrl"]
 
-def design_lead_controller(sys, mode='dark'):
+def compute_lead_controller(sys):
     """
-    Design and simulate a Lead Compensator.
+    Lead Compensator data.
     """
+    z = 13.2
+    p = 150
+    K = 700
+
+    ctrl = K * ct.tf([1, z], [1, p])
+    sys_cl = ct.feedback(ctrl * sys, 1)
+
+    t = np.linspace(0, 1, 1000)
+    t, y = zoh_sim.step_response(sys_cl, t)
+
+    metrics = step_metrics(t, y)
+    Mp = metrics['Mp'][0]
+    ts = metrics['ts'][0]
+
+    print(f"Lead Design Results -> Mp: {Mp:.2f}%, ts: {ts:.4f}s")
+
+    poles, zeros = ct.pzmap(ctrl*sys, plot=False)
+
+    omega, mag_db, phase_deg = freq_response.bode(ctrl*sys, 1e-2, 1e4)
+    m = freq_response.margins(ctrl*sys)
+    print(f"Lead Margins -> GM: {m['gm_db']:.1f} dB, PM: {m['pm']:.1f}°, DM: {1e3 * m['dm']:.1f} ms, Ms: {m['Ms']:.2f}")
+
+    # Pole-zero cancellation detail, drawn from the same branches
+    detail_xlim, detail_ylim = [-20.0, 5.0], [-10.0, 10.0]
+
+    return {"z": z, "p": p, "K": K, "ctrl": ctrl, "t": t, "y": y, "Mp": Mp, "ts": ts,
+            "rlocus": root_locus.root_locus(ctrl*sys), "poles": poles, "zeros": zeros,
+            "detail_xlim": detail_xlim, "detail_ylim": detail_ylim,
+            "omega": omega, "mag_db": mag_db, "phase_deg": phase_deg}
+
+def render_lead_controller(data, mode='dark'):
+    """
+    Draws the Lead Compensator figures.
+    """
+    z, p, K = data["z"], data["p"], data["K"]
+    t, y, Mp, ts = data["t"], data["y"], data["Mp"], data["ts"]
+
     colors = configure_plot_style(mode)
     assets_dir = get_assets_dir(mode)
     grid_color = 'black' if mode == 'light' else 'white'
     grid_alpha = 0.3
-    
-    z = 13.2 
-    p = 150  
-    K = 700 
-    
-    ctrl = K * ct.tf([1, z], [1, p])
-    sys_cl = ct.feedback(ctrl * sys, 1)
-    
-    t = np.linspace(0, 1, 1000)
-    t, y = ct.step_response(sys_cl, T=t)
-    
-    y_final = y[-1]
-    y_peak = np.max(y)
-    Mp = (y_peak - y_final) / y_final * 100 if y_final != 0 else 0
-    
-    error = np.abs(y - y_final)
-    threshold = 0.02 * np.abs(y_final)
-    out_of_bounds = np.where(error > threshold)[0]
-    ts = t[out_of_bounds[-1]] if len(out_of_bounds) > 0 else 0
-    
-    print(f"[{mode.upper()}] Lead Design Results -> Mp: {Mp:.2f}%, ts: {ts:.4f}s")
-    
+
     plt.figure(figsize=(10, 6))
     plt.plot(t, y, linewidth=2, color=colors[0])
     plt.title(f'Resposta ao Degrau (Lead): z={z}, p={p}, K={K}', color='white' if mode=='dark' else 'black')
     plt.grid(True, which='both', color=grid_color, alpha=grid_alpha)
-    plt.text(0.6 * np.max(t), 0.5 * np.max(y), f'Mp = {Mp:.1f}%\nts = {ts:.3f}s', 
+    plt.text(0.6 * np.max(t), 0.5 * np.max(y), f'Mp = {Mp:.1f}%\nts = {ts:.3f}s',
              bbox=dict(facecolor='black', alpha=0.5, edgecolor=colors[1]), color='white')
     plt.savefig(os.path.join(assets_dir, '12_step_response_Lead.png'))
     plt.close()
-    
+
     plt.figure(figsize=(10, 10))
-    ct.rlocus(ctrl*sys, plot=True, grid=True)
-    
-    # Enhanced visibility
-    poles, zeros = ct.pzmap(ctrl*sys, plot=False)
-    plt.plot(np.real(poles), np.imag(poles), 'x', markersize=12, markeredgewidth=3, color='orange')
-    plt.plot(np.real(zeros), np.imag(zeros), 'o', markersize=12, markeredgewidth=3, markerfacecolor='none', color='orange')
+    plot_rlocus(data["rlocus"], data["poles"], data["zeros"])
 
     # plt.xlim([-200, 50]) # Auto-scale
     # plt.ylim([-150, 150])
@@ -455,176 +588,206 @@ def design_lead_controller(sys, mode='dark'):
     plt.close()
 
     plt.figure(figsize=(10, 10))
-    ct.rlocus(ctrl*sys, plot=True, grid=True)
-    
-    # Enhanced visibility
-    plt.plot(np.real(poles), np.imag(poles), 'x', markersize=12, markeredgewidth=3, color='orange')
-    plt.plot(np.real(zeros), np.imag(zeros), 'o', markersize=12, markeredgewidth=3, markerfacecolor='none', color='orange')
-
-    plt.xlim([-20.0, 5.0])
-    plt.ylim([-10.0, 10.0])
+    plot_rlocus(data["rlocus"], data["poles"], data["zeros"],
+                xlim=data["detail_xlim"], ylim=data["detail_ylim"])
+
+    plt.xlim(data["detail_xlim"])
+    plt.ylim(data["detail_ylim"])
     plt.title(f'Detalhe do Cancelamento Polo-Zero (Lead)', color='white' if mode=='dark' else 'black')
     plt.grid(True, which='both', color=grid_color, alpha=grid_alpha)
     plt.savefig(os.path.join(assets_dir, '10_rlocus_lead_detail.png'))
     plt.close()
-    
+
     plt.figure(figsize=(10, 8))
-    omega = np.logspace(-2, 4, 1000)
-    mag, phase, omega = ct.frequency_response(ctrl*sys, omega)
-    mag_db = 20 * np.log10(mag)
-    phase_deg = np.degrees(np.unwrap(phase))
-    
+    omega, mag_db, phase_deg = data["omega"], data["mag_db"], data["phase_deg"]
+
     plt.subplot(2, 1, 1)
     plt.semilogx(omega, mag_db, linewidth=2, color=colors[0])
     plt.grid(True, which='both', color=grid_color, alpha=grid_alpha)
     plt.ylabel('Magnitude (dB)')
     plt.title('Diagrama de Bode (Lead)', color='white' if mode=='dark' else 'black')
-    
+
     plt.subplot(2, 1, 2)
     plt.semilogx(omega, phase_deg, linewidth=2, color=colors[0])
     plt.grid(True, which='both', color=grid_color, alpha=grid_alpha)
     plt.ylabel('Fase (graus)')
     plt.xlabel('Frequência (rad/s)')
-    
+
     plt.tight_layout()
     plt.savefig(os.path.join(assets_dir, '11_bode_Lead.png'))
     plt.close()
-    
+
     # Nyquist Plot (DISABLED per request)
-    # generate_nyquist_plot(ctrl * sys, '11b_nyquist_Lead.png', 
+    # generate_nyquist_plot(ctrl * sys, '11b_nyquist_Lead.png',
     #                      f'Diagrama de Nyquist (Lead)', mode)
-    
-    return ctrl
 
-def design_lead_lag_controller(sys, mode='dark'):
+def design_lead_controller(sys, mode='dark'):
     """
-    Design and simulate an Integrated Lead-Lag Compensator.
+    Design and simulate a Lead Compensator.
+    """
+    data = compute_lead_controller(sys)
+    render_lead_controller(data, mode)
+    return data["ctrl"]
+
+def compute_lead_lag_controller(sys):
+    """
+    Integrated Lead-Lag Compensator data.
     """
-    colors = configure_plot_style(mode)
-    assets_dir = get_assets_dir(mode)
-    grid_color = 'black' if mode == 'light' else 'white'
-    grid_alpha = 0.3
-    
     s = ct.TransferFunction.s
-    
+
     # Lag Part
     z_lag = 0.1
     p_lag = 0.01
     C_lag = ct.tf([1, z_lag], [1, p_lag])
-    
+
     # Lead Part
     z_lead = 20
     p_lead = 100
     C_lead = ct.tf([1, z_lead], [1, p_lead])
-    
+
     K = 1000
-    
+
     ctrl = K * C_lag * C_lead
     sys_cl = ct.feedback(ctrl * sys, 1)
-    
+
     t = np.linspace(0, 1, 2000)
-    t, y = ct.step_response(sys_cl, T=t)
-    
-    y_final = y[-1]
-    y_peak = np.max(y)
-    Mp = (y_peak - y_final) / y_final * 100 if y_final != 0 else 0
-    
-    error = np.abs(y - y_final)
-    threshold = 0.02 * np.abs(y_final)
-    out_of_bounds = np.where(error > threshold)[0]
-    ts = t[out_of_bounds[-1]] if len(out_of_bounds) > 0 else 0
-    
-    print(f"[{mode.upper()}] Integrated Lead-Lag Design Results -> Mp: {Mp:.2f}%, ts: {ts:.4f}s")
-    
+    t, y = zoh_sim.step_response(sys_cl, t)
+
+    metrics = step_metrics(t, y)
+    Mp = metrics['Mp'][0]
+    ts = metrics['ts'][0]
+
+    print(f"Integrated Lead-Lag Design Results -> Mp: {Mp:.2f}%, ts: {ts:.4f}s")
+
+    poles, zeros = ct.pzmap(ctrl*sys, plot=False)
+
+    # Bode, margins and Nyquist from one evaluation of the loop
+    omega, mag_db, phase_deg = freq_response.bode(ctrl*sys, 1e-3, 1e3)
+    m = freq_response.margins(ctrl*sys)
+    print(f"Lead-Lag Margins -> GM: {m['gm_db']:.1f} dB, PM: {m['pm']:.1f}°, DM: {1e3 * m['dm']:.1f} ms, Ms: {m['Ms']:.2f}")
+
+    return {"ctrl": ctrl, "t": t, "y": y, "Mp": Mp, "ts": ts,
+            "rlocus": root_locus.root_locus(ctrl*sys), "poles": poles, "zeros": zeros,
+            "omega": omega, "mag_db": mag_db, "phase_deg": phase_deg,
+            "nyquist": freq_response.nyquist(ctrl * sys)}
+
+def render_lead_lag_controller(data, mode='dark'):
+    """
+    Draws the Integrated Lead-Lag Compensator figures.
+    """
+    t, y, Mp, ts = data["t"], data["y"], data["Mp"], data["ts"]
+
+    colors = configure_plot_style(mode)
+    assets_dir = get_assets_dir(mode)
+    grid_color = 'black' if mode == 'light' else 'white'
+    grid_alpha = 0.3
+
     plt.figure(figsize=(10, 6))
     plt.plot(t, y, linewidth=2, color=colors[3])
     plt.title(f'Resposta Final (Lead-Lag Integrado)', color='white' if mode=='dark' else 'black')
     plt.grid(True)
-    plt.text(0.6 * np.max(t), 0.5 * np.max(y), f'Mp = {Mp:.1f}%\nts = {ts:.3f}s', 
+    plt.text(0.6 * np.max(t), 0.5 * np.max(y), f'Mp = {Mp:.1f}%\nts = {ts:.3f}s',
              bbox=dict(facecolor='black', alpha=0.5, edgecolor=colors[1]), color='white')
     plt.savefig(os.path.join(assets_dir, '13_step_response_LeadLag.png'))
     plt.close()
-    
+
     plt.figure(figsize=(10, 10))
-    ct.rlocus(ctrl*sys, plot=True, grid=True)
-    
-    # Enhanced visibility
-    poles, zeros = ct.pzmap(ctrl*sys, plot=False)
-    plt.plot(np.real(poles), np.imag(poles), 'x', markersize=12, markeredgewidth=3, color='orange')
-    plt.plot(np.real(zeros), np.imag(zeros), 'o', markersize=12, markeredgewidth=3, markerfacecolor='none', color='orange')
-    
+    plot_rlocus(data["rlocus"], data["poles"], data["zeros"])
+
     plt.title(f'Lugar das Raízes (Lead-Lag)', color='white' if mode=='dark' else 'black')
     plt.savefig(os.path.join(assets_dir, '14a_rlocus_LeadLag.png')) # Renamed to avoid collision
     plt.close()
-    
+
     plt.figure(figsize=(10, 8))
-    omega = np.logspace(-3, 3, 1000)
-    mag, phase, omega = ct.frequency_response(ctrl*sys, omega)
-    mag_db = 20 * np.log10(mag)
-    phase_deg = np.degrees(np.unwrap(phase))
-    
+    omega, mag_db, phase_deg = data["omega"], data["mag_db"], data["phase_deg"]
+
     plt.subplot(2, 1, 1)
     plt.semilogx(omega, mag_db, linewidth=2, color=colors[3])
     plt.grid(True, which='both', color=grid_color, alpha=grid_alpha)
     plt.ylabel('Magnitude (dB)')
     plt.title('Diagrama de Bode (Lead-Lag)', color='white' if mode=='dark' else 'black')
-    
+
     plt.subplot(2, 1, 2)
     plt.semilogx(omega, phase_deg, linewidth=2, color=colors[3])
     plt.grid(True, which='both', color=grid_color, alpha=grid_alpha)
     plt.ylabel('Fase (graus)')
     plt.xlabel('Frequência (rad/s)')
-    
+
     plt.tight_layout()
     plt.savefig(os.path.join(assets_dir, '14_bode_LeadLag.png'))
     plt.close()
-    
+
     # Nyquist Plot
-    generate_nyquist_plot(ctrl * sys, '14b_nyquist_LeadLag.png', 
+    generate_nyquist_plot(data["nyquist"], '14b_nyquist_LeadLag.png',
                          f'Diagrama de Nyquist (Lead-Lag Integrado)', mode)
-    
-    return ctrl
 
-def design_pid_controller(sys, mode='dark'):
+def design_lead_lag_controller(sys, mode='dark'):
     """
-    Design and simulate a PID Controller (Ziegler-Nichols).
+    Design and simulate an Integrated Lead-Lag Compensator.
+    """
+    data = compute_lead_lag_controller(sys)
+    render_lead_lag_controller(data, mode)
+    return data["ctrl"]
+
+def compute_pid_controller(sys, gains=None):
+    """
+    PID Controller data.
+    gains: dict with Kp, Ki, Kd, tau (e.g. the best pid_tune.autotune
+    candidate, Ziegler-Nichols based); default: the hand-tuned values.
     """
-    colors = configure_plot_style(mode)
-    assets_dir = get_assets_dir(mode)
-    grid_color = 'black' if mode == 'light' else 'white'
-    grid_alpha = 0.3
-    
     Kp_pid = 60000
     Ki_pid = 5000
     Kd_pid = 1000
-    
+
     # Filter for derivative
     tau = 0.001
-    
-    pid_tf = ct.tf([Kd_pid, Kp_pid, Ki_pid], [tau, 1, 0])
+
+    if gains is not None:
+        Kp_pid, Ki_pid, Kd_pid, tau = (gains[name] for name in pid_tune.PARAMS)
+        print(f"PID (autotune): Kp={Kp_pid:.4g}, Ki={Ki_pid:.4g}, Kd={Kd_pid:.4g}, tau={tau:.3g}")
+
+    pid_tf = pid_tune.pid_tf(Kp_pid, Ki_pid, Kd_pid, tau)
     sys_cl = ct.feedback(pid_tf * sys, 1)
-    
+
     t = np.linspace(0, 1.5, 1000)
-    t, y = ct.step_response(sys_cl, T=t)
-    
-    y_final = y[-1]
-    y_peak = np.max(y)
-    Mp = (y_peak - y_final) / y_final * 100 if y_final != 0 else 0
-    
+    t, y = zoh_sim.step_response(sys_cl, t)
+
+    Mp = step_metrics(t, y)['Mp'][0]
+
+    return {"ctrl": pid_tf, "t": t, "y": y, "Mp": Mp,
+            "nyquist": freq_response.nyquist(pid_tf * sys)}
+
+def render_pid_controller(data, mode='dark'):
+    """
+    Draws the PID Controller figures.
+    """
+    t, y, Mp = data["t"], data["y"], data["Mp"]
+
+    colors = configure_plot_style(mode)
+    assets_dir = get_assets_dir(mode)
+    grid_color = 'black' if mode == 'light' else 'white'
+    grid_alpha = 0.3
+
     plt.figure(figsize=(10, 6))
     plt.plot(t, y, linewidth=2, color=colors[3])
     plt.title(f'Resposta ao Degrau (PID Ziegler-Nichols)', color='white' if mode=='dark' else 'black')
     plt.grid(True, which='both', color=grid_color, alpha=grid_alpha)
-    plt.text(0.6 * np.max(t), 0.5 * np.max(y), f'Mp = {Mp:.1f}%', 
+    plt.text(0.6 * np.max(t), 0.5 * np.max(y), f'Mp = {Mp:.1f}%',
              bbox=dict(facecolor='black', alpha=0.5, edgecolor=colors[1]), color='white')
     plt.savefig(os.path.join(assets_dir, '15_step_response_PID.png'))
     plt.close()
-    
+
     # Nyquist Plot
-    generate_nyquist_plot(pid_tf * sys, '15b_nyquist_PID.png', 
+    generate_nyquist_plot(data["nyquist"], '15b_nyquist_PID.png',
                          f'Diagrama de Nyquist (PID)', mode)
-    
-    return pid_tf
+
+def design_pid_controller(sys, mode='dark'):
+    """
+    Design and simulate a PID Controller (Ziegler-Nichols).
+    """
+    data = compute_pid_controller(sys)
+    render_pid_controller(data, mode)
+    return data["ctrl"]
 
 def create_plant_variation(Km, am, ae):
     """
@@ -632,27 +795,58 @@ def create_plant_variation(Km, am, ae):
     Nominal: Km=1.1, am=13.2, ae=950 -> K_sys=772 fixo.
     Using user parameters for K_sys check.
     """
-    # Note: user defined K_sys implicitly via 1.2 * 772? 
-    # Original code had K_sys=772. Let's keep the robustness logic consistent 
+    # Note: user defined K_sys implicitly via 1.2 * 772?
+    # Original code had K_sys=772. Let's keep the robustness logic consistent
     # but acknowledge the new nominal plant is slightly different.
     K_sys = 772
     num = [Km * K_sys]
     den = [1, (am + ae), (am * ae), 0]
     return ct.tf(num, den)
 
-def analyze_robustness(controllers_dict, mode='dark'):
+ROBUSTNESS_SCENARIOS = {
+    "Nominal":   {"Km": 1.1, "am": 13.2, "ae": 950,  "style": "-", "color_dark": "#00ff00", "color_light": "green"},
+    "Pesado":    {"Km": 0.8, "am": 15.0, "ae": 1100, "style": "--", "color_dark": "#00bfff", "color_light": "blue"},
+    "Agressivo": {"Km": 1.2, "am": 10.0, "ae": 800,  "style": "-.", "color_dark": "#ff4500", "color_light": "red"}
+}
+
+def compute_robustness(controllers_dict):
     """
-    Análise de Robustez baseada nos cenários do Nicolas.
+    Análise de Robustez baseada nos cenários do Nicolas (dados).
+    """
+    # Same grid for every scenario: the ZOH discretization of each loop is cached
+    t_sim = np.linspace(0, 2.0, 1000)
+
+    data = {}
+    for ctrl_name, ctrl in controllers_dict.items():
+        print(f"Analisando Robustez: {ctrl_name}")
+        runs = []
+        for name, params in ROBUSTNESS_SCENARIOS.items():
+            G_var = create_plant_variation(params["Km"], params["am"], params["ae"])
+            sys_cl = ct.feedback(ctrl * G_var, 1)
+
+            t, y = zoh_sim.step_response(sys_cl, t_sim)
+
+            y_peak_abs = np.max(np.abs(y))
+
+            if y_peak_abs > 50:
+                label_text = f"{name} (Instável)"
+                # Clip data to prevent visual artifacts (vertical lines filling the plot)
+                y_plot = np.clip(y, -5.0, 5.0)
+            else:
+                mp = step_metrics(t, y, reference=1.0)['Mp'][0]
+                label_text = f"{name} (Mp={mp:.1f}%)"
+                y_plot = y
+            runs.append((name, t, y_plot, label_text))
+        data[ctrl_name] = runs
+    return data
+
+def render_robustness(data, mode='dark'):
+    """
+    Draws the robustness figures from compute_robustness data.
     """
-    scenarios = {
-        "Nominal":   {"Km": 1.1, "am": 13.2, "ae": 950,  "style": "-", "color_dark": "#00ff00", "color_light": "green"},
-        "Pesado":    {"Km": 0.8, "am": 15.0, "ae": 1100, "style": "--", "color_dark": "#00bfff", "color_light": "blue"},
-        "Agressivo": {"Km": 1.2, "am": 10.0, "ae": 800,  "style": "-.", "color_dark": "#ff4500", "color_light": "red"}
-    }
-    
     colors = configure_plot_style(mode)
     assets_dir = get_assets_dir(mode)
-    
+
     if mode == 'light':
         text_color = 'black'
         grid_color = 'black'
@@ -663,60 +857,290 @@ def analyze_robustness(controllers_dict, mode='dark'):
         grid_color = 'white'
         face_color = 'black'
         grid_alpha = 0.3
-    
-    for ctrl_name, ctrl in controllers_dict.items():
+
+    for ctrl_name, runs in data.items():
         plt.figure(figsize=(10, 6))
-        print(f"[{mode.upper()}] Analisando Robustez: {ctrl_name}")
-        
-        for name, params in scenarios.items():
-            G_var = create_plant_variation(params["Km"], params["am"], params["ae"])
-            sys_cl = ct.feedback(ctrl * G_var, 1)
-            
-            t, y = ct.step_response(sys_cl, T=np.linspace(0, 2.0, 1000))
-            
+
+        for name, t, y_plot, label_text in runs:
+            params = ROBUSTNESS_SCENARIOS[name]
             color = params["color_dark"] if mode == 'dark' else params["color_light"]
-            
-            y_peak_abs = np.max(np.abs(y))
-            
-            if y_peak_abs > 50:
-                label_text = f"{name} (Instável)"
-                # Clip data to prevent visual artifacts (vertical lines filling the plot)
-                y_plot = np.clip(y, -5.0, 5.0)
-            else:
-                y_peak = np.max(y)
-                mp = (y_peak - 1) * 100
-                label_text = f"{name} (Mp={mp:.1f}%)"
-                y_plot = y
-            
             plt.plot(t, y_plot, linestyle=params["style"], linewidth=2, label=label_text, color=color)
-            
+
         plt.axhline(1.0, color=text_color, linestyle=':', linewidth=0.8, alpha=0.5)
         plt.grid(True, which='both', linestyle='--', linewidth=0.5, color=grid_color, alpha=grid_alpha)
-        
+
         plt.title(f'Análise de Robustez - {ctrl_name}', color=text_color, fontsize=14)
         plt.xlabel('Tempo (s)', color=text_color, fontsize=12)
         plt.ylabel('Amplitude', color=text_color, fontsize=12)
         plt.ylim(-0.2, 2.0)
-        
+
         legend = plt.legend(facecolor=face_color, edgecolor=text_color)
         for text in legend.get_texts():
             text.set_color(text_color)
-            
+
         plt.tick_params(colors=text_color, which='both')
         for spine in plt.gca().spines.values():
             spine.set_color(text_color)
-            
+
         if ctrl_name == 'PID':
             fname = '16_robustness_PID.png'
         elif ctrl_name == 'Lead-Lag':
             fname = '17_robustness_LeadLag.png'
         else:
             fname = f'robustness_{ctrl_name}.png'
-            
+
         plt.savefig(os.path.join(assets_dir, fname))
         plt.close()
 
+def analyze_robustness(controllers_dict, mode='dark'):
+    """
+    Análise de Robustez baseada nos cenários do Nicolas.
+    """
+    render_robustness(compute_robustness(controllers_dict), mode)
+
+def compute_monte_carlo(controllers_dict, n_samples=10000, distributions=None, seed=0):
+    """
+    Monte Carlo robustness: each controller against n_samples random plants
+    (monte_carlo.DEFAULT_DISTRIBUTIONS unless given). Keeps only the
+    percentile envelopes and statistics needed by render_monte_carlo.
+    """
+    data = {}
+    for ctrl_name, ctrl in controllers_dict.items():
+        result = monte_carlo.monte_carlo_robustness(ctrl, n_samples, distributions, seed=seed)
+        monte_carlo.print_report(ctrl_name, result)
+        data[ctrl_name] = {key: result[key] for key in ("t", "envelope", "p_unstable", "Mp_pct", "ts_pct")}
+        data[ctrl_name]["n_samples"] = n_samples
+    return data
+
+def render_monte_carlo(data, mode='dark'):
+    """
+    Draws the percentile envelopes of the Monte Carlo robustness step responses.
+    """
+    colors = configure_plot_style(mode)
+    assets_dir = get_assets_dir(mode)
+    text_color = 'black' if mode == 'light' else 'white'
+    grid_color = text_color
+
+    for ctrl_name, mc in data.items():
+        plt.figure(figsize=(10, 6))
+        t, env = mc["t"], mc["envelope"]
+
+        if env:
+            plt.fill_between(t, env[5], env[95], color=colors[1], alpha=0.25, label='5-95%')
+            plt.fill_between(t, env[25], env[75], color=colors[1], alpha=0.5, label='25-75%')
+            plt.plot(t, env[50], linewidth=2, color=colors[0], label='Mediana')
+        plt.axhline(1.0, color=text_color, linestyle=':', linewidth=0.8, alpha=0.5)
+        plt.grid(True, which='both', linestyle='--', linewidth=0.5, color=grid_color, alpha=0.3)
+
+        summary = f"P(instável) = {100 * mc['p_unstable']:.1f}%"
+        if mc["Mp_pct"]:
+            summary += f"\nMp mediano = {mc['Mp_pct'][50]:.1f}%"
+        plt.text(0.6 * t[-1], 0.3, summary, color=text_color,
+                 bbox=dict(facecolor='black' if mode == 'dark' else 'white', alpha=0.5, edgecolor=text_color))
+
+        plt.title(f"Monte Carlo ({mc['n_samples']} plantas) - {ctrl_name}", color=text_color)
+        plt.xlabel('Tempo (s)', color=text_color)
+        plt.ylabel('Amplitude', color=text_color)
+        plt.ylim(-0.2, 2.0)
+        if env:
+            plt.legend()
+        plt.savefig(os.path.join(assets_dir, f'19_robustness_mc_{ctrl_name}.png'))
+        plt.close()
+
+def compute_stability_map(controllers_dict, K_scale=None, Km=None, ae=None):
+    """
+    Stability map (no simulation) of each controller over a K x Km x ae grid,
+    K_scale multiplying the designed controller and am kept nominal.
+    Keeps the minimum damping ratio on the K x Km slice at nominal ae and on
+    the K x ae slice at nominal Km (the dominant pole is usually the slow
+    real one, so its own damping is 1 almost everywhere).
+    """
+    nominal = ROBUSTNESS_SCENARIOS["Nominal"]
+    K_scale = np.logspace(-2, 3, 121) if K_scale is None else np.asarray(K_scale)
+    Km = np.linspace(0.5, 1.5, 81) if Km is None else np.asarray(Km)
+    ae = np.linspace(600, 1300, 71) if ae is None else np.asarray(ae)
+    i_Km = np.argmin(np.abs(Km - nominal["Km"]))
+    i_ae = np.argmin(np.abs(ae - nominal["ae"]))
+
+    data = {}
+    for ctrl_name, ctrl in controllers_dict.items():
+        smap = stability_map.stability_map(ctrl, K_scale, Km, nominal["am"], ae)
+        print(f"Mapa de estabilidade {ctrl_name}: {100 * smap['stable'].mean():.1f}% "
+              f"de {smap['stable'].size} pontos estáveis")
+        data[ctrl_name] = {
+            "K_scale": K_scale, "Km": Km, "ae": ae,
+            "zeta_Km": np.where(smap["stable"], smap["zeta_min"], np.nan)[:, :, i_ae],
+            "zeta_ae": np.where(smap["stable"], smap["zeta_min"], np.nan)[:, i_Km, :],
+            "Km_nominal": Km[i_Km], "ae_nominal": ae[i_ae],
+        }
+    return data
+
+def render_stability_map(data, mode='dark'):
+    """
+    Heatmaps of the minimum damping ratio over K x Km and K x ae
+    (unstable region in gray) from compute_stability_map data.
+    """
+    configure_plot_style(mode)
+    assets_dir = get_assets_dir(mode)
+    text_color = 'black' if mode == 'light' else 'white'
+    cmap = plt.get_cmap('viridis').copy()
+    cmap.set_bad('#808080')
+
+    for ctrl_name, smap in data.items():
+        fig, axes = plt.subplots(1, 2, figsize=(14, 6), gridspec_kw={'wspace': 0.3})
+        panels = [(smap["zeta_Km"], smap["Km"], 'Km', f'ae = {smap["ae_nominal"]:.0f}'),
+                  (smap["zeta_ae"], smap["ae"], 'ae', f'Km = {smap["Km_nominal"]:.2f}')]
+        for ax, (zeta, values, name, fixed) in zip(axes, panels):
+            mesh = ax.pcolormesh(smap["K_scale"], values, zeta.T, cmap=cmap, vmin=0, vmax=1, shading='auto')
+            ax.set_xscale('log')
+            ax.axvline(1.0, color=text_color, linestyle='--', linewidth=1)
+            ax.set_xlabel('Fator de ganho K')
+            ax.set_ylabel(name)
+            ax.set_title(fixed, color=text_color)
+        fig.colorbar(mesh, ax=axes, label='ζ mínimo dos polos')
+        fig.suptitle(f'Mapa de Estabilidade - {ctrl_name} (cinza: instável)', color=text_color)
+        plt.savefig(os.path.join(assets_dir, f'20_stability_map_{ctrl_name}.png'))
+        plt.close()
+
+def compute_robust_certificate(controllers_dict, box=None):
+    """
+    Robust stability certificate (Kharitonov / edge theorem) of each
+    controller over the plant parameter box (kharitonov.DEFAULT_BOX unless given).
+    """
+    box = kharitonov.DEFAULT_BOX if box is None else box
+    print("Caixa de parâmetros: " + ", ".join(f"{k} ∈ [{lo:g}, {hi:g}]" for k, (lo, hi) in box.items()))
+    data = {}
+    for ctrl_name, ctrl in controllers_dict.items():
+        cert = kharitonov.robust_stability_certificate(ctrl, box)
+        if cert["robust"]:
+            verdict = "ROBUSTAMENTE ESTÁVEL"
+        elif cert["exact"]:
+            point = ", ".join(f"{k}={v:.4g}" for k, v in cert["counterexample"].items())
+            verdict = f"NÃO robusto (contraexemplo: {point})"
+        else:
+            verdict = "inconclusivo"
+        print(f"{ctrl_name}: {verdict} [Kharitonov: {'ok' if cert['kharitonov'] else 'falha'}, "
+              f"arestas: {'ok' if cert['edges'] else 'falha'}]")
+        data[ctrl_name] = cert
+    return data
+
+def compute_all(sys, monte_carlo_samples=0, with_stability_map=False, with_certificate=False,
+                autotune_pid=False):
+    """
+    Compute phase: every simulation, locus and frequency response, once.
+    monte_carlo_samples > 0 adds the Monte Carlo robustness study,
+    with_stability_map the eigenvalue stability maps and with_certificate
+    the Kharitonov robust stability certificates (printed only).
+    autotune_pid replaces the hand-tuned PID gains by the best candidate of
+    the Ziegler-Nichols sweep (pid_tune.autotune).
+    Returns the data bundle consumed by render_all.
+    """
+    with profiler.stage("compute open_loop"):
+        bundle = {"open_loop": compute_open_loop(sys)}
+
+    print("\n--- Running Control Simulation ---")
+    with profiler.stage("compute p"):
+        bundle["p"] = compute_p_controller(sys)
+    with profiler.stage("compute lag"):
+        bundle["lag"] = compute_lag_controller(sys)
+    with profiler.stage("compute lead"):
+        bundle["lead"] = compute_lead_controller(sys)
+    with profiler.stage("compute lead_lag"):
+        bundle["lead_lag"] = compute_lead_lag_controller(sys)
+    pid_gains = None
+    if autotune_pid:
+        print("\n--- PID Autotune ---")
+        with profiler.stage("pid autotune"):
+            tuning = pid_tune.autotune(*freq_response.loop_polys(sys), progress=False)
+        pid_tune.print_ranking(tuning)
+        if tuning["ranked"]:
+            pid_gains = {name: tuning["ranked"][name][0] for name in pid_tune.PARAMS}
+    with profiler.stage("compute pid"):
+        bundle["pid"] = compute_pid_controller(sys, pid_gains)
+
+    Kp_p = bundle["p"]["Kp"]
+    ctrl_leadlag = bundle["lead_lag"]["ctrl"]
+    ctrl_pid = bundle["pid"]["ctrl"]
+    controllers_to_test = {
+        'Proportional': Kp_p,
+        'Lead-Lag': ctrl_leadlag,
+        'PID': ctrl_pid
+    }
+
+    # Comparative plots with Dierson's strict parameters
+    with profiler.stage("compute comparative"):
+        bundle["comparative"] = compute_comparative_plots()
+    with profiler.stage("compute robustness"):
+        bundle["robustness"] = compute_robustness(controllers_to_test)
+    with profiler.stage("compute comparative_nyquist"):
+        bundle["comparative_nyquist"] = compute_comparative_nyquist(sys, Kp_p, ctrl_leadlag, ctrl_pid)
+    if monte_carlo_samples > 0:
+        print(f"\n--- Monte Carlo Robustness ({monte_carlo_samples} plantas) ---")
+        with profiler.stage("compute monte_carlo"):
+            bundle["monte_carlo"] = compute_monte_carlo(controllers_to_test, monte_carlo_samples)
+    if with_stability_map:
+        print("\n--- Stability Map ---")
+        with profiler.stage("compute stability_map"):
+            bundle["stability_map"] = compute_stability_map(controllers_to_test)
+    if with_certificate:
+        print("\n--- Robust Stability Certificate ---")
+        with profiler.stage("compute certificate"):
+            bundle["certificate"] = compute_robust_certificate(controllers_to_test)
+    return bundle
+
+def render_all(bundle, modes=('dark', 'light'), force=False, workers=None):
+    """
+    Render phase: draws every figure of the bundle for each theme in modes,
+    as independent jobs in a process pool (workers=1 -> serial).
+    Figures whose inputs did not change since the last run are kept
+    (figure_cache manifest in each assets dir); force=True redraws all.
+    """
+    jobs = [
+        ("open_loop", render_open_loop, bundle["open_loop"]),
+        ("p", render_p_controller, bundle["p"]),
+        ("lag", render_lag_controller, bundle["lag"]),
+        ("lead", render_lead_controller, bundle["lead"]),
+        ("lead_lag", render_lead_lag_controller, bundle["lead_lag"]),
+        ("pid", render_pid_controller, bundle["pid"]),
+        ("comparative", render_comparative_plots, bundle["comparative"]),
+        ("comparative_nyquist", render_comparative_nyquist, bundle["comparative_nyquist"]),
+    ]
+    # One robustness figure per controller, each its own job
+    jobs += [(f"robustness_{ctrl_name}", render_robustness, {ctrl_name: runs})
+             for ctrl_name, runs in bundle["robustness"].items()]
+    if "monte_carlo" in bundle:
+        jobs += [(f"monte_carlo_{ctrl_name}", render_monte_carlo, {ctrl_name: mc})
+                 for ctrl_name, mc in bundle["monte_carlo"].items()]
+    if "stability_map" in bundle:
+        jobs += [(f"stability_map_{ctrl_name}", render_stability_map, {ctrl_name: smap})
+                 for ctrl_name, smap in bundle["stability_map"].items()]
+
+    print(f"\n--- Rendering {', '.join(m.upper() for m in modes)} mode ---")
+    rendered, skipped = render_jobs(jobs, modes, workers=workers, force=force)
+    if skipped:
+        print(f"Sem alterações (cache): {len(skipped)} de {len(rendered) + len(skipped)} grupos de figuras")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulações e gráficos dos controladores.")
+    parser.add_argument("--force", action="store_true",
+                        help="regenera todas as figuras, ignorando o cache")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processos para renderizar as figuras (padrão: núcleos da CPU, 1 = serial)")
+    parser.add_argument("--monte-carlo", type=int, default=0, metavar="N",
+                        help="análise de robustez Monte Carlo com N plantas por controlador (0 = desligada)")
+    parser.add_argument("--stability-map", action="store_true",
+                        help="mapas de estabilidade (autovalores) sobre ganho K x Km x ae")
+    parser.add_argument("--certify", action="store_true",
+                        help="certificado de estabilidade robusta (Kharitonov / teorema das arestas)")
+    parser.add_argument("--autotune-pid", action="store_true",
+                        help="ganhos do PID pela varredura em torno de Ziegler-Nichols (pid_tune.py)")
+    parser.add_argument("--profile", default=None, metavar="TRACE.json",
+                        help="mede cada etapa e as chamadas caras (ct, savefig...): grava o trace "
+                             "Chrome/Perfetto e um resumo .txt; renderiza em série")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="com --profile, inclui o cProfile de cada etapa no resumo")
+    args = parser.parse_args()
+
     # --- Override System with Dierson's Parameters globally ---
     # We define it here to pass to controllers, though comparison function creates its own instance to be safe
     s = ct.TransferFunction.s
@@ -727,43 +1151,27 @@ if __name__ == "__main__":
 
     if not os.path.exists('../assets/images'): os.makedirs('../assets/images')
     if not os.path.exists('../assets/report_images'): os.makedirs('../assets/report_images')
-    
-    analyze_open_loop(sys, mode='dark')
-    analyze_open_loop(sys, mode='light')
-    
-    controllers_to_test = {}
-    
-    print("\n--- Running Control Simulation in DARK mode ---")
-    configure_plot_style('dark')
-    Kp_p = design_p_controller(sys, mode='dark')
-    ctrl_lag = design_lag_controller(sys, mode='dark')
-    ctrl_lead = design_lead_controller(sys, mode='dark')
-    ctrl_leadlag = design_lead_lag_controller(sys, mode='dark')
-    ctrl_pid = design_pid_controller(sys, mode='dark')
-    
-    controllers_to_test = {
-        'Proportional': Kp_p,
-        'Lead-Lag': ctrl_leadlag,
-        'PID': ctrl_pid
-    }
-    
-    print("\n--- Running Control Simulation in LIGHT mode (Prioritizing Report Assets) ---")
-    configure_plot_style('light')
-    Kp_p = design_p_controller(sys, mode='light')
-    ctrl_lag = design_lag_controller(sys, mode='light')
-    design_lead_controller(sys, mode='light')
-    ctrl_leadlag = design_lead_lag_controller(sys, mode='light')
-    ctrl_pid = design_pid_controller(sys, mode='light')
-    
-    # Generate comparative plots with Dierson's strict parameters
-    generate_comparative_plots(sys, Kp_p, ctrl_lag, mode='dark')
-    generate_comparative_plots(sys, Kp_p, ctrl_lag, mode='light')
-
-    analyze_robustness(controllers_to_test, mode='dark')
-    analyze_robustness(controllers_to_test, mode='light')
-    
-    # Generate New Comparative Nyquist
-    generate_comparative_nyquist(sys, Kp_p, ctrl_leadlag, ctrl_pid, mode='dark')
-    generate_comparative_nyquist(sys, Kp_p, ctrl_leadlag, ctrl_pid, mode='light')
-    
+
+    if args.profile:
+        profiler.enable(cprofile=args.cprofile)
+        profiler.instrument()
+
+    # Compute once, render both asset sets (HTML dark / PDF light)
+    bundle = compute_all(sys, monte_carlo_samples=args.monte_carlo,
+                         with_stability_map=args.stability_map, with_certificate=args.certify,
+                         autotune_pid=args.autotune_pid)
+    # The render jobs are only timed in this process: serial when profiling
+    render_all(bundle, modes=('dark', 'light'), force=args.force,
+               workers=1 if args.profile else args.workers)
+
+    if args.profile:
+        profiler.uninstrument()
+        profiler.disable()
+        profiler.write_trace(args.profile)
+        report_path = os.path.splitext(args.profile)[0] + '.txt'
+        with open(report_path, 'w') as f:
+            f.write(profiler.summary() + "\n")
+        print(f"\n--- Perfil (trace: {args.profile}, resumo: {report_path}) ---")
+        print(profiler.summary(with_profiles=False))
+
     print("\nTodas as simulações e gráficos foram atualizados.")
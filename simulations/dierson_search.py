@@ -1,90 +1,215 @@
+import argparse
+from functools import partial
 import numpy as np
 import matplotlib.pyplot as plt
 import control as ctl
+from batch_eval import evaluate_lag_grid, lag_open_loop
+from margins import loop_margins
+from sweep_runner import split_chunks
+from result_store import grid_key, open_store
+from pipeline import prune, simulate, score, filter_rows, top_k
+from pareto import pareto_stream, plot_pareto, print_front
+from prefilter import prune_lag_grid, lag_velocity_constant
+from adaptive_search import feasible_K_intervals
 
 # Planta do usuário
 # G = 849/(s*(s+13.2)*(s+950))
 s = ctl.TransferFunction.s
 G = 849/(s*(s+13.2)*(s+950))
 
-print("Planta G(s) =", G)
-
 # Parâmetros do compensador lag: C(s) = (s+b)/(s+a)
 a_values = [0.01, 0.03, 0.05, 0.1, 0.3, 0.5, 1.0, 3.0, 5.0]
 # Reduced points for speed in this test, but keeping range
 K_values = np.concatenate((np.linspace(0.1, 20, 50), np.linspace(20, 250, 50)))
 
-resultados = []
+def lag_candidates(a_values, K_values, chunk_size=256):
+    """
+    Candidate generator of the (a, K) grid, in the same order as the original
+    nested loop (for a in a_values: for K in K_values), with b = 10*a:
+    yields (chunk, rows) pairs (see pipeline.py) without building the grid.
+    """
+    a_values = np.asarray(a_values, dtype=float)
+    K_values = np.asarray(K_values, dtype=float)
+    for chunk in split_chunks(len(a_values) * len(K_values), chunk_size):
+        row = np.arange(chunk.start, chunk.stop)
+        a = a_values[row // len(K_values)]
+        yield chunk, {"row": row, "a": a, "b": 10 * a, "K": K_values[row % len(K_values)]}
+
+def evaluate_chunk(a, b, K):
+    """
+    Worker job: evaluates one chunk of the grid with the vectorized evaluator
+    (batch_eval.py), directly from den_G*den_C + K*num_G*num_C, and the
+    stability margins of the open loops (margins.py).
+    Returns one row per candidate (parameters + metrics).
+    """
+    # Fixed 0-3 s grid rather than t='auto': the specs are read over that
+    # window, every chunk shares one grid, and the slow lag mode would
+    # stretch a planned horizon far past it
+    res = evaluate_lag_grid(a, b, K)
+    marg = loop_margins(*lag_open_loop(a, b, K))
+    return {"a": a, "b": b, "K": K, "Mp": res["Mp"], "ts": res["ts"],
+            "ess": res["ess"], "er_rampa_clag": res["er_ramp"], "Kv": res["Kv"],
+            "GM_db": marg["gm_db"], "PM": marg["pm"], "DM": marg["dm"], "Ms": marg["Ms"]}
+
+def run_search(a_values, K_values, workers=None, limits=None, store=None, top=5, keys=("Mp",),
+               chunk_size=256):
+    """
+    Streams the lag grid through the search pipeline (pipeline.py):
+    candidates -> analytic pre-filter -> simulation -> specs (and the
+    robustness limits, see meets_specs) -> bounded top-k by keys.
+    store: optional result_store directory receiving every simulated
+           candidate, rejected ones included (resumable).
+    Returns (best, n_found): the top tuples, best first (ties in grid
+    order), and the number of candidates that meet every spec.
+    """
+    if store is not None:
+        store = open_store(store, grid_key({"a": np.asarray(a_values, dtype=float),
+                                            "K": np.asarray(K_values, dtype=float)}), chunk_size)
+        chunk_size = store["chunk_size"]
+
+    stats = {}
+    candidates = prune(lag_candidates(a_values, K_values, chunk_size), prune_lag_grid, stats)
+    results = score(simulate(candidates, evaluate_chunk, workers, store),
+                    lambda rows: {"ok": meets_specs(rows, limits)})
+    best, n_found = top_k(filter_rows(results, lambda rows: rows["ok"]), top, keys)
+    n_kept = stats.get("candidates", 0) - stats.get("pruned", 0)
+    print(f"Pré-filtro analítico: {n_kept}/{stats.get('candidates', 0)} candidatos seguem para simulação")
+
+    return [(best["a"][i], best["b"][i], best["K"][i], best["Mp"][i], best["ts"][i], best["ess"][i],
+             best["er_rampa_clag"][i], best["Kv"][i], best["GM_db"][i], best["PM"][i], best["Ms"][i])
+            for i in range(len(best.get("row", [])))], n_found
+
+def run_pareto(a_values, K_values, objectives, workers=None, limits=None, store=None,
+               chunk_size=256, plot=None, mode='dark'):
+    """
+    Pareto mode: the same pipeline as run_search, but instead of the hard
+    spec filter and a single sort key, the non-dominated candidates over the
+    given objectives (metric columns, "-name" to maximize, see pareto.py),
+    among every candidate that passes the analytic pre-filter. Candidates
+    that also meet every spec are flagged in the "ok" column.
+    plot: optional PNG name (in assets) of the front.
+    Returns (front, n_rows).
+    """
+    if store is not None:
+        store = open_store(store, grid_key({"a": np.asarray(a_values, dtype=float),
+                                            "K": np.asarray(K_values, dtype=float)}), chunk_size)
+        chunk_size = store["chunk_size"]
+
+    stats = {}
+    candidates = prune(lag_candidates(a_values, K_values, chunk_size), prune_lag_grid, stats)
+    results = score(simulate(candidates, evaluate_chunk, workers, store),
+                    lambda rows: {"ok": meets_specs(rows, limits)})
+    front, background, n_rows = pareto_stream(results, objectives)
+    n_kept = stats.get("candidates", 0) - stats.get("pruned", 0)
+    print(f"Pré-filtro analítico: {n_kept}/{stats.get('candidates', 0)} candidatos seguem para simulação")
+    if plot and n_rows:
+        print(f"Figura: {plot_pareto(front, objectives, plot, background, highlight='ok', mode=mode)}")
+    return front, n_rows
+
+def spec_slacks(res, limits=None):
+    """
+    Signed distance of the rows of an evaluate_chunk result to every spec
+    boundary, one column per constraint (>= 0: met, NaN: not met).
+    limits: optional robustness filters, dict with any of
+            "gm_min" (dB), "pm_min" (graus), "ms_max".
+    Returns an (n, m) array.
+    """
+    # ---------- Especificações ----------
+    # 1. Overshoot (em %), 2. Tempo de acomodação 2%, 3. Erro de regime (degrau)
+    # 4. Erro de rampa (Kv)
+    # G(s) has type 1 (one integrator). Lag adds no integrators.
+    # Kv = limit s->0 s * K * C(s) * G(s)
+    # C(0) = b/a = 10.
+    # G(s) ~ 849 / (s * 13.2 * 950) = 849/(12540*s) = 0.0677/s
+    # L(s) ~ K * 10 * 0.0677 / s = 0.677*K / s
+    # Kv = 0.677 * K
+    # ess_ramp = 1/Kv
+    Mp, ts, ess = res["Mp"], res["ts"], res["ess"]
+    er_rampa_clag = res["er_rampa_clag"]
+
+    # ---------- Filtros das especificações ----------
+    columns = [
+        Mp - 5, 15 - Mp,
+        ts - 0.5, 1.0 - ts,
+        0.01 - ess,  # 1% steady state error
+        0.01 - er_rampa_clag, # This seems very strict? 1/Kv <= 0.01 => Kv >= 100. K*0.677 >= 100 => K >= 147.
+    ]
 
-print("Iniciando busca de parâmetros...")
+    # ---------- Margens de robustez (opcionais) ----------
+    limits = limits or {}
+    if limits.get("gm_min") is not None:
+        columns.append(res["GM_db"] - limits["gm_min"])
+    if limits.get("pm_min") is not None:
+        columns.append(res["PM"] - limits["pm_min"])
+    if limits.get("ms_max") is not None:
+        columns.append(limits["ms_max"] - res["Ms"])
+    return np.stack([np.asarray(c, dtype=float) for c in columns], axis=1)
 
-for a in a_values:
+def meets_specs(res, limits=None):
+    """
+    Boolean mask of the rows of an evaluate_chunk result that meet every spec
+    (see spec_slacks).
+    """
+    with np.errstate(invalid='ignore'):
+        return np.all(spec_slacks(res, limits) >= 0, axis=1)
+
+def lag_spec_slacks(a, K, limits=None):
+    """
+    spec_slacks of (a, K) pairs (b = 10*a), plus the closed-form Kv >= 100
+    bound as the first column, known for every pair. Only the stable loops
+    are simulated; the simulated columns of the others are -inf.
+    """
+    a = np.atleast_1d(np.asarray(a, dtype=float))
+    K = np.atleast_1d(np.asarray(K, dtype=float))
+    b = 10 * a
+    n_columns = 6 + sum((limits or {}).get(name) is not None for name in ("gm_min", "pm_min", "ms_max"))
+    slack = np.full((len(a), 1 + n_columns), -np.inf)
+    slack[:, 0] = lag_velocity_constant(a, b, K) - 100.0
+    stable = prune_lag_grid(a, b, K, Kv_min=-np.inf)
+    if stable.any():
+        slack[stable, 1:] = spec_slacks(evaluate_chunk(a[stable], b[stable], K[stable]), limits)
+    return slack
+
+def is_feasible(a, K, limits=None):
+    """
+    Vectorized yes/no for (a, K) pairs (b = 10*a): analytic pre-filter first,
+    time-domain evaluation only for the survivors.
+    """
+    a = np.asarray(a, dtype=float)
+    K = np.asarray(K, dtype=float)
     b = 10 * a
-    C = (s+b)/(s+a)
-    
-    # sistema compensado sem realimentação: L(s) = K * C(s) * G(s)
-    for K in K_values:
-        L = K * C * G
-        T = ctl.feedback(L, 1)  # realimentação unitária
-        
-        # resposta ao degrau
-        t, y = ctl.step_response(T)
-        
-        # ---------- Especificações ----------
-        # 1. Overshoot (em %)
-        if len(y) > 0:
-            Mp = (max(y) - 1) * 100
-        else:
-            Mp = 100 # invalid
-        
-        # 2. Tempo de acomodação 2%
-        idx = np.where(abs(y - 1) <= 0.02)[0]
-        # Check if it actually stays settled (simple check: is the last point settled?)
-        if abs(y[-1] - 1) <= 0.02 and len(idx) > 0:
-             # Find the first index where it settles and stays settled (simplified for now: just first match end)
-             # Better check: iterate backwards
-             settled_idx = len(y) - 1
-             while settled_idx >= 0 and abs(y[settled_idx] - 1) <= 0.02:
-                 settled_idx -= 1
-             ts = t[settled_idx + 1] if settled_idx + 1 < len(t) else t[-1]
-        else:
-            ts = np.inf
-        
-        # 3. Erro de regime para degrau
-        ess = abs(1 - y[-1])
-
-        # 4. Erro de rampa (Kv)
-        # G(s) has type 1 (one integrator). Lag adds no integrators.
-        # System is Type 1.
-        # Kv = limit s->0 s * K * C(s) * G(s)
-        # C(0) = b/a = 10.
-        # G(s) ~ 849 / (s * 13.2 * 950) = 849/(12540*s) = 0.0677/s
-        # L(s) ~ K * 10 * 0.0677 / s = 0.677*K / s
-        # Kv = 0.677 * K
-        # ess_ramp = 1/Kv
-        
-        Kv = K * 0.677
-        er_rampa_clag = 1/Kv if Kv > 0 else np.inf
-        
-        # ---------- Filtros das especificações ----------
-        if (
-            5 <= Mp <= 15 and
-            0.5 <= ts <= 1.0 and
-            ess <= 0.01 and  # 1% steady state error
-            er_rampa_clag <= 0.01 # This seems very strict? 1/Kv <= 0.01 => Kv >= 100. K*0.677 >= 100 => K >= 147.
-        ):
-            resultados.append((a, b, K, Mp, ts, ess, er_rampa_clag, Kv))
-
-# Exibir resultados
-if len(resultados) == 0:
-    print("\nNenhum conjunto (a, b, K) atendeu TODAS as especificações.")
-else:
-    print(f"\nSoluções encontradas: {len(resultados)}")
-    # Sort by smallest error or fastest ts
-    resultados.sort(key=lambda x: x[3]) # Sort by overshoot (Mp)
-    
-    for i, r in enumerate(resultados[:5]): # Show top 5
-        a, b, K, Mp, ts, ess, er_rampa_clag, Kv = r
+    feasible = prune_lag_grid(a, b, K)
+    if feasible.any():
+        res = evaluate_chunk(a[feasible], b[feasible], K[feasible])
+        feasible[feasible] = meets_specs(res, limits)
+    return feasible
+
+def run_adaptive_search(a_values, K_min, K_max, tol, limits=None):
+    """
+    Adaptive mode: feasible K intervals per lag pole a, to the given tolerance.
+    """
+    intervals, n_evals = feasible_K_intervals(partial(lag_spec_slacks, limits=limits), a_values, K_min, K_max, tol=tol)
+    n_uniform = len(a_values) * int(np.ceil((K_max - K_min) / tol))
+    print(f"\nAvaliações: {n_evals} (grade uniforme equivalente: {n_uniform})")
+    for a, found in intervals.items():
+        if not found:
+            print(f"a={a:.3f}: nenhum K viável")
+        for K_lo, K_hi in found:
+            print(f"a={a:.3f}, b={10*a:.3f}: K em [{K_lo:.3f}, {K_hi:.3f}] (tol={tol})")
+    return intervals
+
+def print_results(resultados, n_found=None):
+    """
+    Prints the selected solutions (run_search already ranked them).
+    n_found: number of solutions found (default len(resultados)).
+    """
+    if len(resultados) == 0:
+        print("\nNenhum conjunto (a, b, K) atendeu TODAS as especificações.")
+        return
+
+    print(f"\nSoluções encontradas: {len(resultados) if n_found is None else n_found}")
+    for i, r in enumerate(resultados):
+        a, b, K, Mp, ts, ess, er_rampa_clag, Kv, GM_db, PM, Ms = r
         print(f"\nSolução {i+1}:")
         print(f"a={a:.3f}, b={b:.3f}, K={K:.3f}")
         print(f"Overshoot Mp = {Mp:.2f}%")
@@ -92,3 +217,47 @@ else:
         print(f"Erro de regime (degrau) = {ess*100:.3f}%")
         print(f"Kv = {Kv:.5f}")
         print(f"Erro de rampa Clag = {er_rampa_clag:.5f}")
+        print(f"Margens: GM = {GM_db:.2f} dB, PM = {PM:.2f}°, Ms = {Ms:.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Busca de parâmetros do compensador lag")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processos do pool (padrão: todos os núcleos; 1 = serial)")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="busca adaptativa: intervalos viáveis de K para cada a")
+    parser.add_argument("--tol", type=float, default=0.1,
+                        help="tolerância em K da busca adaptativa")
+    parser.add_argument("--gm-min", type=float, default=None,
+                        help="margem de ganho mínima (dB)")
+    parser.add_argument("--pm-min", type=float, default=None,
+                        help="margem de fase mínima (graus)")
+    parser.add_argument("--ms-max", type=float, default=None,
+                        help="pico máximo de sensibilidade Ms")
+    parser.add_argument("--top", type=int, default=5,
+                        help="número de soluções listadas")
+    parser.add_argument("--sort-by", nargs="+", default=["Mp"],
+                        help="colunas de ordenação (ex.: Mp ts; --sort-by=-Ms para decrescente)")
+    parser.add_argument("--pareto", type=lambda text: text.split(","), default=None, metavar="OBJETIVOS",
+                        help="modo Pareto: fronteira não dominada sobre estas colunas, "
+                             "separadas por vírgula (ex.: Mp,ts,-Kv; '-' para maximizar)")
+    parser.add_argument("--pareto-plot", default="21_pareto_lag.png",
+                        help="nome do PNG da fronteira de Pareto (em assets)")
+    parser.add_argument("--store", default=None,
+                        help="diretório onde gravar todos os candidatos simulados "
+                             "(retoma uma varredura interrompida)")
+    args = parser.parse_args()
+    limits = {"gm_min": args.gm_min, "pm_min": args.pm_min, "ms_max": args.ms_max}
+
+    print("Planta G(s) =", G)
+    print("Iniciando busca de parâmetros...")
+
+    if args.pareto:
+        front, _ = run_pareto(a_values, K_values, args.pareto, workers=args.workers, limits=limits,
+                              store=args.store, plot=args.pareto_plot)
+        print_front(front, args.pareto)
+    elif args.adaptive:
+        run_adaptive_search(a_values, K_values.min(), K_values.max(), args.tol, limits)
+    else:
+        resultados, n_found = run_search(a_values, K_values, workers=args.workers, limits=limits,
+                                         store=args.store, top=args.top, keys=args.sort_by)
+        print_results(resultados, n_found)
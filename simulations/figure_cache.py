@@ -0,0 +1,234 @@
+import dis
+import hashlib
+import inspect
+import json
+import os
+from contextlib import contextmanager
+
+import numpy as np
+import matplotlib
+import matplotlib.pyplot as plt
+import control as ct
+from model import get_assets_dir
+
+# Bump to invalidate every cached figure (e.g. after changing savefig defaults)
+CACHE_VERSION = 1
+MANIFEST_NAME = 'figure_manifest.json'
+
+# Attributes that do not change the figure content: python-control names
+# systems by creation order (sys[26]), which would shift every later key
+# whenever one design adds or removes a system.
+_IGNORED_ATTRS = {'sysname', 'name'}
+
+def _feed(h, obj):
+    """
+    Canonical, order-stable serialization of render data into the hash.
+    Arrays by dtype/shape/bytes, LTI systems by their coefficients, dicts by
+    sorted key, other objects (python-control response data) by attributes.
+    """
+    if obj is None or isinstance(obj, (bool, int, float, complex, str)):
+        h.update(f"{type(obj).__name__}:{obj!r};".encode())
+    elif isinstance(obj, (np.ndarray, np.generic)):
+        arr = np.ascontiguousarray(obj)
+        if arr.dtype == object:
+            _feed(h, arr.tolist())
+        else:
+            h.update(f"nd:{arr.dtype.str}:{arr.shape};".encode())
+            h.update(arr.tobytes())
+    elif isinstance(obj, ct.TransferFunction):
+        h.update(b"tf;")
+        _feed(h, [[np.asarray(n, dtype=float) for n in row] for row in obj.num])
+        _feed(h, [[np.asarray(d, dtype=float) for d in row] for row in obj.den])
+        _feed(h, obj.dt)
+    elif isinstance(obj, ct.StateSpace):
+        h.update(b"ss;")
+        _feed(h, [np.asarray(M, dtype=float) for M in (obj.A, obj.B, obj.C, obj.D)])
+        _feed(h, obj.dt)
+    elif isinstance(obj, dict):
+        h.update(f"dict:{len(obj)};".encode())
+        for k in sorted(obj, key=str):
+            _feed(h, str(k))
+            _feed(h, obj[k])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}:{len(obj)};".encode())
+        for item in obj:
+            _feed(h, item)
+    elif hasattr(obj, '__dict__'):
+        attrs = {k: v for k, v in vars(obj).items()
+                 if not k.startswith('_') and k not in _IGNORED_ATTRS}
+        h.update(f"obj:{type(obj).__qualname__};".encode())
+        _feed(h, attrs)
+    else:
+        raise TypeError(f"cannot hash render input of type {type(obj).__name__}")
+
+def _is_local(obj, here):
+    try:
+        return os.path.dirname(os.path.abspath(inspect.getfile(obj))) == here
+    except TypeError:
+        return False
+
+def _code_objects(code):
+    """
+    A code object and those of the functions, lambdas and comprehensions
+    nested in it.
+    """
+    yield code
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            yield from _code_objects(const)
+
+def _references(code):
+    """
+    (global name, attribute or None) pairs read by a code object: bare
+    globals, and module.attr chains such as root_locus.full_view.
+    """
+    refs = set()
+    for sub in _code_objects(code):
+        previous = None
+        for ins in dis.get_instructions(sub):
+            if ins.opname in ('LOAD_GLOBAL', 'LOAD_NAME'):
+                refs.add((ins.argval, None))
+            elif ins.opname in ('LOAD_ATTR', 'LOAD_METHOD') and previous is not None \
+                    and previous.opname in ('LOAD_GLOBAL', 'LOAD_NAME'):
+                refs.add((previous.argval, ins.argval))
+            previous = ins
+    return refs
+
+def _constant_digest(value):
+    """
+    Digest of a module-level constant, or None for values _feed cannot hash.
+    """
+    h = hashlib.sha256()
+    try:
+        _feed(h, value)
+    except TypeError:
+        return None
+    return h.hexdigest()
+
+def _local_functions(fn, seen=None):
+    """
+    fn and everything of this project (not of a library) it refers to,
+    recursively: the functions it calls by global name or through a project
+    module (root_locus.full_view), and the module-level constants it reads
+    (UPPER_CASE names, e.g. ROBUSTNESS_SCENARIOS, freq_response.NYQUIST_XLIM).
+    Returns a dict qualified name -> source (functions) or digest (constants).
+    """
+    seen = {} if seen is None else seen
+    here = os.path.dirname(os.path.abspath(__file__))
+    fn = inspect.unwrap(fn)
+    key = f"{fn.__module__}.{fn.__qualname__}"
+    if key in seen:
+        return seen
+    seen[key] = inspect.getsource(fn)
+
+    def visit(module_name, name, ref):
+        if inspect.isfunction(ref):
+            if _is_local(inspect.unwrap(ref), here):
+                _local_functions(ref, seen)
+        elif name.isupper() and not name.startswith('_'):
+            digest = _constant_digest(ref)
+            if digest is not None:
+                seen[f"{module_name}.{name}"] = digest
+
+    for name, attr in _references(fn.__code__):
+        if name not in fn.__globals__:
+            continue
+        ref = fn.__globals__[name]
+        if not inspect.ismodule(ref):
+            visit(fn.__module__, name, ref)
+        elif attr is not None and _is_local(ref, here) and hasattr(ref, attr):
+            visit(ref.__name__, attr, getattr(ref, attr))
+    return seen
+
+def code_version(render_fn):
+    """
+    Fingerprint of the plotting code behind render_fn: its source, the source
+    of the project helpers it calls (configure_plot_style, plot_rlocus, ...),
+    the project constants they read and the versions of the plotting
+    libraries.
+    """
+    sources = _local_functions(render_fn)
+    h = hashlib.sha256()
+    _feed(h, [CACHE_VERSION, matplotlib.__version__, ct.__version__, np.__version__])
+    _feed(h, sources)
+    return h.hexdigest()
+
+def figure_key(render_fn, data, mode):
+    """
+    Content hash of everything a render_* call draws from: the data bundle
+    (coefficients, time/frequency grids, responses), the theme and the
+    plotting code version.
+    """
+    h = hashlib.sha256()
+    _feed(h, [render_fn.__name__, mode, code_version(render_fn)])
+    _feed(h, data)
+    return h.hexdigest()
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def load_manifest(mode):
+    path = os.path.join(get_assets_dir(mode), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(mode, manifest):
+    path = os.path.join(get_assets_dir(mode), MANIFEST_NAME)
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+@contextmanager
+def _record_savefig(saved):
+    """
+    Collects the paths written through plt.savefig while active.
+    """
+    original = plt.savefig
+    def savefig(fname, *args, **kwargs):
+        saved.append(os.path.abspath(fname))
+        return original(fname, *args, **kwargs)
+    plt.savefig = savefig
+    try:
+        yield
+    finally:
+        plt.savefig = original
+
+def is_current(entry, key, mode):
+    """
+    True if a manifest entry has the given key and all its PNGs still exist.
+    """
+    assets_dir = get_assets_dir(mode)
+    return bool(entry) and entry["key"] == key and \
+        all(os.path.exists(os.path.join(assets_dir, f)) for f in entry["files"])
+
+def render_entry(render_fn, data, mode, key):
+    """
+    Calls render_fn(data, mode) and returns its manifest entry: the key and
+    the files written, with their digests.
+    """
+    assets_dir = get_assets_dir(mode)
+    saved = []
+    with _record_savefig(saved):
+        render_fn(data, mode)
+    files = sorted({os.path.relpath(p, assets_dir) for p in saved})
+    return {"key": key, "files": {f: _file_digest(os.path.join(assets_dir, f)) for f in files}}
+
+def cached_render(render_fn, data, mode='dark', manifest=None, force=False, name=None):
+    """
+    Calls render_fn(data, mode) only if its key differs from the one in the
+    manifest or one of its recorded PNGs is missing, and updates the manifest
+    entry (name defaults to the function name).
+    Returns True if the figures were rendered, False if skipped.
+    """
+    manifest = load_manifest(mode) if manifest is None else manifest
+    name = render_fn.__name__ if name is None else name
+    key = figure_key(render_fn, data, mode)
+    if not force and is_current(manifest.get(name), key, mode):
+        return False
+    manifest[name] = render_entry(render_fn, data, mode, key)
+    return True
@@ -0,0 +1,206 @@
+import numpy as np
+import control as ct
+from residue_sim import polyval_batch
+
+# Common frequency grid of every loop (250 points per decade). Bode plots
+# use slices of it; the Nyquist contour is seeded with the indentation arc
+# around s = 0 and every NYQUIST_SEED_STEP-th of the same points, then
+# refined where the curve is visible.
+OMEGA = np.logspace(-4, 4, 2001)
+INDENT_POINTS = 10
+NYQUIST_SEED_STEP = 10
+
+# Nyquist plot window around the critical point (controllers.py)
+NYQUIST_XLIM = (-2.5, 0.5)
+NYQUIST_YLIM = (-1.5, 1.5)
+NYQUIST_VIEW_RADIUS = 1.5
+
+# (num bytes, den bytes, grid bytes) -> L evaluated on that grid
+_RESPONSE_CACHE = {}
+# (num bytes, den bytes, ds, max_turn) -> (contour, L) of the adaptive Nyquist contour
+_NYQUIST_CACHE = {}
+
+def loop_polys(sys):
+    """
+    (num, den) coefficient arrays (highest power first) of a SISO loop.
+    """
+    tf = ct.tf(sys)
+    return (np.atleast_1d(np.squeeze(tf.num[0][0])).astype(float),
+            np.atleast_1d(np.squeeze(tf.den[0][0])).astype(float))
+
+def evaluate_loops(nums, dens, s):
+    """
+    L(s) = num(s)/den(s) of a batch of loops at the complex points s, by
+    broadcast Horner evaluation. nums/dens: lists of 1-D coefficient arrays
+    (any orders). Returns (batch, len(s)).
+    """
+    s = np.asarray(s, dtype=complex)
+    m = max(max(len(n) for n in nums), max(len(d) for d in dens))
+    pad = lambda polys: np.array([np.concatenate([np.zeros(m - len(p)), p]) for p in polys])
+    s_b = np.broadcast_to(s, (len(nums), len(s)))
+    return polyval_batch(pad(nums), s_b) / polyval_batch(pad(dens), s_b)
+
+def _key(num, den, s):
+    return (num.tobytes(), den.tobytes(), np.asarray(s, dtype=complex).tobytes())
+
+def responses(systems, s):
+    """
+    Memoized L(s) of several loops at the points s: only the loops not yet
+    cached are evaluated, all in one batched call.
+    """
+    polys = [loop_polys(sys) for sys in systems]
+    keys = [_key(num, den, s) for num, den in polys]
+    missing = list(dict.fromkeys(k for k in keys if k not in _RESPONSE_CACHE))
+    if missing:
+        idx = [keys.index(k) for k in missing]
+        values = evaluate_loops([polys[i][0] for i in idx], [polys[i][1] for i in idx], s)
+        _RESPONSE_CACHE.update(zip(missing, values))
+    return [_RESPONSE_CACHE[k] for k in keys]
+
+def frequency_response(sys, omega=OMEGA):
+    """
+    Memoized L(j omega) of one loop.
+    """
+    return responses([sys], 1j * np.asarray(omega))[0]
+
+def clear_cache():
+    _RESPONSE_CACHE.clear()
+    _NYQUIST_CACHE.clear()
+
+def _band(omega_min, omega_max):
+    lo = 0 if omega_min is None else np.searchsorted(OMEGA, omega_min * (1 - 1e-12))
+    hi = len(OMEGA) if omega_max is None else np.searchsorted(OMEGA, omega_max * (1 + 1e-12), side='right')
+    return slice(lo, hi)
+
+def bode(sys, omega_min=None, omega_max=None):
+    """
+    Bode data on the slice [omega_min, omega_max] of the common grid.
+    Phase unwrapped from the lowest frequency of the grid.
+    Returns (omega, mag_db, phase_deg).
+    """
+    L = frequency_response(sys)
+    band = _band(omega_min, omega_max)
+    phase = np.degrees(np.unwrap(np.angle(L)))
+    return OMEGA[band], 20 * np.log10(np.abs(L[band])), phase[band]
+
+def _contour_points(u, indent):
+    """
+    Points of the upper half of the Nyquist D contour at the path parameter
+    u: 0 <= u < 1 is the quarter circle of radius OMEGA[0] to the right of
+    s = 0 (indent) or the segment [0, j*OMEGA[0]], u >= 1 is j*OMEGA[0]*10**(u-1).
+    """
+    r = OMEGA[0]
+    start = r * np.exp(0.5j * np.pi * u) if indent else 1j * r * u
+    return np.where(u < 1, start, 1j * r * 10.0 ** (u - 1))
+
+def nyquist_contour(sys):
+    """
+    Seed of the adaptive Nyquist contour: (u, s) of INDENT_POINTS points on
+    the indentation around s = 0 (or the segment from s = 0 when there is no
+    pole at the origin) and every NYQUIST_SEED_STEP-th point of the common
+    grid.
+    """
+    _, den = loop_polys(sys)
+    u = np.concatenate([np.linspace(0, 1, INDENT_POINTS, endpoint=False),
+                        1 + np.log10(OMEGA[::NYQUIST_SEED_STEP] / OMEGA[0])])
+    return u, _contour_points(u, den[-1] == 0)
+
+def _view_map(L):
+    """
+    L-plane compressed around the critical point: distances near -1 are kept,
+    the part of the plane outside the plot window shrinks to a ring.
+    """
+    z = L + 1
+    return z / (1 + np.abs(z) / NYQUIST_VIEW_RADIUS)
+
+def _coarse_segments(L, ds, max_turn):
+    """
+    Contour segments to refine: too long in the view map (arc length), or
+    whose ends turn by more than max_turn radians (curvature), or along
+    which 1+L turns by more than max_turn (winding count).
+    """
+    w = _view_map(L)
+    chord = np.abs(np.diff(w))
+    coarse = chord > ds
+    with np.errstate(invalid='ignore'):
+        turn = np.abs(np.angle(w[2:] - w[1:-1]) - np.angle(w[1:-1] - w[:-2]))
+    turn = np.minimum(turn, 2 * np.pi - turn)
+    # Curvature: refine both segments around a sharp turn, unless already short
+    bent = (turn > max_turn) & (np.minimum(chord[1:], chord[:-1]) > 1e-3 * ds)
+    coarse[:-1] |= bent
+    coarse[1:] |= bent
+    coarse |= np.abs(np.angle((1 + L[1:]) / (1 + L[:-1]))) > max_turn
+    return np.flatnonzero(coarse)
+
+def encirclements(L):
+    """
+    Clockwise encirclements of -1 by the full Nyquist curve, from the upper
+    half L (the lower half is its mirror image, the infinite arc maps to
+    L = 0 for a strictly proper loop): the winding of 1+L, summed over the
+    contour segments, which the sampling keeps below max_turn each.
+    """
+    turns = np.angle((1 + L[1:]) / (1 + L[:-1]))
+    return int(np.round(-2 * np.sum(turns) / (2 * np.pi)))
+
+def nyquist(sys, ds=0.02, max_turn=0.1, max_points=20000):
+    """
+    Memoized Nyquist response (ct.NyquistResponseData, accepted by
+    ct.nyquist_plot) on an adaptive contour.
+
+    Starts from nyquist_contour (the common-grid points come from the shared
+    evaluation) and bisects, in the path parameter, every segment that is
+    longer than ds in the compressed L-plane of _view_map or turns by more
+    than max_turn, evaluating the new points in one batched call per pass.
+    The points end up on the part of the curve inside the plot window and on
+    its bends, not on the blow-up of the integrator.
+    The count of clockwise encirclements of -1 is the winding number of 1+L
+    along the final contour (encirclements).
+    """
+    num, den = loop_polys(sys)
+    key = (num.tobytes(), den.tobytes(), ds, max_turn)
+    if key not in _NYQUIST_CACHE:
+        indent = den[-1] == 0
+        u, contour = nyquist_contour(sys)
+        n_arc = len(u) - len(OMEGA[::NYQUIST_SEED_STEP])
+        L = np.concatenate([responses([sys], contour[:n_arc])[0],
+                            frequency_response(sys)[::NYQUIST_SEED_STEP]])
+        while len(u) < max_points:
+            coarse = _coarse_segments(L, ds, max_turn)[:max_points - len(u)]
+            if not len(coarse):
+                break
+            u_new = 0.5 * (u[coarse] + u[coarse + 1])
+            L_new = evaluate_loops([num], [den], _contour_points(u_new, indent))[0]
+            u = np.insert(u, coarse + 1, u_new)
+            L = np.insert(L, coarse + 1, L_new)
+        _NYQUIST_CACHE[key] = (_contour_points(u, indent), L)
+    contour, L = _NYQUIST_CACHE[key]
+    return ct.freqplot.NyquistResponseData(encirclements(L), contour, L, 0, sysname=sys.name)
+
+def nyquist_stability(sys):
+    """
+    Nyquist criterion for the unity-feedback loop: (N, P, Z) with N the
+    clockwise encirclements of -1, P the open-loop poles in the open right
+    half-plane and Z = N + P the closed-loop ones.
+    """
+    _, den = loop_polys(sys)
+    N = nyquist(sys).count
+    P = int(np.sum(np.roots(den).real > 0))
+    return N, P, N + P
+
+def margins(sys):
+    """
+    Gain, phase and delay margins and sensitivity peak of one loop
+    (margins.loop_margins), bracketed on the memoized evaluation.
+    """
+    from margins import loop_margins
+    num, den = loop_polys(sys)
+    result = loop_margins([num], [den], OMEGA, frequency_response(sys)[None, :])
+    return {key: value[0] for key, value in result.items()}
+
+def sensitivity(sys):
+    """
+    Sensitivity S = 1/(1+L) and complementary sensitivity T = L/(1+L) on
+    the common grid, from the shared evaluation. Returns (omega, S, T).
+    """
+    L = frequency_response(sys)
+    return OMEGA, 1 / (1 + L), L / (1 + L)
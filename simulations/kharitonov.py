@@ -0,0 +1,140 @@
+import itertools
+import numpy as np
+from prefilter import routh_hurwitz_stable
+from monte_carlo import controller_polys, plant_closed_loop
+
+# Parameter box of the robustness plant G = Km*772 / (s (s + am) (s + ae)),
+# spanning the hand-picked scenarios ("Nominal", "Pesado", "Agressivo")
+DEFAULT_BOX = {"Km": (0.8, 1.2), "am": (10.0, 15.0), "ae": (800.0, 1100.0)}
+
+# Ascending-power pattern (period 4) of lower (0) / upper (1) bounds of
+# the four Kharitonov polynomials
+_KHARITONOV_PATTERNS = [(0, 0, 1, 1), (1, 1, 0, 0), (0, 1, 1, 0), (1, 0, 0, 1)]
+
+def kharitonov_polynomials(lower, upper):
+    """
+    The four Kharitonov polynomials of the interval polynomial with
+    coefficients in [lower, upper] (highest power first). Returns (4, n+1).
+    """
+    lower, upper = np.asarray(lower, dtype=float), np.asarray(upper, dtype=float)
+    n1 = len(lower)
+    polys = np.empty((4, n1))
+    for i, pattern in enumerate(_KHARITONOV_PATTERNS):
+        # Power k of s is column n1-1-k
+        use_upper = np.array([pattern[k % 4] for k in range(n1)])[::-1].astype(bool)
+        polys[i] = np.where(use_upper, upper, lower)
+    return polys
+
+def hurwitz_matrix(den):
+    """
+    Hurwitz matrices H[i, j] = a_{2j-i} (1-based, a_0 the leading coefficient)
+    of a batch of polynomials den (batch, n+1). Returns (batch, n, n).
+    """
+    den = np.atleast_2d(np.asarray(den, dtype=float))
+    batch, n1 = den.shape
+    n = n1 - 1
+    i, j = np.meshgrid(np.arange(1, n + 1), np.arange(1, n + 1), indexing='ij')
+    k = 2 * j - i
+    valid = (k >= 0) & (k <= n)
+    H = np.zeros((batch, n, n))
+    H[:, valid] = den[:, k[valid]]
+    return H
+
+def segment_stable(p0, p1):
+    """
+    Bialas' test, exact for a batch of polynomial segments
+    (1-l) p0 + l p1, l in [0, 1], of constant degree: every polynomial of
+    the segment is Hurwitz iff both ends are and H(p0)^-1 H(p1) has no real
+    non-positive eigenvalue.
+    Returns (stable, l_cross): l_cross is the first l at which a root
+    reaches the imaginary axis (nan where the segment is stable or an end
+    is unstable).
+    """
+    p0, p1 = np.atleast_2d(p0), np.atleast_2d(p1)
+    ends = routh_hurwitz_stable(p0) & routh_hurwitz_stable(p1)
+    l_cross = np.full(len(p0), np.nan)
+    if not ends.any():
+        return ends, l_cross
+
+    mu = np.linalg.eigvals(np.linalg.solve(hurwitz_matrix(p0[ends]), hurwitz_matrix(p1[ends])))
+    real_neg = (np.abs(mu.imag) <= 1e-9 * np.maximum(np.abs(mu), 1.0)) & (mu.real <= 0)
+    # H((1-l) p0 + l p1) = (1-l) H0 (I + l/(1-l) H0^-1 H1) is singular at l = 1/(1-mu)
+    with np.errstate(divide='ignore'):
+        cross = np.where(real_neg, 1.0 / (1.0 - mu.real), np.inf).min(axis=1)
+    stable = ends.copy()
+    stable[ends] = ~real_neg.any(axis=1)
+    l_cross[np.flatnonzero(ends)[np.isfinite(cross)]] = cross[np.isfinite(cross)]
+    return stable, l_cross
+
+def _image_convex(am, ae):
+    """
+    True if the image of the (am, ae) rectangle under (am+ae, am*ae) is
+    convex. Its edges are straight (one parameter fixed -> affine in the
+    other), so the image is a quadrilateral: convex iff the cross products
+    along its boundary all have the same sign.
+    """
+    corners = [(am[0], ae[0]), (am[1], ae[0]), (am[1], ae[1]), (am[0], ae[1])]
+    q = np.array([(a + e, a * e) for a, e in corners])
+    d = np.roll(q, -1, axis=0) - q
+    cross = d[:, 0] * np.roll(d, -1, axis=0)[:, 1] - d[:, 1] * np.roll(d, -1, axis=0)[:, 0]
+    return bool(np.all(cross > 0) or np.all(cross < 0))
+
+def robust_stability_certificate(ctrl, box=None):
+    """
+    Robust stability of ctrl with every plant of the parameter box (dict
+    name -> (low, high) for Km, am, ae), without sampling.
+
+    The characteristic polynomial Dc*s(s+am)(s+ae) + Nc*772*Km has
+    coefficients affine in (Km, am+ae, am*ae), i.e. multilinear in the
+    parameters:
+    1. Coefficient bounds are exact at the 8 box vertices, and the four
+       Kharitonov polynomials of that interval family are tested. Passing is
+       sufficient (the intervals over-bound the dependent coefficients).
+    2. Edge theorem: in (Km, am+ae, am*ae) the family is the prism over the
+       image of the (am, ae) rectangle, a polytope whose edges are the 12
+       box edges. When that image is convex, the family is stable iff all
+       12 edge segments are (Bialas test) - an exact yes/no answer.
+       Otherwise all 28 vertex pairs are tested (conservative).
+
+    Returns a dict with "robust", "exact" (False only for an inconclusive
+    "no" of the conservative fallback), "kharitonov" (step 1 result),
+    "edges" (step 2 result), "coeff_bounds" (lower, upper) and
+    "counterexample" (a parameter point where a root reaches the imaginary
+    axis, or an unstable vertex; None if robust).
+    """
+    box = DEFAULT_BOX if box is None else box
+    names = ("Km", "am", "ae")
+    num_c, den_c = controller_polys(ctrl)
+
+    corners = np.array(list(itertools.product(*[box[name] for name in names])))
+    _, vertex_polys = plant_closed_loop(num_c, den_c, *corners.T)
+    lower, upper = vertex_polys.min(axis=0), vertex_polys.max(axis=0)
+    kharitonov_ok = bool(routh_hurwitz_stable(kharitonov_polynomials(lower, upper)).all())
+
+    convex = _image_convex(box["am"], box["ae"])
+    pairs = [(i, j) for i, j in itertools.combinations(range(len(corners)), 2)
+             if not convex or np.count_nonzero(corners[i] != corners[j]) == 1]
+    i0, i1 = np.array(pairs).T
+    edges_stable, l_cross = segment_stable(vertex_polys[i0], vertex_polys[i1])
+    edges_ok = bool(edges_stable.all())
+
+    # A "yes" from either test is a certificate; a "no" is exact when an
+    # unstable plant was found (a vertex, or a crossing on a box edge)
+    counterexample = None
+    vertex_ok = routh_hurwitz_stable(vertex_polys)
+    if not vertex_ok.all():
+        counterexample = dict(zip(names, corners[np.argmin(vertex_ok)]))
+    elif not edges_ok and convex:
+        k = np.nanargmin(np.where(edges_stable, np.nan, l_cross))
+        point = (1 - l_cross[k]) * corners[i0[k]] + l_cross[k] * corners[i1[k]]
+        counterexample = dict(zip(names, point))
+
+    robust = kharitonov_ok or edges_ok
+    return {
+        "robust": robust,
+        "exact": robust or counterexample is not None,
+        "kharitonov": kharitonov_ok,
+        "edges": edges_ok,
+        "coeff_bounds": (lower, upper),
+        "counterexample": counterexample,
+    }
@@ -0,0 +1,311 @@
+import argparse
+import numpy as np
+import control as ct
+from batch_eval import poly_mul, poly_add, DEN_G
+from prefilter import routh_hurwitz_stable
+from residue_sim import residue_response, closed_loop_poles
+from step_metrics import step_metrics
+from margins import loop_margins
+
+# Plant of model.define_system: G(s) = 1.2 / (s * (s + 13.2) * (s + 950))
+MODEL_NUM_G = np.array([1.2])
+MODEL_DEN_G = DEN_G
+
+# C(s) = K * (s + z_lead)/(s + p_lead) * (s + z_lag)/(s + p_lag)
+PARAMS = ("K", "z_lead", "p_lead", "z_lag", "p_lag")
+
+# Hand-tuned design of controllers.compute_lead_lag_controller
+HAND_TUNED = {"K": 1000.0, "z_lead": 20.0, "p_lead": 100.0, "z_lag": 0.1, "p_lag": 0.01}
+
+# Search box (the optimizer works on log10 of the parameters)
+BOUNDS = {"K": (1.0, 1e8), "z_lead": (0.1, 1e3), "p_lead": (1.0, 1e4),
+          "z_lag": (1e-3, 10.0), "p_lag": (1e-4, 1.0)}
+
+# Course specs: 5-15% overshoot, 0.5-1.0 s settling time (2%), step error
+# <= 1%, Kv >= 100
+SPECS = {"Mp": (5.0, 15.0), "ts": (0.5, 1.0), "ess_max": 0.01, "Kv_min": 100.0}
+
+# Largest pole/zero ratio of each section (p_lead/z_lead and z_lag/p_lag),
+# beyond which the section is no longer a practical lead or lag network
+RATIO_MAX = 20.0
+
+# Grid for Ms: 250 points per decade, two decades above freq_response.OMEGA
+# so that the peak of fast loops is bracketed too
+OMEGA_MS = np.logspace(-4, 6, 2501)
+
+# Cost of a design that misses a spec: above any feasible Ms
+INFEASIBLE_COST = 10.0
+
+def lead_lag_open_loop(params, num_G=MODEL_NUM_G, den_G=MODEL_DEN_G):
+    """
+    Open-loop polynomials of L = C*G for a batch of (K, z_lead, p_lead,
+    z_lag, p_lag) rows. Returns (num_open, den_open), (batch, m).
+    """
+    K, z_lead, p_lead, z_lag, p_lag = np.atleast_2d(params).T
+    ones = np.ones_like(K)
+    num_C = K[:, None] * poly_mul(np.stack([ones, z_lead], axis=-1), np.stack([ones, z_lag], axis=-1))
+    den_C = poly_mul(np.stack([ones, p_lead], axis=-1), np.stack([ones, p_lag], axis=-1))
+    return poly_mul(num_G[None, :], num_C), poly_mul(den_G[None, :], den_C)
+
+def spec_violation(Mp, ts, ess, Kv, stable, t_end, specs=None):
+    """
+    Total normalized violation of the course specs by a batch of closed
+    loops (0 where every spec is met), graded so that a search is driven
+    towards the feasible region:
+    - Mp, ts: distance to their range, relative to the range ends (an
+      unsettled response counts as ts = 2*t_end)
+    - ess: relative excess over ess_max
+    - Kv: decades below Kv_min
+    Unstable rows only get the Kv term (their metrics are meaningless).
+    """
+    specs = SPECS if specs is None else specs
+    (Mp_lo, Mp_hi), (ts_lo, ts_hi) = specs["Mp"], specs["ts"]
+    ts_capped = np.where(np.isfinite(ts), ts, 2 * t_end)
+    with np.errstate(invalid='ignore'):
+        violation = (np.maximum(0, Mp_lo - Mp) / Mp_lo + np.maximum(0, Mp - Mp_hi) / Mp_hi +
+                     np.maximum(0, ts_lo - ts_capped) / ts_lo + np.maximum(0, ts_capped - ts_hi) / ts_hi +
+                     np.maximum(0, ess - specs["ess_max"]) / specs["ess_max"])
+    violation = np.where(stable, violation, 0.0)
+    with np.errstate(divide='ignore'):
+        violation += np.maximum(0, np.log10(specs["Kv_min"] / Kv))
+    return violation
+
+def evaluate_lead_lag(params, num_G=MODEL_NUM_G, den_G=MODEL_DEN_G, t=None, specs=None):
+    """
+    Metrics and cost of a whole population of lead-lag controllers at once.
+
+    Stability comes from the Routh-Hurwitz test on every characteristic
+    polynomial; only the stable loops are simulated (closed-form residue
+    response) and get their sensitivity peak (margins.loop_margins).
+
+    The cost is Ms for designs meeting every spec, otherwise
+    INFEASIBLE_COST plus the total normalized violation: spec_violation,
+    plus
+    - structure: decades by which p_lead/z_lead and z_lag/p_lag leave
+      [1, RATIO_MAX] (a lead and a lag section of practical size)
+    - unstable loops: 10 plus the log of the largest real part of the poles
+
+    Returns a dict of (batch,) arrays: Mp, ts, ess, Kv, Ms, stable,
+    violation, cost.
+    """
+    t = np.linspace(0, 3, 1501) if t is None else np.asarray(t, dtype=float)
+    params = np.atleast_2d(np.asarray(params, dtype=float))
+    K, z_lead, p_lead, z_lag, p_lag = params.T
+    batch = len(params)
+
+    num_open, den_open = lead_lag_open_loop(params, num_G, den_G)
+    den_cl = poly_add(den_open, num_open)
+    num_cl = poly_add(np.zeros_like(den_cl), num_open)
+    num_cl, den_cl = num_cl / den_cl[:, :1], den_cl / den_cl[:, :1]
+
+    stable = routh_hurwitz_stable(den_cl)
+    idx = np.flatnonzero(stable)
+    Mp, ts, ess, Ms = (np.full(batch, np.nan) for _ in range(4))
+    if len(idx):
+        metrics = step_metrics(t, residue_response(num_cl[idx], den_cl[idx], t, 'step'), reference=1.0)
+        Mp[idx], ts[idx], ess[idx] = metrics["Mp"], metrics["ts"], metrics["ess"]
+        Ms[idx] = loop_margins(num_open[idx], den_open[idx], OMEGA_MS)["Ms"]
+
+    # Type 1 loop: Kv = lim s->0 s*C(s)*G(s)
+    Kv = K * (z_lead * z_lag) / (p_lead * p_lag) * num_G[-1] / den_G[-2]
+
+    violation = spec_violation(Mp, ts, ess, Kv, stable, t[-1], specs)
+    for ratio in (p_lead / z_lead, z_lag / p_lag):
+        violation += np.maximum(0, -np.log10(ratio)) + np.maximum(0, np.log10(ratio / RATIO_MAX))
+
+    unstable = np.flatnonzero(~stable)
+    if len(unstable):
+        alpha = closed_loop_poles(den_cl[unstable]).real.max(axis=1)
+        violation[unstable] += 10 + np.log1p(np.maximum(alpha, 0))
+
+    cost = np.where(violation > 0, INFEASIBLE_COST + violation, Ms)
+    return {"Mp": Mp, "ts": ts, "ess": ess, "Kv": Kv, "Ms": Ms, "stable": stable,
+            "violation": violation, "cost": cost}
+
+def _log_bounds():
+    return np.log10(np.array([BOUNDS[name] for name in PARAMS])).T
+
+def _cma_es(fun, x0, sigma0, popsize, max_generations, rng, record, tol=1e-6):
+    """
+    (mu/mu_w, lambda) CMA-ES with cumulative step-size adaptation and rank-one
+    plus rank-mu covariance updates. Each generation is one batched call
+    fun(X) -> costs; record(best cost, median cost, sigma) logs the
+    generation. Returns (best x, best cost).
+    """
+    n = len(x0)
+    lo, hi = _log_bounds()
+    mu = popsize // 2
+    weights = np.log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+    weights /= weights.sum()
+    mu_eff = 1 / np.sum(weights ** 2)
+
+    c_sigma = (mu_eff + 2) / (n + mu_eff + 5)
+    d_sigma = 1 + 2 * max(0, np.sqrt((mu_eff - 1) / (n + 1)) - 1) + c_sigma
+    c_c = (4 + mu_eff / n) / (n + 4 + 2 * mu_eff / n)
+    c_1 = 2 / ((n + 1.3) ** 2 + mu_eff)
+    c_mu = min(1 - c_1, 2 * (mu_eff - 2 + 1 / mu_eff) / ((n + 2) ** 2 + mu_eff))
+    chi_n = np.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+
+    mean, sigma = np.asarray(x0, dtype=float), sigma0
+    C, p_sigma, p_c = np.eye(n), np.zeros(n), np.zeros(n)
+    best_x, best_cost = mean.copy(), np.inf
+    for gen in range(max_generations):
+        eigval, B = np.linalg.eigh(C)
+        D = np.sqrt(np.maximum(eigval, 1e-20))
+        z = rng.standard_normal((popsize, n))
+        X = np.clip(mean + sigma * (z * D) @ B.T, lo, hi)
+        costs = fun(X)
+
+        order = np.argsort(costs)
+        if costs[order[0]] < best_cost:
+            best_x, best_cost = X[order[0]].copy(), costs[order[0]]
+        record(best_cost, np.median(costs), sigma)
+
+        # Steps of the selected points, after clipping to the box
+        y = (X[order[:mu]] - mean) / sigma
+        y_w = weights @ y
+        mean = mean + sigma * y_w
+
+        C_inv_sqrt = B @ np.diag(1 / D) @ B.T
+        p_sigma = (1 - c_sigma) * p_sigma + np.sqrt(c_sigma * (2 - c_sigma) * mu_eff) * C_inv_sqrt @ y_w
+        h_sigma = (np.linalg.norm(p_sigma) / np.sqrt(1 - (1 - c_sigma) ** (2 * (gen + 1)))
+                   < (1.4 + 2 / (n + 1)) * chi_n)
+        p_c = (1 - c_c) * p_c + h_sigma * np.sqrt(c_c * (2 - c_c) * mu_eff) * y_w
+        rank_mu = (weights[:, None] * y).T @ y
+        C = ((1 - c_1 - c_mu) * C + c_1 * (np.outer(p_c, p_c) + (1 - h_sigma) * c_c * (2 - c_c) * C)
+             + c_mu * rank_mu)
+        sigma *= np.exp((c_sigma / d_sigma) * (np.linalg.norm(p_sigma) / chi_n - 1))
+        if sigma * np.sqrt(eigval.max()) < tol:
+            break
+    return best_x, best_cost
+
+def _nelder_mead(fun, x0, step, max_iterations, record, tol=1e-8):
+    """
+    Nelder-Mead simplex search; the reflection, expansion and both
+    contraction points of an iteration are evaluated in one batched call
+    (as are the points of a shrink); record(best cost, median cost, simplex
+    size) logs the iteration. Returns (best x, best cost).
+    """
+    n = len(x0)
+    lo, hi = _log_bounds()
+    simplex = np.clip(np.vstack([x0, x0 + step * np.eye(n)]), lo, hi)
+    costs = fun(simplex)
+    for _ in range(max_iterations):
+        order = np.argsort(costs)
+        simplex, costs = simplex[order], costs[order]
+        size = np.max(np.abs(simplex[1:] - simplex[0]))
+        record(costs[0], np.median(costs), size)
+        if size < tol:
+            break
+
+        centroid = simplex[:-1].mean(axis=0)
+        worst = simplex[-1]
+        # reflection, expansion, outside and inside contraction
+        trial = np.clip(centroid + np.array([1.0, 2.0, 0.5, -0.5])[:, None] * (centroid - worst), lo, hi)
+        f_r, f_e, f_oc, f_ic = fun(trial)
+        if f_r < costs[0]:
+            new = (trial[1], f_e) if f_e < f_r else (trial[0], f_r)
+        elif f_r < costs[-2]:
+            new = (trial[0], f_r)
+        elif f_r < costs[-1] and f_oc <= f_r:
+            new = (trial[2], f_oc)
+        elif f_r >= costs[-1] and f_ic < costs[-1]:
+            new = (trial[3], f_ic)
+        else:
+            # Shrink towards the best vertex
+            simplex[1:] = simplex[0] + 0.5 * (simplex[1:] - simplex[0])
+            costs[1:] = fun(simplex[1:])
+            continue
+        simplex[-1], costs[-1] = new
+    best = np.argmin(costs)
+    return simplex[best], costs[best]
+
+def optimize_lead_lag(x0=None, num_G=MODEL_NUM_G, den_G=MODEL_DEN_G, method='both', popsize=32,
+                      max_generations=200, nm_iterations=300, sigma0=0.5, seed=0, specs=None, t=None):
+    """
+    Derivative-free search of (K, z_lead, p_lead, z_lag, p_lag) under the
+    course specs, in log10 of the parameters (inside BOUNDS), minimizing
+    the cost of evaluate_lead_lag: the sensitivity peak Ms of the designs
+    that meet every spec.
+
+    method: 'cma' (CMA-ES, one batched evaluation of popsize controllers per
+            generation), 'nelder-mead' (simplex from x0) or 'both' (CMA-ES,
+            then Nelder-Mead polishing from its best point).
+    x0: dict of starting parameters (default: HAND_TUNED).
+
+    Returns a dict with:
+    params   - best parameters (dict)
+    ctrl     - best controller (ct.TransferFunction)
+    metrics  - Mp, ts, ess, Kv, Ms of the best controller
+    feasible - whether it meets every spec
+    history  - per generation/iteration arrays: evals (cumulative), best_cost,
+               median_cost (population or simplex), step (sigma or simplex
+               size) and stage ('cma' or 'nelder-mead')
+    """
+    if method not in ('cma', 'nelder-mead', 'both'):
+        raise ValueError(f"method must be 'cma', 'nelder-mead' or 'both', not {method!r}")
+    x0 = HAND_TUNED if x0 is None else x0
+    x = np.log10([x0[name] for name in PARAMS])
+    rng = np.random.default_rng(seed)
+
+    state = {"evals": 0, "stage": method}
+    history = {"evals": [], "best_cost": [], "median_cost": [], "step": [], "stage": []}
+    def fun(X):
+        state["evals"] += len(X)
+        return evaluate_lead_lag(10.0 ** X, num_G, den_G, t, specs)["cost"]
+    def record(best_cost, median_cost, step):
+        for key, value in zip(history, (state["evals"], best_cost, median_cost, step, state["stage"])):
+            history[key].append(value)
+
+    if method in ('cma', 'both'):
+        state["stage"] = 'cma'
+        x, _ = _cma_es(fun, x, sigma0, popsize, max_generations, rng, record)
+    if method in ('nelder-mead', 'both'):
+        state["stage"] = 'nelder-mead'
+        x, _ = _nelder_mead(fun, x, 0.1 if method == 'both' else sigma0, nm_iterations, record)
+
+    params = dict(zip(PARAMS, 10.0 ** x))
+    res = evaluate_lead_lag(10.0 ** x, num_G, den_G, t, specs)
+    ctrl = (params["K"] * ct.tf([1, params["z_lead"]], [1, params["p_lead"]])
+            * ct.tf([1, params["z_lag"]], [1, params["p_lag"]]))
+    return {
+        "params": params,
+        "ctrl": ctrl,
+        "metrics": {key: res[key][0] for key in ("Mp", "ts", "ess", "Kv", "Ms")},
+        "feasible": bool(res["violation"][0] == 0),
+        "cost": res["cost"][0],
+        "history": {key: np.array(values) for key, values in history.items()},
+    }
+
+def print_result(name, params, metrics):
+    """
+    Text summary of one lead-lag design.
+    """
+    print(f"{name}: " + ", ".join(f"{key}={params[key]:.4g}" for key in PARAMS))
+    print(f"  Mp = {metrics['Mp']:.2f}%, ts = {metrics['ts']:.3f} s, erro = {100 * metrics['ess']:.3f}%, "
+          f"Kv = {metrics['Kv']:.2f}, Ms = {metrics['Ms']:.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Otimização dos parâmetros do compensador lead-lag")
+    parser.add_argument("--method", choices=('cma', 'nelder-mead', 'both'), default='both',
+                        help="CMA-ES, Nelder-Mead ou CMA-ES seguido de Nelder-Mead")
+    parser.add_argument("--popsize", type=int, default=32,
+                        help="controladores avaliados por geração (CMA-ES)")
+    parser.add_argument("--generations", type=int, default=200,
+                        help="máximo de gerações do CMA-ES")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    hand = evaluate_lead_lag(np.array([[HAND_TUNED[name] for name in PARAMS]]))
+    print_result("Ajuste manual", HAND_TUNED, {key: hand[key][0] for key in ("Mp", "ts", "ess", "Kv", "Ms")})
+
+    result = optimize_lead_lag(method=args.method, popsize=args.popsize,
+                               max_generations=args.generations, seed=args.seed)
+    print_result("Otimizado", result["params"], result["metrics"])
+    print(f"  Especificações atendidas: {'sim' if result['feasible'] else 'não'}")
+    h = result["history"]
+    print(f"  {h['evals'][-1]} avaliações; custo por etapa:")
+    for stage in dict.fromkeys(h["stage"]):
+        sel = h["stage"] == stage
+        print(f"    {stage}: {h['best_cost'][sel][0]:.4f} -> {h['best_cost'][sel][-1]:.4f} "
+              f"({np.count_nonzero(sel)} iterações)")
@@ -0,0 +1,159 @@
+import numpy as np
+from residue_sim import polyval_batch, polyder_batch
+
+def _pad(polys):
+    """
+    Right-aligned (batch, m) coefficient array from a (batch, k) array or a
+    list of 1-D arrays of any orders.
+    """
+    if isinstance(polys, np.ndarray) and polys.ndim == 2:
+        return polys.astype(float)
+    m = max(len(p) for p in polys)
+    return np.array([np.concatenate([np.zeros(m - len(p)), np.asarray(p, dtype=float)]) for p in polys])
+
+def _derivatives(num, den, rows, w):
+    """
+    L, dL/ds and d2L/ds2 at s = j*w for the loops num[rows]/den[rows]
+    (one point per entry of rows).
+    """
+    s = (1j * w)[:, None]
+    n0, d0 = num[rows], den[rows]
+    n1, d1 = polyder_batch(n0), polyder_batch(d0)
+    n2, d2 = polyder_batch(n1), polyder_batch(d1)
+    N, D = polyval_batch(n0, s)[:, 0], polyval_batch(d0, s)[:, 0]
+    N1, D1 = polyval_batch(n1, s)[:, 0], polyval_batch(d1, s)[:, 0]
+    N2 = polyval_batch(n2, s)[:, 0] if n2.shape[1] else np.zeros_like(N)
+    D2 = polyval_batch(d2, s)[:, 0] if d2.shape[1] else np.zeros_like(D)
+    L = N / D
+    L1 = (N1 - L * D1) / D
+    L2 = (N2 - 2 * L1 * D1 - L * D2) / D
+    return L, L1, L2
+
+def _newton(fun, rows, lo, hi, f_lo, iters):
+    """
+    Safeguarded Newton in w for a batch of brackets [lo, hi] with a sign
+    change: fun(rows, w) -> (f, df/dw). A step leaving the bracket is
+    replaced by bisection (in log w); the bracket shrinks every iteration.
+    Converged entries are frozen.
+    """
+    w = np.sqrt(lo * hi)
+    for _ in range(iters):
+        f, df = fun(rows, w)
+        same = np.sign(f) == np.sign(f_lo)
+        lo, hi = np.where(same, w, lo), np.where(same, hi, w)
+        f_lo = np.where(same, f, f_lo)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = f / df
+        w_new = w - step
+        # Converged entries stay put (w sits on a bracket end by then)
+        converged = np.abs(step) <= 1e-14 * w
+        outside = ~np.isfinite(w_new) | (w_new < lo) | (w_new > hi)
+        w = np.where(converged, w, np.where(outside, np.sqrt(lo * hi), w_new))
+    return w
+
+def _row_min(rows, values, n_rows, *extra):
+    """
+    Per-row minimum of values (inf for rows without entries) and the
+    matching entries of each array in extra (nan if none).
+    """
+    best = np.full(n_rows, np.inf)
+    out = [np.full(n_rows, np.nan) for _ in extra]
+    if len(rows):
+        order = np.lexsort((values, rows))
+        first = order[np.unique(rows[order], return_index=True)[1]]
+        best[rows[first]] = values[first]
+        for o, e in zip(out, extra):
+            o[rows[first]] = e[first]
+    return (best, *out)
+
+def loop_margins(num, den, omega=None, L=None, newton_iter=12):
+    """
+    Stability margins of a batch of open loops L = num/den, all at once.
+
+    num, den: (batch, m) arrays or lists of 1-D coefficient arrays.
+    omega: frequency grid used to bracket the crossovers (default: the
+           common grid of freq_response); L: L(j*omega) if already evaluated.
+
+    Crossovers are bracketed by sign changes on the grid (vectorized over
+    loops and frequencies), then refined by safeguarded Newton iterations
+    using the analytic dL/ds:
+    - gain crossover:  log|L| = 0
+    - phase crossover: Im(L)/|L| = 0 with Re(L) < 0
+    - sensitivity peak: d|1+L|^2/dw = 0 around the grid minimum of |1+L|
+
+    Returns a dict of (batch,) arrays:
+    gm, gm_db - smallest gain margin (inf if no phase crossover)
+    pm        - phase margin in degrees with the smallest |pm| (inf if no gain crossover)
+    dm        - delay margin in seconds (smallest over the gain crossovers)
+    Ms        - sensitivity peak max |1/(1+L)|
+    wg, wp, wMs - frequencies of gm, pm and Ms (rad/s)
+    """
+    from freq_response import OMEGA
+    omega = OMEGA if omega is None else np.asarray(omega, dtype=float)
+    num, den = _pad(num), _pad(den)
+    batch = len(num)
+    if L is None:
+        s = np.broadcast_to(1j * omega, (batch, len(omega)))
+        L = polyval_batch(num, s) / polyval_batch(den, s)
+    L = np.atleast_2d(L)
+
+    # Gain crossovers: sign changes of log|L|
+    logmag = np.log(np.abs(L))
+    r, i = np.nonzero(np.sign(logmag[:, :-1]) * np.sign(logmag[:, 1:]) < 0)
+    def gain_fun(rows, w):
+        Lw, L1, _ = _derivatives(num, den, rows, w)
+        return np.log(np.abs(Lw)), np.real(1j * L1 / Lw)
+    wp_all = _newton(gain_fun, r, omega[i], omega[i + 1], logmag[r, i], newton_iter)
+    Lp = _derivatives(num, den, r, wp_all)[0]
+    pm_all = np.degrees(np.angle(-Lp))          # 180 + angle(L), wrapped to (-180, 180]
+    dm_all = np.mod(np.radians(pm_all), 2 * np.pi) / wp_all
+    _, pm, wp = _row_min(r, np.abs(pm_all), batch, pm_all, wp_all)
+    dm = _row_min(r, dm_all, batch)[0]
+    pm[np.isnan(pm)] = np.inf
+
+    # Phase crossovers: sign changes of sin(angle L) through the negative real axis
+    sin_phase = L.imag / np.abs(L)
+    r, i = np.nonzero((np.sign(sin_phase[:, :-1]) * np.sign(sin_phase[:, 1:]) < 0) &
+                      (L.real[:, :-1] + L.real[:, 1:] < 0))
+    def phase_fun(rows, w):
+        Lw, L1, _ = _derivatives(num, den, rows, w)
+        # d(angle L)/dw = Re(L'/L)
+        return Lw.imag / np.abs(Lw), np.real(Lw) / np.abs(Lw) * np.real(L1 / Lw)
+    wg_all = _newton(phase_fun, r, omega[i], omega[i + 1], sin_phase[r, i], newton_iter)
+    Lg = _derivatives(num, den, r, wg_all)[0]
+    neg = Lg.real < 0
+    gm, wg = _row_min(r[neg], 1 / np.abs(Lg[neg]), batch, wg_all[neg])
+
+    # Sensitivity peak: grid minimum of |1+L|, refined as a stationary point
+    dist = np.abs(1 + L)
+    k = np.clip(np.argmin(dist, axis=1), 1, len(omega) - 2)
+    rows = np.arange(batch)
+    def peak_fun(rows, w):
+        Lw, L1, L2 = _derivatives(num, den, rows, w)
+        one = 1 + Lw
+        # h = |1+L|^2: h' = 2 Re(conj(1+L) j L'), h'' = 2 (|L'|^2 - Re(conj(1+L) L''))
+        return 2 * np.real(np.conj(one) * 1j * L1), 2 * (np.abs(L1) ** 2 - np.real(np.conj(one) * L2))
+    h1_lo = peak_fun(rows, omega[k - 1])[0]
+    h1_hi = peak_fun(rows, omega[k + 1])[0]
+    bracketed = np.sign(h1_lo) * np.sign(h1_hi) < 0
+    wMs = omega[k].copy()
+    if bracketed.any():
+        b = rows[bracketed]
+        wMs[b] = _newton(peak_fun, b, omega[k[b] - 1], omega[k[b] + 1], h1_lo[b], newton_iter)
+    dist_min = np.minimum(np.abs(1 + _derivatives(num, den, rows, wMs)[0]), dist[rows, k])
+    Ms = 1 / dist_min
+
+    with np.errstate(divide='ignore'):
+        gm_db = 20 * np.log10(gm)
+    return {"gm": gm, "gm_db": gm_db, "pm": pm, "dm": dm, "Ms": Ms,
+            "wg": wg, "wp": wp, "wMs": wMs}
+
+def margin_table(names, result):
+    """
+    Text table of a loop_margins result, one line per loop.
+    """
+    lines = [f"{'':>14} {'GM (dB)':>9} {'PM (°)':>8} {'DM (ms)':>9} {'Ms':>6}"]
+    for j, name in enumerate(names):
+        lines.append(f"{name:>14} {result['gm_db'][j]:9.2f} {result['pm'][j]:8.2f} "
+                     f"{1e3 * result['dm'][j]:9.3f} {result['Ms'][j]:6.3f}")
+    return "\n".join(lines)
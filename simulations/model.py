@@ -2,15 +2,23 @@ import numpy as np
 import matplotlib.pyplot as plt
 import control as ct
 import os
+import residue_sim
+from time_grid import plan_for_system
+
+# Overrides the assets root (e.g. a temporary directory for benchmarks.py)
+ASSETS_ENV = "SIM_ASSETS_DIR"
 
 def get_assets_dir(mode='dark'):
     """
     Returns the target directory based on the mode.
     mode='dark' -> ../assets/images (HTML)
     mode='light' -> ../assets/report_images (PDF Report)
+    Both are placed under $SIM_ASSETS_DIR instead of ../assets when it is set.
     """
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    if mode == 'light':
+    if os.environ.get(ASSETS_ENV):
+        target = os.path.join(os.environ[ASSETS_ENV], 'report_images' if mode == 'light' else 'images')
+    elif mode == 'light':
         target = os.path.join(script_dir, '../assets/report_images')
     else:
         target = os.path.join(script_dir, '../assets/images')
@@ -123,22 +131,33 @@ def define_system():
     sys = ct.ss(A, B, C, D)
     return sys
 
-def analyze_open_loop(sys, mode='dark'):
+def compute_open_loop(sys):
     """
-    Analyze open loop stability, poles, and zeros.
+    Open loop data: poles, zeros and step response.
+    """
+    poles = ct.poles(sys)
+    zeros = ct.zeros(sys)
+    print("Polos do sistema:", poles)
+    print("Zeros do sistema:", zeros)
+
+    # Horizon from the slowest significant mode, step from the fastest
+    # (the library default runs to 25 s for this plant)
+    t, y = residue_sim.step_response(sys, plan_for_system(sys))
+    return {"poles": poles, "zeros": zeros, "t": t, "y": y}
+
+def render_open_loop(data, mode='dark'):
+    """
+    Draws the open loop figures (PZ map and step) from compute_open_loop data.
     """
     print(f"[{mode.upper()}] Gerando gráficos de malha aberta...")
     colors = configure_plot_style(mode)
     assets_dir = get_assets_dir(mode)
-    
-    print("Polos do sistema:", ct.poles(sys))
-    print("Zeros do sistema:", ct.zeros(sys))
-    
+
     # Plot 1: PZ Map
     # Plot 1: PZ Map (Manual Plot for High Visibility)
     plt.figure(figsize=(8, 6))
-    poles = ct.poles(sys)
-    zeros = ct.zeros(sys)
+    poles = data["poles"]
+    zeros = data["zeros"]
     
     # Grid
     grid_color = 'white' if mode == 'dark' else 'black'
@@ -176,7 +195,7 @@ def analyze_open_loop(sys, mode='dark'):
     
     # Plot 2: Open Loop Step
     plt.figure(figsize=(10, 6))
-    t, y = ct.step_response(sys)
+    t, y = data["t"], data["y"]
     plt.plot(t, y, linewidth=2, color='#f59e0b' if mode=='dark' else '#d35400')
     plt.title('Resposta ao Degrau em Malha Aberta', color='white' if mode=='dark' else 'black')
     plt.xlabel('Tempo (s)')
@@ -186,9 +205,16 @@ def analyze_open_loop(sys, mode='dark'):
     plt.savefig(os.path.join(assets_dir, f'02_step_openloop_{mode}.png'))
     plt.close()
 
+def analyze_open_loop(sys, mode='dark'):
+    """
+    Analyze open loop stability, poles, and zeros.
+    """
+    render_open_loop(compute_open_loop(sys), mode)
+
 if __name__ == "__main__":
     sys = define_system()
-    # Run for both modes to ensure assets are generated
+    # Compute once, then render both modes to ensure assets are generated
+    data = compute_open_loop(sys)
     for mode in ['dark', 'light']:
-        analyze_open_loop(sys, mode=mode)
+        render_open_loop(data, mode=mode)
     print("Gráficos de malha aberta gerados.")
@@ -0,0 +1,132 @@
+import numpy as np
+import control as ct
+from batch_eval import poly_mul, poly_add
+from prefilter import routh_hurwitz_stable
+from residue_sim import residue_response
+from step_metrics import step_metrics
+
+# Gain of the robustness plant, as in controllers.create_plant_variation:
+# G(s) = Km * 772 / (s * (s + am) * (s + ae))
+K_SYS = 772
+
+# name -> (kind, p1, p2): 'uniform' (low, high), 'normal' (mean, std) or
+# 'lognormal' (median, sigma of the log). The default spans the three
+# hand-picked scenarios ("Nominal", "Pesado", "Agressivo").
+DEFAULT_DISTRIBUTIONS = {
+    "Km": ("uniform", 0.8, 1.2),
+    "am": ("uniform", 10.0, 15.0),
+    "ae": ("uniform", 800.0, 1100.0),
+}
+
+def sample_plants(n_samples, distributions=None, seed=None):
+    """
+    Draws n_samples (Km, am, ae) triples. Returns a dict of (n_samples,) arrays.
+    """
+    distributions = DEFAULT_DISTRIBUTIONS if distributions is None else distributions
+    rng = np.random.default_rng(seed)
+    samples = {}
+    for name in ("Km", "am", "ae"):
+        kind, p1, p2 = distributions[name]
+        if kind == 'uniform':
+            samples[name] = rng.uniform(p1, p2, n_samples)
+        elif kind == 'normal':
+            samples[name] = rng.normal(p1, p2, n_samples)
+        elif kind == 'lognormal':
+            samples[name] = p1 * np.exp(rng.normal(0.0, p2, n_samples))
+        else:
+            raise ValueError(f"distribution for {name} must be 'uniform', 'normal' or 'lognormal', not {kind!r}")
+    return samples
+
+def controller_polys(ctrl):
+    """
+    (num, den) coefficient arrays of a SISO controller (ct.TransferFunction or scalar gain).
+    """
+    if np.isscalar(ctrl):
+        return np.array([float(ctrl)]), np.array([1.0])
+    tf = ct.tf(ctrl)
+    return (np.atleast_1d(np.squeeze(tf.num[0][0])).astype(float),
+            np.atleast_1d(np.squeeze(tf.den[0][0])).astype(float))
+
+def plant_closed_loop(num_c, den_c, Km, am, ae):
+    """
+    Closed-loop polynomials of C*G / (1 + C*G) for a batch of plants
+    G = Km*K_SYS / (s^3 + (am+ae) s^2 + am*ae s). Returns (num_cl, den_cl),
+    (batch, n+1) with den_cl monic.
+    """
+    Km, am, ae = (np.asarray(v, dtype=float) for v in (Km, am, ae))
+    zeros = np.zeros_like(am)
+    num_G = (Km * K_SYS)[:, None]
+    den_G = np.stack([np.ones_like(am), am + ae, am * ae, zeros], axis=-1)
+
+    num_open = poly_mul(num_G, num_c[None, :])
+    den_cl = poly_add(poly_mul(den_G, den_c[None, :]), num_open)
+    num_cl = poly_add(np.zeros_like(den_cl), num_open)
+
+    lead = den_cl[:, :1]
+    return num_cl / lead, den_cl / lead
+
+def monte_carlo_robustness(ctrl, n_samples=10000, distributions=None, t=None, seed=0,
+                           percentiles=(5, 25, 50, 75, 95), chunk_size=2048):
+    """
+    Step responses of one controller against n_samples random plants.
+
+    Stability comes from the Routh-Hurwitz test on every characteristic
+    polynomial at once; only the stable loops are simulated, in batches, with
+    the closed-form residue response (arbitrary t, no time stepping).
+
+    Returns a dict with:
+    samples     - the (Km, am, ae) draws
+    stable      - (n_samples,) bool
+    p_unstable  - fraction of unstable loops
+    Mp, ts      - (n_samples,) overshoot (%) and 2% settling time, nan if unstable
+                  (ts is inf if the response has not settled by t[-1])
+    t, envelope - percentile -> (len(t),) band of the stable step responses
+    Mp_pct, ts_pct - percentile -> value over the stable loops
+    """
+    t = np.linspace(0, 2.0, 1000) if t is None else np.asarray(t, dtype=float)
+    samples = sample_plants(n_samples, distributions, seed)
+    num_c, den_c = controller_polys(ctrl)
+    num_cl, den_cl = plant_closed_loop(num_c, den_c, samples["Km"], samples["am"], samples["ae"])
+
+    stable = routh_hurwitz_stable(den_cl)
+    idx = np.flatnonzero(stable)
+    Mp = np.full(n_samples, np.nan)
+    ts = np.full(n_samples, np.nan)
+    y = np.empty((len(idx), len(t)))
+
+    for start in range(0, len(idx), chunk_size):
+        rows = idx[start:start + chunk_size]
+        y_chunk = residue_response(num_cl[rows], den_cl[rows], t, 'step')
+        metrics = step_metrics(t, y_chunk, reference=1.0)
+        Mp[rows], ts[rows] = metrics["Mp"], metrics["ts"]
+        y[start:start + len(rows)] = y_chunk
+
+    pct = list(percentiles)
+    has_stable = len(idx) > 0
+    envelope = dict(zip(pct, np.percentile(y, pct, axis=0))) if has_stable else {}
+    settled = ts[idx][np.isfinite(ts[idx])]
+    return {
+        "samples": samples,
+        "stable": stable,
+        "p_unstable": 1.0 - len(idx) / n_samples,
+        "Mp": Mp,
+        "ts": ts,
+        "t": t,
+        "envelope": envelope,
+        "Mp_pct": dict(zip(pct, np.percentile(Mp[idx], pct))) if has_stable else {},
+        "ts_pct": dict(zip(pct, np.percentile(settled, pct))) if len(settled) else {},
+        "p_not_settled": 1.0 - len(settled) / len(idx) if has_stable else 0.0,
+    }
+
+def print_report(name, result):
+    """
+    Text summary of one monte_carlo_robustness result.
+    """
+    n = len(result["stable"])
+    print(f"{name}: {n} plantas, P(instável) = {100 * result['p_unstable']:.2f}%")
+    if result["Mp_pct"]:
+        pct = ", ".join(f"p{p}={v:.1f}" for p, v in result["Mp_pct"].items())
+        print(f"  Mp (%): {pct}")
+    if result["ts_pct"]:
+        pct = ", ".join(f"p{p}={v:.3f}" for p, v in result["ts_pct"].items())
+        print(f"  ts (s): {pct} (não acomodadas: {100 * result['p_not_settled']:.1f}%)")
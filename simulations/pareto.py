@@ -0,0 +1,265 @@
+import os
+import bisect
+import argparse
+import numpy as np
+import matplotlib.pyplot as plt
+from model import configure_plot_style, get_assets_dir
+
+# Live rows whose own front is extracted at once by the general
+# (4+ objectives) sort
+PARETO_BLOCK = 256
+# Rows of smallest rank sum whose front pre-culls the 3-objective sweep
+PRE_CULL = 32
+# Live rows compared at once against a block front while culling
+CULL_ROWS = 4096
+
+# Axis labels of the metric columns (dierson_search / pid_tune results)
+LABELS = {"Mp": "Overshoot Mp (%)", "ts": "Tempo de acomodação ts (s)", "ess": "Erro de regime",
+          "er_rampa_clag": "Erro de rampa", "Kv": "Kv", "GM_db": "Margem de ganho (dB)",
+          "PM": "Margem de fase (graus)", "DM": "Margem de atraso (s)", "Ms": "Ms"}
+
+def objective_matrix(rows, objectives):
+    """
+    (n, m) matrix of the objectives to minimize: objectives are column
+    names of rows, "-name" to maximize that column (as in pipeline.top_k).
+    NaN (no value, e.g. ts of a response that never settles) counts as +inf.
+    """
+    columns = []
+    for name in objectives:
+        values = np.asarray(rows[name.lstrip('-')], dtype=float)
+        values = -values if name.startswith('-') else values
+        columns.append(np.where(np.isnan(values), np.inf, values))
+    return np.stack(columns, axis=1)
+
+def _front_2d(F):
+    """
+    Non-dominated mask of two objectives: after a lexicographic sort, a
+    point is dominated iff an earlier point has a smaller second objective,
+    or the same one at a smaller first objective.
+    """
+    order = np.lexsort((F[:, 1], F[:, 0]))
+    f0, f1 = F[order, 0], F[order, 1]
+    best = np.minimum.accumulate(f1)
+    prev = np.concatenate([[np.inf], best[:-1]])
+    # First (so lowest f0) sorted position reaching each running minimum
+    first = np.maximum.accumulate(np.where(f1 < prev, np.arange(len(f1)), 0))
+    prev_first = np.concatenate([[0], first[:-1]])
+    dominated = (prev < f1) | ((prev == f1) & (f0[prev_first] < f0))
+    mask = np.empty(len(F), dtype=bool)
+    mask[order] = ~dominated
+    return mask
+
+def _dominates(A, B):
+    """
+    (len(B), len(A)) mask: A[j] dominates B[i] (no worse in every objective,
+    better in one).
+    """
+    return ((A[None, :, :] <= B[:, None, :]).all(axis=2) &
+            (A[None, :, :] < B[:, None, :]).any(axis=2))
+
+def _front_3d(F):
+    """
+    Non-dominated mask of three objectives, O(n log n) comparisons. The
+    distinct rows are swept in lexicographic order, keeping the 2-D front of
+    the (f1, f2) pairs seen so far as a staircase (f1 increasing, f2
+    decreasing): a row is dominated iff an earlier distinct row is no worse
+    in f1 and f2, i.e. iff the staircase entry with the largest f1 not above
+    its own has an f2 not above its own.
+    """
+    # Pre-pass: the front of the PRE_CULL rows of smallest rank sum
+    # (none of them dominated by a later row) culls, in vectorized passes,
+    # most of the rows of a typical sweep; by transitivity, the rows it
+    # leaves have the same status among themselves as in F
+    head = np.argsort(_rank_sum(F), kind='stable')[:PRE_CULL]
+    head = head[~_dominates(F[head], F[head]).any(axis=1)]
+    live = np.flatnonzero(np.concatenate(
+        [~_dominates(F[head], F[i:i + CULL_ROWS]).any(axis=1) for i in range(0, len(F), CULL_ROWS)]))
+
+    order = live[np.lexsort(F[live].T[::-1])]
+    S = F[order]
+    # Copies of a row share the status of its first occurrence
+    distinct = np.concatenate([[True], (S[1:] != S[:-1]).any(axis=1)])
+    group = np.cumsum(distinct) - 1
+    dominated = np.zeros(int(distinct.sum()), dtype=bool)
+    xs, ys = [], []
+    for i, (f1, f2) in enumerate(S[distinct, 1:].tolist()):
+        j = bisect.bisect_right(xs, f1)
+        if j and ys[j - 1] <= f2:
+            dominated[i] = True
+            continue
+        # The new pair replaces the staircase entries it dominates
+        start = j - 1 if j and xs[j - 1] == f1 else j
+        stop = j
+        while stop < len(xs) and ys[stop] >= f2:
+            stop += 1
+        xs[start:stop] = [f1]
+        ys[start:stop] = [f2]
+    mask = np.zeros(len(F), dtype=bool)
+    mask[order] = ~dominated[group]
+    return mask
+
+def _rank_sum(F):
+    """
+    Sum of the dense per-objective ranks of every row: a row that dominates
+    another has a strictly smaller sum (unlike the plain sum of the values,
+    which is NaN for rows mixing +inf and -inf).
+    """
+    return sum(np.unique(F[:, j], return_inverse=True)[1].ravel() for j in range(F.shape[1]))
+
+def _front_nd(F):
+    """
+    Non-dominated mask of any number of objectives. Rows are ordered by
+    _rank_sum (then lexicographically), so that no row is dominated by a
+    later one; the front of the first PARETO_BLOCK live rows is final, and
+    that whole front culls the rows it dominates in one vectorized pass
+    (CULL_ROWS live rows at a time). The rows near the front dominate most
+    of the others, so the live set collapses after the first blocks.
+    """
+    order = np.lexsort(list(F.T[::-1]) + [_rank_sum(F)])
+    live, idx = F[order], order
+    keep = []
+    while len(live):
+        head = live[:PARETO_BLOCK]
+        on_front = ~_dominates(head, head).any(axis=1)
+        front = head[on_front]
+        keep.append(idx[:PARETO_BLOCK][on_front])
+        live, idx = live[PARETO_BLOCK:], idx[PARETO_BLOCK:]
+        alive = np.concatenate([~_dominates(front, live[i:i + CULL_ROWS]).any(axis=1)
+                                for i in range(0, len(live), CULL_ROWS)] or [np.zeros(0, dtype=bool)])
+        live, idx = live[alive], idx[alive]
+    mask = np.zeros(len(F), dtype=bool)
+    mask[np.concatenate(keep)] = True
+    return mask
+
+def pareto_mask(F):
+    """
+    Boolean mask of the non-dominated rows of the (n, m) objective matrix F
+    (all objectives minimized). Identical rows do not dominate each other.
+    Two and three objectives take O(n log n) sorts/sweeps; more use the
+    culling scan of _front_nd, whose cost grows with the size of the front.
+    """
+    F = np.asarray(F, dtype=float)
+    if len(F) == 0:
+        return np.zeros(0, dtype=bool)
+    if F.shape[1] == 1:
+        return F[:, 0] == F[:, 0].min()
+    if F.shape[1] == 2:
+        return _front_2d(F)
+    if F.shape[1] == 3:
+        return _front_3d(F)
+    return _front_nd(F)
+
+def pareto_front(rows, objectives):
+    """
+    The non-dominated rows of a result dict over the given objectives,
+    sorted by the first one.
+    """
+    F = objective_matrix(rows, objectives)
+    idx = np.flatnonzero(pareto_mask(F))
+    idx = idx[np.argsort(F[idx, 0], kind='stable')]
+    return {name: np.asarray(values)[idx] for name, values in rows.items()}
+
+def _concat(a, b):
+    return b if a is None else {name: np.concatenate([a[name], b[name]]) for name in a}
+
+def pareto_stream(results, objectives, sample=2000, seed=0):
+    """
+    Pipeline sink (see pipeline.py): Pareto front of a stream of chunks,
+    merged chunk by chunk, plus a uniform sample of at most `sample` rows of
+    the whole stream (background of plot_pareto).
+    Returns (front, background, n_rows).
+    """
+    rng = np.random.default_rng(seed)
+    front = background = None
+    n_rows = 0
+    for _, rows in results:
+        n_rows += len(rows["row"])
+        merged = _concat(front, rows)
+        keep = pareto_mask(objective_matrix(merged, objectives))
+        front = {name: values[keep] for name, values in merged.items()}
+        # Reservoir: the `sample` rows with the smallest random priority
+        rows = dict(rows, priority=rng.random(len(rows["row"])))
+        background = _concat(background, rows)
+        if len(background["row"]) > sample:
+            keep = np.argpartition(background["priority"], sample)[:sample]
+            background = {name: values[keep] for name, values in background.items()}
+    if front is None:
+        return {}, {}, 0
+    return pareto_front(front, objectives), background, n_rows
+
+def plot_pareto(front, objectives, filename, background=None, highlight=None, mode='dark'):
+    """
+    Compact plot of a Pareto front over its first two objectives (the third,
+    if any, as the colour of the front points). background: rows drawn in
+    gray behind the front; highlight: column of front flagging the points
+    to circle (e.g. "ok", the candidates meeting every spec).
+    """
+    colors = configure_plot_style(mode)
+    x_name, y_name = objectives[0].lstrip('-'), objectives[1].lstrip('-')
+
+    fig, ax = plt.subplots(figsize=(9, 6))
+    if background is not None and len(background.get("row", [])):
+        ax.scatter(background[x_name], background[y_name], s=8, color='gray', alpha=0.35,
+                   label='Candidatos')
+    order = np.argsort(front[x_name], kind='stable')
+    ax.plot(front[x_name][order], front[y_name][order], color=colors[1], linewidth=1, alpha=0.6)
+    if len(objectives) > 2:
+        c_name = objectives[2].lstrip('-')
+        points = ax.scatter(front[x_name], front[y_name], c=front[c_name], s=30, cmap='viridis',
+                            zorder=3, label='Fronteira de Pareto')
+        fig.colorbar(points, ax=ax, label=LABELS.get(c_name, c_name))
+    else:
+        ax.scatter(front[x_name], front[y_name], s=30, color=colors[1], zorder=3,
+                   label='Fronteira de Pareto')
+    if highlight is not None and np.any(front[highlight]):
+        mask = np.asarray(front[highlight], dtype=bool)
+        ax.scatter(front[x_name][mask], front[y_name][mask], s=140, facecolors='none',
+                   edgecolors=colors[0], linewidths=2, zorder=4, label='Atende às especificações')
+
+    ax.set_xlabel(LABELS.get(x_name, x_name))
+    ax.set_ylabel(LABELS.get(y_name, y_name))
+    ax.set_title(f'Fronteira de Pareto ({len(front[x_name])} pontos)')
+    ax.grid(True)
+    ax.legend(fontsize='small')
+    fig.tight_layout()
+    path = os.path.join(get_assets_dir(mode), filename)
+    fig.savefig(path)
+    plt.close(fig)
+    return path
+
+def print_front(front, objectives, limit=20):
+    """
+    Text table of a Pareto front (first `limit` rows).
+    """
+    names = [name.lstrip('-') for name in objectives]
+    params = [name for name in ("a", "b", "K", "Kp", "Ki", "Kd", "tau") if name in front and name not in names]
+    n = len(front[names[0]])
+    print(f"\nFronteira de Pareto: {n} pontos não dominados ({', '.join(objectives)})")
+    print(" ".join(f"{name:>12}" for name in params + names))
+    for i in range(min(n, limit)):
+        print(" ".join(f"{front[name][i]:12.5g}" for name in params + names))
+    if n > limit:
+        print(f"  ... (+{n - limit} pontos)")
+
+if __name__ == "__main__":
+    from result_store import load_columns
+
+    parser = argparse.ArgumentParser(description="Fronteira de Pareto de uma varredura gravada (result_store)")
+    parser.add_argument("store", help="diretório do result_store")
+    parser.add_argument("--objectives", type=lambda text: text.split(","), default=["Mp", "ts", "-Kv"],
+                        help="colunas a minimizar, separadas por vírgula ('-' para maximizar, ex.: Mp,ts,-Kv)")
+    parser.add_argument("--plot", default=None,
+                        help="nome do PNG da fronteira (em assets)")
+    parser.add_argument("--mode", choices=["dark", "light"], default="dark",
+                        help="tema da figura")
+    args = parser.parse_args()
+
+    names = list(dict.fromkeys(name.lstrip('-') for name in args.objectives))
+    columns = load_columns(args.store)
+    front = pareto_front(columns, args.objectives)
+    print_front(front, args.objectives)
+    if args.plot:
+        n = len(columns[names[0]])
+        sample = np.random.default_rng(0).choice(n, size=min(n, 2000), replace=False)
+        background = {name: np.asarray(columns[name])[sample] for name in names + ["row"]}
+        print(plot_pareto(front, args.objectives, args.plot, background, mode=args.mode))
@@ -0,0 +1,161 @@
+import argparse
+from functools import partial
+import numpy as np
+import control as ct
+from batch_eval import poly_mul, poly_add
+from prefilter import routh_hurwitz_stable
+from residue_sim import residue_response
+from step_metrics import step_metrics
+from margins import loop_margins
+from sweep_runner import run_sweep
+from lead_lag_opt import MODEL_NUM_G, MODEL_DEN_G, OMEGA_MS, spec_violation
+
+# C(s) = (Kd s^2 + Kp s + Ki) / (s (tau s + 1)), as in controllers.compute_pid_controller
+PARAMS = ("Kp", "Ki", "Kd", "tau")
+
+# Sweep around the Ziegler-Nichols point: multipliers of the ZN gains (and
+# of tau = Td/N), log-spaced. The course specs (ts >= 0.5 s) sit far below
+# the aggressive ZN tuning, hence the wide ranges downwards.
+DEFAULT_SCALES = {
+    "Kp": np.geomspace(1e-3, 2.0, 14),
+    "Ki": np.geomspace(1e-5, 2.0, 14),
+    "Kd": np.geomspace(1e-3, 4.0, 14),
+    "tau": np.geomspace(0.1, 10.0, 6),
+}
+
+# Derivative filter of the ZN point: tau = Td / N
+FILTER_N = 10
+
+def ziegler_nichols(num_G=MODEL_NUM_G, den_G=MODEL_DEN_G):
+    """
+    Classic closed-loop Ziegler-Nichols PID of the plant: ultimate gain Ku
+    (the gain margin of G, where the P loop oscillates) and period
+    Tu = 2*pi/wu (phase crossover), both from margins.loop_margins; then
+    Kp = 0.6 Ku, Ti = Tu/2, Td = Tu/8 and tau = Td/FILTER_N.
+    Returns a dict with Ku, wu, Tu, Kp, Ki, Kd, tau.
+    """
+    result = loop_margins([num_G], [den_G], OMEGA_MS)
+    Ku, wu = result["gm"][0], result["wg"][0]
+    if not np.isfinite(Ku):
+        raise ValueError("the plant has no finite ultimate gain (no phase crossover)")
+    Tu = 2 * np.pi / wu
+    Kp, Ti, Td = 0.6 * Ku, Tu / 2, Tu / 8
+    return {"Ku": Ku, "wu": wu, "Tu": Tu, "Kp": Kp, "Ki": Kp / Ti, "Kd": Kp * Td, "tau": Td / FILTER_N}
+
+def pid_open_loop(Kp, Ki, Kd, tau, num_G=MODEL_NUM_G, den_G=MODEL_DEN_G):
+    """
+    Open-loop polynomials of L = C*G for arrays of (Kp, Ki, Kd, tau) of
+    equal length. Returns (num_open, den_open), (batch, m).
+    """
+    Kp, Ki, Kd, tau = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=float))
+                                            for v in (Kp, Ki, Kd, tau)))
+    num_C = np.stack([Kd, Kp, Ki], axis=-1)
+    den_C = np.stack([tau, np.ones_like(tau), np.zeros_like(tau)], axis=-1)
+    return poly_mul(num_G[None, :], num_C), poly_mul(den_G[None, :], den_C)
+
+def pid_closed_loop(Kp, Ki, Kd, tau, num_G=MODEL_NUM_G, den_G=MODEL_DEN_G):
+    """
+    Closed-loop polynomials of C*G / (1 + C*G). Returns (num_cl, den_cl),
+    (batch, n+1) with den_cl monic.
+    """
+    num_open, den_open = pid_open_loop(Kp, Ki, Kd, tau, num_G, den_G)
+    den_cl = poly_add(den_open, num_open)
+    num_cl = poly_add(np.zeros_like(den_cl), num_open)
+    lead = den_cl[:, :1]
+    return num_cl / lead, den_cl / lead
+
+def evaluate_pid(Kp, Ki, Kd, tau, num_G=MODEL_NUM_G, den_G=MODEL_DEN_G, t=None):
+    """
+    Worker job: step metrics (closed-form residue responses), sensitivity
+    peak and spec violation of a chunk of stable PID loops.
+    Returns one row per candidate (parameters + metrics).
+    """
+    t = np.linspace(0, 3, 1501) if t is None else np.asarray(t, dtype=float)
+    num_cl, den_cl = pid_closed_loop(Kp, Ki, Kd, tau, num_G, den_G)
+    metrics = step_metrics(t, residue_response(num_cl, den_cl, t, 'step'), reference=1.0)
+    Ms = loop_margins(*pid_open_loop(Kp, Ki, Kd, tau, num_G, den_G), OMEGA_MS)["Ms"]
+    # The integral action makes the loop type 2: Kv is infinite
+    Kv = np.full(len(Ms), np.inf)
+    violation = spec_violation(metrics["Mp"], metrics["ts"], metrics["ess"], Kv,
+                               np.ones(len(Ms), dtype=bool), t[-1])
+    return {"Kp": Kp, "Ki": Ki, "Kd": Kd, "tau": tau, "Mp": metrics["Mp"], "ts": metrics["ts"],
+            "ess": metrics["ess"], "Ms": Ms, "violation": violation}
+
+def build_grid(zn, scales=None):
+    """
+    Flattened 4-D grid of (Kp, Ki, Kd, tau): the ZN values times every
+    combination of the multipliers in scales (default DEFAULT_SCALES).
+    """
+    scales = DEFAULT_SCALES if scales is None else scales
+    grids = np.meshgrid(*[zn[name] * np.asarray(scales[name]) for name in PARAMS], indexing='ij')
+    return {name: g.ravel() for name, g in zip(PARAMS, grids)}
+
+def autotune(num_G=MODEL_NUM_G, den_G=MODEL_DEN_G, scales=None, workers=None, top=10,
+             chunk_size=512, progress=True, store=None):
+    """
+    Ziegler-Nichols point of the plant, then a batched sweep of the 4-D
+    (Kp, Ki, Kd, tau) grid around it: every candidate is screened with the
+    Routh-Hurwitz test at once, the stable ones are simulated in chunks
+    (sweep_runner, optionally in a process pool; small chunks keep the
+    (rows, len(t)) temporaries in cache).
+
+    Candidates are ranked by spec violation (0 = meets every course spec),
+    then by sensitivity peak Ms. store: optional result_store directory
+    receiving every simulated candidate (resumable, see run_sweep).
+    Returns a dict with zn (ziegler_nichols), n_grid, n_stable, n_feasible
+    and ranked (dict of arrays, the best top candidates).
+    """
+    zn = ziegler_nichols(num_G, den_G)
+    grid = build_grid(zn, scales)
+    n_grid = len(grid["Kp"])
+
+    _, den_cl = pid_closed_loop(grid["Kp"], grid["Ki"], grid["Kd"], grid["tau"], num_G, den_G)
+    keep = routh_hurwitz_stable(den_cl)
+    grid = {name: values[keep] for name, values in grid.items()}
+    if not keep.any():
+        return {"zn": zn, "n_grid": n_grid, "n_stable": 0, "n_feasible": 0, "ranked": {}}
+
+    res = run_sweep(partial(evaluate_pid, num_G=num_G, den_G=den_G), grid, workers=workers,
+                    chunk_size=chunk_size, progress=progress, store=store)
+    order = np.lexsort((res["Ms"], res["violation"]))[:top]
+    return {
+        "zn": zn,
+        "n_grid": n_grid,
+        "n_stable": int(keep.sum()),
+        "n_feasible": int(np.count_nonzero(res["violation"] == 0)),
+        "ranked": {key: values[order] for key, values in res.items()},
+    }
+
+def pid_tf(Kp, Ki, Kd, tau):
+    """
+    The PID controller (Kd s^2 + Kp s + Ki) / (s (tau s + 1)).
+    """
+    return ct.tf([Kd, Kp, Ki], [tau, 1, 0])
+
+def print_ranking(result):
+    """
+    Text summary of an autotune result.
+    """
+    zn = result["zn"]
+    print(f"Ziegler-Nichols: Ku = {zn['Ku']:.4g}, Tu = {zn['Tu']:.4g} s -> "
+          f"Kp = {zn['Kp']:.4g}, Ki = {zn['Ki']:.4g}, Kd = {zn['Kd']:.4g}, tau = {zn['tau']:.3g}")
+    print(f"Candidatos: {result['n_grid']}, estáveis: {result['n_stable']}, "
+          f"dentro das especificações: {result['n_feasible']}")
+    r = result["ranked"]
+    print(f"{'#':>3} {'Kp':>10} {'Ki':>10} {'Kd':>10} {'tau':>9} {'Mp (%)':>7} {'ts (s)':>7} {'Ms':>6} {'violação':>9}")
+    for i in range(len(r.get("Kp", []))):
+        print(f"{i + 1:>3} {r['Kp'][i]:10.4g} {r['Ki'][i]:10.4g} {r['Kd'][i]:10.4g} {r['tau'][i]:9.3g} "
+              f"{r['Mp'][i]:7.2f} {r['ts'][i]:7.3f} {r['Ms'][i]:6.3f} {r['violation'][i]:9.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sintonia automática do PID (Ziegler-Nichols + varredura)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processos do pool (padrão: todos os núcleos; 1 = serial)")
+    parser.add_argument("--top", type=int, default=10,
+                        help="número de candidatos listados")
+    parser.add_argument("--store", default=None,
+                        help="diretório onde gravar todos os candidatos simulados "
+                             "(retoma uma varredura interrompida)")
+    args = parser.parse_args()
+
+    print_ranking(autotune(workers=args.workers, top=args.top, store=args.store))
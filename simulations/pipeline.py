@@ -0,0 +1,159 @@
+import os
+import time
+import heapq
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from result_store import append_chunk, chunk_rows, load_columns
+
+# Streaming search pipeline: candidates -> prune -> simulate -> score ->
+# filter -> top_k. Every stage is a generator over (chunk, rows) pairs:
+# chunk is the slice of the candidate grid the rows come from, rows a dict
+# name -> 1-D array with a "row" column (grid row number of each candidate)
+# next to the parameters and metrics. Only a few chunks are alive at a
+# time, and top_k keeps k rows, so memory does not grow with the grid.
+
+def _params(rows):
+    return {name: values for name, values in rows.items() if name != "row"}
+
+def _take(rows, mask):
+    return {name: values[mask] for name, values in rows.items()}
+
+def prune(chunks, keep, stats=None):
+    """
+    Drops the candidates for which keep(**params) is False (vectorized
+    pre-filter); chunks left empty are skipped.
+    stats: optional dict, counts "candidates" and "pruned" rows.
+    """
+    for chunk, rows in chunks:
+        mask = keep(**_params(rows))
+        if stats is not None:
+            stats["candidates"] = stats.get("candidates", 0) + len(mask)
+            stats["pruned"] = stats.get("pruned", 0) + int(np.count_nonzero(~mask))
+        if mask.any():
+            yield chunk, _take(rows, mask)
+
+def simulate(chunks, evaluate, workers=1, store=None, progress=True):
+    """
+    Runs evaluate(**params) on every chunk (module-level function returning
+    a dict of 1-D arrays, one entry per row) and yields its rows with the
+    "row" column added.
+
+    workers: processes (None -> os.cpu_count(), 1 -> serial); at most two
+             chunks per worker are in flight, and they are yielded as they
+             finish.
+    store: optional open result_store (result_store.open_store, whose
+           chunk_size the candidate chunks must use). Chunks already in it
+           are read back instead of evaluated, the others are appended to it.
+    """
+    written = {} if store is None else chunk_rows(store)
+    stored = None
+    t_start = time.time()
+    done = rows_done = 0
+
+    def finish(chunk, rows):
+        nonlocal done, rows_done
+        if store is not None and (chunk.start, chunk.stop) not in written:
+            append_chunk(store, chunk, rows)
+        done += 1
+        rows_done += len(rows["row"])
+        if progress:
+            print(f"  [{done}] {rows_done} candidatos simulados ({time.time() - t_start:.1f}s)")
+        return chunk, rows
+
+    def pending_chunks():
+        nonlocal stored
+        for chunk, rows in chunks:
+            key = (chunk.start, chunk.stop)
+            if key in written:
+                if stored is None:
+                    stored = load_columns(store["path"])
+                yield chunk, {name: np.asarray(values[written[key]]) for name, values in stored.items()}, True
+            else:
+                yield chunk, rows, False
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        for chunk, rows, cached in pending_chunks():
+            if not cached:
+                rows = dict(evaluate(**_params(rows)), row=rows["row"])
+            yield finish(chunk, rows)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for chunk, rows, cached in pending_chunks():
+            if cached:
+                yield finish(chunk, rows)
+                continue
+            futures[executor.submit(evaluate, **_params(rows))] = (chunk, rows["row"])
+            if len(futures) >= 2 * workers:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    chunk_done, row = futures.pop(future)
+                    yield finish(chunk_done, dict(future.result(), row=row))
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                chunk_done, row = futures.pop(future)
+                yield finish(chunk_done, dict(future.result(), row=row))
+
+def score(results, scorer):
+    """
+    Adds the columns of scorer(rows) (dict of 1-D arrays) to every chunk.
+    """
+    for chunk, rows in results:
+        yield chunk, dict(rows, **scorer(rows))
+
+def filter_rows(results, predicate):
+    """
+    Keeps the rows for which predicate(rows) (boolean mask) is True.
+    """
+    for chunk, rows in results:
+        mask = np.asarray(predicate(rows), dtype=bool)
+        if mask.any():
+            yield chunk, _take(rows, mask)
+
+def _sort_columns(rows, keys):
+    """
+    Ascending sort columns of keys ("name" or "-name" for descending),
+    NaN last.
+    """
+    columns = []
+    for key in keys:
+        values = np.asarray(rows[key.lstrip('-')], dtype=float)
+        values = -values if key.startswith('-') else values
+        columns.append(np.where(np.isnan(values), np.inf, values))
+    return columns
+
+def top_k(results, k, keys):
+    """
+    The k best rows of the stream by keys (column names, lexicographic,
+    ascending; "-name" sorts that column descending), ties broken by grid
+    row, so the selection equals a full sort of every row. A bounded heap
+    holds the k rows; each chunk only offers its own k best.
+    Returns (best, n_rows): dict of arrays (best first) and the number of
+    rows seen.
+    """
+    heap = []
+    n_rows = 0
+    for _, rows in results:
+        n = len(rows["row"])
+        n_rows += n
+        if not n or k <= 0:
+            continue
+        columns = _sort_columns(rows, keys)
+        for i in np.lexsort([rows["row"]] + columns[::-1])[:k]:
+            # Negated keys: heap[0] is the worst row kept
+            entry = (tuple(-c[i] for c in columns) + (-rows["row"][i],),
+                     {name: values[i] for name, values in rows.items()})
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry[0] > heap[0][0]:
+                heapq.heapreplace(heap, entry)
+            else:
+                break
+    best = [row for _, row in sorted(heap, key=lambda entry: entry[0], reverse=True)]
+    if not best:
+        return {}, n_rows
+    return {name: np.array([row[name] for row in best]) for name in best[0]}, n_rows
@@ -0,0 +1,72 @@
+import numpy as np
+from batch_eval import lag_closed_loop, NUM_G, DEN_G
+
+def routh_first_column(den):
+    """
+    First column of the Routh array for a batch of polynomials.
+    den: (batch, n+1) coefficients, highest power first.
+    Returns (batch, n+1). A zero pivot yields inf/nan entries, which the
+    stability test below treats as "not stable".
+    """
+    den = np.atleast_2d(np.asarray(den, dtype=float))
+    batch, n1 = den.shape
+    width = (n1 + 1) // 2
+    prev = np.zeros((batch, width + 1))
+    curr = np.zeros((batch, width + 1))
+    prev[:, :len(range(0, n1, 2))] = den[:, 0::2]
+    curr[:, :len(range(1, n1, 2))] = den[:, 1::2]
+
+    first = np.empty((batch, n1))
+    first[:, 0] = prev[:, 0]
+    first[:, 1] = curr[:, 0] if n1 > 1 else 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Loop over the polynomial order only, never over the batch
+        for k in range(2, n1):
+            nxt = np.zeros_like(curr)
+            nxt[:, :-1] = (curr[:, :1] * prev[:, 1:] - prev[:, :1] * curr[:, 1:]) / curr[:, :1]
+            prev, curr = curr, nxt
+            first[:, k] = curr[:, 0]
+    return first
+
+def routh_hurwitz_stable(den):
+    """
+    Routh-Hurwitz test: True where every root of den lies in the open left
+    half-plane (no sign change and no zero in the first column).
+    """
+    first = routh_first_column(den)
+    with np.errstate(invalid='ignore'):
+        sign = np.sign(first[:, :1])
+        return np.all(first * sign > 0, axis=1)
+
+def lag_velocity_constant(a, b, K):
+    """
+    Velocity constant of the lag loop (type 1 plant, C(0) = b/a):
+    Kv = K * (b/a) * num_G(0) / (am*ae), increasing in K.
+    """
+    return K * (b / a) * NUM_G[-1] / DEN_G[-2]
+
+def prune_lag_grid(a, b, K, Kv_min=100.0, ess_max=0.01):
+    """
+    Closed-form constraints evaluated before any simulation:
+    1. Velocity constant: Kv = K * (b/a) * num_G(0) / (am*ae) >= Kv_min
+    2. Routh-Hurwitz stability of den_G*den_C + K*num_G*num_C
+    3. Final-value theorem for the step: ess = 1 / (1 + L(0)) <= ess_max
+       (zero for this type 1 loop, but kept general)
+    Returns a boolean mask of the candidates that can still pass.
+    """
+    a, b, K = np.broadcast_arrays(np.atleast_1d(np.asarray(a, dtype=float)),
+                                  np.atleast_1d(np.asarray(b, dtype=float)),
+                                  np.atleast_1d(np.asarray(K, dtype=float)))
+
+    keep = lag_velocity_constant(a, b, K) >= Kv_min
+
+    _, den_cl = lag_closed_loop(a, b, K)
+    keep &= routh_hurwitz_stable(den_cl)
+
+    # ess = den_open(0) / (den_open(0) + num_open(0)); den_cl is monic, so
+    # undo the normalization by the leading coefficient den_G[0]
+    den_open_0 = DEN_G[-1] * a
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ess_final = np.abs(den_open_0 / (den_cl[:, -1] * DEN_G[0]))
+    keep &= ess_final <= ess_max
+    return keep
@@ -0,0 +1,174 @@
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import functools
+import importlib
+import threading
+from contextlib import contextmanager
+
+# Lightweight instrumentation of the figure pipeline (controllers.py):
+# - stage(name): timer around a block (the compute/render steps), no-op
+#   while profiling is disabled; top-level stages can each run under their
+#   own cProfile;
+# - instrument(): wraps the expensive library calls below with call
+#   counters and timers, until uninstrument().
+# Events are kept as Chrome trace "complete" events (write_trace, readable
+# by chrome://tracing and ui.perfetto.dev); summary() aggregates them.
+
+# (module, attribute) of the library calls timed by instrument()
+LIBRARY_CALLS = [
+    ("control", "step_response"),
+    ("control", "root_locus_plot"),
+    ("control", "nyquist_plot"),
+    ("control", "bode_plot"),
+    ("control", "pzmap"),
+    ("control", "feedback"),
+    ("matplotlib.pyplot", "savefig"),
+    ("zoh_sim", "step_response"),
+    ("root_locus", "trace_branches"),
+    ("freq_response", "nyquist"),
+]
+
+# Short prefixes of the trace names
+_ALIASES = {"control": "ct", "matplotlib.pyplot": "plt"}
+
+_STATE = {"enabled": False, "cprofile": False, "depth": 0, "t0": 0.0}
+_EVENTS = []
+# stage name -> pstats.Stats accumulated over its calls
+_PROFILES = {}
+# (module, attribute) -> original object, while instrumented
+_ORIGINALS = {}
+
+def enable(cprofile=False):
+    """
+    Starts recording (clears previous events). cprofile: run every
+    top-level stage under cProfile.
+    """
+    reset()
+    _STATE.update(enabled=True, cprofile=cprofile, depth=0, t0=time.perf_counter())
+
+def disable():
+    _STATE["enabled"] = False
+
+def is_enabled():
+    return _STATE["enabled"]
+
+def reset():
+    _EVENTS.clear()
+    _PROFILES.clear()
+
+def _record(name, category, start, end):
+    _EVENTS.append({"name": name, "cat": category, "ph": "X",
+                    "ts": 1e6 * (start - _STATE["t0"]), "dur": 1e6 * (end - start),
+                    "pid": os.getpid(), "tid": threading.get_ident()})
+
+@contextmanager
+def stage(name, category='stage'):
+    """
+    Times the enclosed block as one trace event. Only the outermost stage
+    is profiled by cProfile (a single profiler can be active at a time).
+    """
+    if not _STATE["enabled"]:
+        yield
+        return
+    profile = cProfile.Profile() if _STATE["cprofile"] and _STATE["depth"] == 0 else None
+    _STATE["depth"] += 1
+    start = time.perf_counter()
+    if profile is not None:
+        profile.enable()
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.disable()
+        end = time.perf_counter()
+        _STATE["depth"] -= 1
+        _record(name, category, start, end)
+        if profile is not None:
+            if name in _PROFILES:
+                _PROFILES[name].add(profile)
+            else:
+                _PROFILES[name] = pstats.Stats(profile)
+
+def timed(fn, name, category='call'):
+    """
+    fn wrapped with a timer (one trace event per call while enabled).
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _STATE["enabled"]:
+            return fn(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _record(name, category, start, time.perf_counter())
+    return wrapper
+
+def instrument(calls=LIBRARY_CALLS):
+    """
+    Replaces the module attributes in calls by timed wrappers. Callers must
+    reach them through the module (ct.nyquist_plot, plt.savefig), as this
+    project does.
+    """
+    for module_name, attr in calls:
+        if (module_name, attr) in _ORIGINALS:
+            continue
+        module = importlib.import_module(module_name)
+        original = getattr(module, attr, None)
+        if original is None:
+            continue
+        _ORIGINALS[(module_name, attr)] = original
+        setattr(module, attr, timed(original, f"{_ALIASES.get(module_name, module_name)}.{attr}"))
+
+def uninstrument():
+    for (module_name, attr), original in _ORIGINALS.items():
+        setattr(importlib.import_module(module_name), attr, original)
+    _ORIGINALS.clear()
+
+def write_trace(path):
+    """
+    Chrome / Perfetto trace of the recorded events (JSON object format).
+    """
+    with open(path, 'w') as f:
+        json.dump({"traceEvents": _EVENTS, "displayTimeUnit": "ms"}, f)
+
+def summary(top=15, with_profiles=True):
+    """
+    Text table of the recorded events: calls, total, mean and max time per
+    name (stages first, then library calls, each by total time) and share of
+    the wall time; with_profiles adds the top cProfile entries of every
+    profiled stage.
+    """
+    if not _EVENTS:
+        return "Nenhum evento registrado."
+    wall = max(e["ts"] + e["dur"] for e in _EVENTS) - min(e["ts"] for e in _EVENTS)
+    totals = {}
+    for e in _EVENTS:
+        entry = totals.setdefault((e["cat"], e["name"]), [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += e["dur"]
+        entry[2] = max(entry[2], e["dur"])
+
+    lines = [f"Tempo total: {wall / 1e3:.1f} ms",
+             f"{'etapa / chamada':<40} {'chamadas':>8} {'total (ms)':>11} {'média (ms)':>11} "
+             f"{'máx (ms)':>10} {'% total':>8}"]
+    for category in ('stage', 'call'):
+        rows = sorted(((name, v) for (cat, name), v in totals.items() if cat == category),
+                      key=lambda row: -row[1][1])
+        if rows:
+            lines.append(f"-- {'etapas' if category == 'stage' else 'chamadas de biblioteca'}")
+        for name, (count, total, longest) in rows:
+            lines.append(f"{name:<40} {count:8d} {total / 1e3:11.1f} {total / 1e3 / count:11.2f} "
+                         f"{longest / 1e3:10.1f} {100 * total / wall:7.1f}%")
+
+    for name, stats in (_PROFILES.items() if with_profiles else ()):
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats('cumulative').print_stats(top)
+        lines.append(f"\n== cProfile: {name} ==")
+        lines.extend(line for line in out.getvalue().splitlines() if line.strip())
+    return "\n".join(lines)
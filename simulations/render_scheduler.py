@@ -0,0 +1,75 @@
+import os
+import time
+import matplotlib
+import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import figure_cache
+import profiler
+
+def _init_worker():
+    """
+    Non-interactive backend in every worker (no display, no GUI event loop).
+    """
+    plt.switch_backend('Agg')
+
+def _run_job(name, render_fn, data, mode, key):
+    """
+    One figure job. rcParams are restored afterwards, so the theme set by
+    configure_plot_style inside render_fn cannot leak into the next job run
+    by the same process. Timed as the profiler stage "render mode/name".
+    """
+    with matplotlib.rc_context(), profiler.stage(f"render {mode}/{name}"):
+        entry = figure_cache.render_entry(render_fn, data, mode, key)
+    plt.close('all')
+    return entry
+
+def render_jobs(jobs, modes=('dark', 'light'), workers=None, force=False, progress=True):
+    """
+    Renders independent figure jobs for each theme in a process pool.
+
+    jobs: list of (name, render_fn, data); render_fn(data, mode) is a
+          module-level render_* function, name its figure_cache manifest entry.
+    workers: number of processes (None -> os.cpu_count(), 1 -> serial, no pool).
+    force: render every job even if its figure_cache key is unchanged.
+
+    Up-to-date jobs are skipped; the manifests are only written by this
+    process, after all jobs finished. Returns (rendered, skipped) job names,
+    as (mode, name) pairs.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    manifests, pending, skipped = {}, [], []
+    for mode in modes:
+        manifests[mode] = figure_cache.load_manifest(mode)
+        for name, render_fn, data in jobs:
+            key = figure_cache.figure_key(render_fn, data, mode)
+            if not force and figure_cache.is_current(manifests[mode].get(name), key, mode):
+                skipped.append((mode, name))
+            else:
+                pending.append((mode, name, render_fn, data, key))
+
+    t_start = time.time()
+
+    def report(done, mode, name):
+        if progress:
+            print(f"  [{done}/{len(pending)}] {mode}/{name} ({time.time() - t_start:.1f}s)")
+
+    if workers == 1 or len(pending) <= 1:
+        for done, (mode, name, render_fn, data, key) in enumerate(pending, start=1):
+            manifests[mode][name] = _run_job(name, render_fn, data, mode, key)
+            report(done, mode, name)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            futures = {
+                executor.submit(_run_job, name, render_fn, data, mode, key): (mode, name)
+                for mode, name, render_fn, data, key in pending
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                mode, name = futures[future]
+                manifests[mode][name] = future.result()
+                report(done, mode, name)
+
+    for mode, manifest in manifests.items():
+        figure_cache.save_manifest(mode, manifest)
+    return [(mode, name) for mode, name, *_ in pending], skipped
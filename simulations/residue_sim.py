@@ -0,0 +1,147 @@
+import numpy as np
+import control as ct
+from scipy.linalg import expm
+from batch_eval import companion_ss
+
+# Relative separation below which two closed-loop poles are treated as
+# repeated: the distinct-pole residue formula loses about eps/sep^(m-1)
+# digits for a cluster of m poles (a double root comes out of eigvals split
+# by ~sqrt(eps), a triple one by ~eps^(1/3)). Those rows, and rows with a
+# pole practically at s = 0 (colliding with the input pole), use the exact
+# matrix exponential instead.
+SEPARATION_TOL = 1e-3
+ORIGIN_TOL = 1e-8
+
+def polyval_batch(coeffs, s):
+    """
+    Horner evaluation of a batch of polynomials.
+    coeffs: (batch, m) highest power first; s: (batch, k). Returns (batch, k).
+    """
+    out = np.zeros(s.shape, dtype=complex)
+    for i in range(coeffs.shape[-1]):
+        out = out * s + coeffs[:, i:i + 1]
+    return out
+
+def polyder_batch(coeffs):
+    """
+    Derivative of a batch of polynomials (highest power first).
+    """
+    m = coeffs.shape[-1]
+    return coeffs[:, :-1] * np.arange(m - 1, 0, -1)
+
+def closed_loop_poles(den_cl):
+    """
+    Roots of a batch of monic polynomials, in one batched eigvals call.
+    """
+    A, _, _ = companion_ss(np.zeros_like(den_cl), den_cl)
+    return np.linalg.eigvals(A)
+
+def _clustered(poles):
+    """
+    Rows with (nearly) repeated poles, or a pole (nearly) at the origin,
+    for which the distinct-pole residue formula is not accurate.
+    """
+    n = poles.shape[1]
+    mag = np.abs(poles)
+    diff = np.abs(poles[:, :, None] - poles[:, None, :])
+    local_scale = np.maximum(mag[:, :, None], mag[:, None, :])
+    close = diff < SEPARATION_TOL * local_scale
+    close[:, np.arange(n), np.arange(n)] = False
+
+    scale = np.maximum(np.max(mag, axis=1), 1.0)
+    at_origin = mag < ORIGIN_TOL * scale[:, None]
+    return close.any(axis=(1, 2)) | at_origin.any(axis=1)
+
+def _expm_response(num_cl, den_cl, t, order):
+    """
+    Exact response of one system at arbitrary times via the matrix exponential
+    of the realization augmented with the input dynamics (order 1: step,
+    order 2: ramp). Batched over the time points.
+    """
+    A, B, C = companion_ss(num_cl[None, :], den_cl[None, :])
+    A, C = A[0], C[0]
+    n = A.shape[0]
+    # z = [x; u; u'; ...], u^(order) = 0, z0 = [0, ..., 0, 1]
+    M = np.zeros((n + order, n + order))
+    M[:n, :n] = A
+    M[:n, n] = B
+    for k in range(order - 1):
+        M[n + k, n + k + 1] = 1.0
+    Z = expm(M[None, :, :] * t[:, None, None])[:, :n, -1]
+    return Z @ C
+
+def input_residues(num_cl, den_cl, input='step'):
+    """
+    Poles of a batch of systems and the residues of N/(D s) (step) or
+    N/(D s^2) (ramp) at those poles. Both (batch, n), complex.
+    """
+    num_cl = np.atleast_2d(np.asarray(num_cl, dtype=float))
+    den_cl = np.atleast_2d(np.asarray(den_cl, dtype=float))
+    order = 1 if input == 'step' else 2
+    poles = closed_loop_poles(den_cl)
+    N_p = polyval_batch(num_cl, poles)
+    dD_p = polyval_batch(polyder_batch(den_cl), poles)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        residues = N_p / (dD_p * poles ** order)
+    return poles, residues
+
+def residue_response(num_cl, den_cl, t, input='step'):
+    """
+    Closed-form step or ramp responses of a batch of strictly proper systems,
+    as a sum of exponentials: poles and residues are computed once, then y(t)
+    is evaluated at arbitrary (not necessarily uniform) time points.
+
+    num_cl, den_cl: (batch, n+1), den_cl monic (e.g. batch_eval.lag_closed_loop).
+    Returns y with shape (batch, len(t)).
+    """
+    if input not in ('step', 'ramp'):
+        raise ValueError(f"input must be 'step' or 'ramp', not {input!r}")
+    num_cl = np.atleast_2d(np.asarray(num_cl, dtype=float))
+    den_cl = np.atleast_2d(np.asarray(den_cl, dtype=float))
+    t = np.asarray(t, dtype=float)
+    order = 1 if input == 'step' else 2
+
+    poles, residues = input_residues(num_cl, den_cl, input)
+
+    # Terms from the input pole(s) at s = 0
+    N0, D0 = num_cl[:, -1], den_cl[:, -1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if order == 1:
+            y = np.repeat((N0 / D0)[:, None], len(t), axis=1)
+        else:
+            dN0, dD0 = num_cl[:, -2], den_cl[:, -2]
+            y = (N0 / D0)[:, None] * t[None, :] + ((dN0 * D0 - N0 * dD0) / D0 ** 2)[:, None]
+
+    # Loop over the (few) poles only, vectorized over batch and time
+    for i in range(poles.shape[1]):
+        y = y + np.real(residues[:, i:i + 1] * np.exp(poles[:, i:i + 1] * t[None, :]))
+
+    for row in np.flatnonzero(_clustered(poles)):
+        y[row] = _expm_response(num_cl[row], den_cl[row], t, order)
+    return y
+
+def tf_to_polys(systems):
+    """
+    Monic closed-loop polynomial arrays from a list of SISO ct.TransferFunction
+    of the same order, for residue_response.
+    """
+    nums, dens = [], []
+    for sys in systems:
+        num = np.atleast_1d(np.squeeze(sys.num[0][0])).astype(float)
+        den = np.atleast_1d(np.squeeze(sys.den[0][0])).astype(float)
+        num = np.concatenate([np.zeros(len(den) - len(num)), num])
+        if num[0] != 0:
+            raise ValueError("residue_response needs strictly proper systems")
+        nums.append(num / den[0])
+        dens.append(den / den[0])
+    if len({len(d) for d in dens}) > 1:
+        raise ValueError("tf_to_polys needs systems of the same order")
+    return np.array(nums), np.array(dens)
+
+def step_response(sys, t):
+    """
+    Unit step response of a single strictly proper ct.TransferFunction at
+    arbitrary time points t. Returns (t, y) like ct.step_response.
+    """
+    num, den = tf_to_polys([ct.tf(sys)])
+    return np.asarray(t), residue_response(num, den, t, 'step')[0]
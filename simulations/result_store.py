@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+import hashlib
+import numpy as np
+
+# On-disk layout of a store directory:
+# - one raw binary file per column (<name>.bin), rows appended in the order
+#   the chunks finish;
+# - store.json: column dtypes, committed row count and the chunks already
+#   written. It is replaced atomically after every chunk (the checkpoint),
+#   so bytes past the committed row count are leftovers of an interrupted
+#   append and are truncated when the store is reopened.
+MANIFEST_NAME = 'store.json'
+# 2: "done" entries carry the row count of each chunk ([start, stop, n_rows])
+STORE_VERSION = 2
+
+def grid_key(columns):
+    """
+    Content hash of the input columns of a sweep: a store only resumes the
+    sweep it was created for.
+    """
+    h = hashlib.sha256()
+    for name in sorted(columns):
+        values = np.ascontiguousarray(columns[name])
+        h.update(name.encode())
+        h.update(str(values.dtype).encode())
+        h.update(values.tobytes())
+    return h.hexdigest()
+
+def _column_path(path, name):
+    return os.path.join(path, f"{name}.bin")
+
+def _save_manifest(store):
+    manifest = {key: value for key, value in store.items() if key != "path"}
+    tmp = os.path.join(store["path"], MANIFEST_NAME + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(store["path"], MANIFEST_NAME))
+
+def load_manifest(path):
+    """
+    Manifest of the store at path (None if there is none).
+    """
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def open_store(path, key, chunk_size):
+    """
+    Opens (or creates) the store of one sweep. key: grid_key of its inputs;
+    reopening with another key raises ValueError. An existing store keeps
+    its own chunk_size, so that its chunks stay valid whatever the number of
+    workers of the resumed run.
+    Returns the store dict (manifest + "path"); store["done"] lists the
+    chunks already written as [start, stop, n_rows]: the grid range of the
+    chunk and the number of rows it appended (fewer when the caller dropped
+    some, e.g. after a pre-filter).
+    """
+    os.makedirs(path, exist_ok=True)
+    manifest = load_manifest(path)
+    if manifest is None:
+        store = {"version": STORE_VERSION, "key": key, "chunk_size": int(chunk_size),
+                 "columns": {}, "rows": 0, "done": [], "path": path}
+        _save_manifest(store)
+        return store
+    if manifest.get("version") != STORE_VERSION or manifest["key"] != key:
+        raise ValueError(f"the store in {path} belongs to another sweep (different grid); "
+                         f"use another directory or remove it")
+
+    store = dict(manifest, path=path)
+    # Drop the bytes of an append that was interrupted before its checkpoint
+    for name, dtype in store["columns"].items():
+        size = store["rows"] * np.dtype(dtype).itemsize
+        column_path = _column_path(path, name)
+        if os.path.getsize(column_path) > size:
+            os.truncate(column_path, size)
+    # Column files the manifest does not know yet: left by an interrupted
+    # first append, before the dtypes were checkpointed
+    for filename in os.listdir(path):
+        name, ext = os.path.splitext(filename)
+        if ext == '.bin' and name not in store["columns"]:
+            os.remove(os.path.join(path, filename))
+    return store
+
+def append_chunk(store, chunk, columns):
+    """
+    Appends the rows of one finished chunk (dict name -> 1-D array, all of
+    the same length) and checkpoints: the column files are synced to disk
+    before the manifest records the chunk as done.
+    """
+    n_rows = len(next(iter(columns.values())))
+    if not store["columns"]:
+        store["columns"] = {name: np.asarray(values).dtype.str for name, values in columns.items()}
+    elif set(columns) != set(store["columns"]):
+        raise ValueError(f"chunk columns {sorted(columns)} do not match the store {sorted(store['columns'])}")
+
+    for name, dtype in store["columns"].items():
+        values = np.ascontiguousarray(columns[name], dtype=dtype)
+        with open(_column_path(store["path"], name), 'ab') as f:
+            f.write(values.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+    store["rows"] += n_rows
+    store["done"].append([int(chunk.start), int(chunk.stop), int(n_rows)])
+    _save_manifest(store)
+
+def chunk_rows(store):
+    """
+    (start, stop) grid range of every written chunk -> slice of the store
+    rows that hold it.
+    """
+    index, offset = {}, 0
+    for start, stop, n_rows in store["done"]:
+        index[(start, stop)] = slice(offset, offset + n_rows)
+        offset += n_rows
+    return index
+
+def load_columns(path, names=None):
+    """
+    Read-only memory maps of the committed rows of a store (dict name ->
+    np.memmap), in the order the chunks were written: millions of rows are
+    paged in on access only.
+    """
+    manifest = load_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(f"no result store in {path}")
+    names = manifest["columns"] if names is None else names
+    if manifest["rows"] == 0:
+        return {name: np.empty(0, dtype=manifest["columns"][name]) for name in names}
+    return {name: np.memmap(_column_path(path, name), dtype=manifest["columns"][name],
+                            mode='r', shape=(manifest["rows"],))
+            for name in names}
+
+def describe(path):
+    """
+    Text summary of a store: rows, chunks and per-column ranges.
+    """
+    manifest = load_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(f"no result store in {path}")
+    lines = [f"{path}: {manifest['rows']} linhas, {len(manifest['done'])} blocos "
+             f"(bloco de {manifest['chunk_size']} linhas)"]
+    for name, values in load_columns(path).items():
+        if np.issubdtype(values.dtype, np.number) and len(values):
+            finite = values[np.isfinite(values)] if np.issubdtype(values.dtype, np.floating) else values
+            span = f"[{finite.min():.4g}, {finite.max():.4g}]" if len(finite) else "(sem valores finitos)"
+        else:
+            span = ""
+        lines.append(f"  {name:>16} {values.dtype.str:>5} {span}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    for store_path in sys.argv[1:]:
+        print(describe(store_path))
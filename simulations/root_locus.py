@@ -0,0 +1,137 @@
+import numpy as np
+import control as ct
+from scipy.optimize import linear_sum_assignment
+from residue_sim import closed_loop_poles
+from freq_response import loop_polys
+
+# (num bytes, den bytes) -> (gains, loci) of that loop
+_LOCUS_CACHE = {}
+
+def _k_max(num, den):
+    """
+    Largest gain of the locus: the far branches are 4x the spread of the
+    open-loop poles/zeros away from the asymptote centre (as ct does), the
+    others are then next to their zeros.
+    """
+    poles, zeros = np.roots(den), np.roots(num)
+    n_asymp = len(poles) - len(zeros)
+    if n_asymp <= 0:
+        return 3 * abs(den[0] / num[0])
+    center = (np.sum(poles) - np.sum(zeros)) / n_asymp
+    radius = 4 * np.max(np.abs(np.concatenate([poles, zeros]) - center))
+    angles = (2 * np.arange(n_asymp) + 1) * np.pi / n_asymp
+    far = center + radius * np.exp(1j * angles)
+    return float(np.max(np.abs(np.polyval(den, far) / np.polyval(num, far))))
+
+def _char_polys(num, den, gains):
+    """
+    Monic characteristic polynomials den + k*num for a batch of gains.
+    """
+    num = np.concatenate([np.zeros(len(den) - len(num)), num])
+    polys = den[None, :] + gains[:, None] * num[None, :]
+    return polys / polys[:, :1]
+
+def _track(loci):
+    """
+    Orders the poles of each row like the branches of the previous row
+    (minimum total displacement), so that columns are continuous branches.
+    """
+    loci = loci.copy()
+    for j in range(1, len(loci)):
+        _, order = linear_sum_assignment(np.abs(loci[j - 1][:, None] - loci[j][None, :]))
+        loci[j] = loci[j, order]
+    return loci
+
+def _local_scale(loci, floor):
+    """
+    Distance of every pole to the origin or to the nearest other pole of
+    its row, whichever is smaller (at least floor).
+    """
+    diff = np.abs(loci[:, :, None] - loci[:, None, :])
+    idx = np.arange(loci.shape[1])
+    diff[:, idx, idx] = np.inf
+    return np.maximum(np.minimum(np.abs(loci), diff.min(axis=2)), floor)
+
+def _too_far(loci, rel_tol, floor):
+    """
+    Intervals [k_j, k_j+1] where some pole moved more than rel_tol times its
+    local scale. The rows need not be ordered: each pole is compared with
+    the nearest pole of the other end, in both directions.
+    """
+    scale = _local_scale(loci, floor)
+    coarse = np.zeros(len(loci) - 1, dtype=bool)
+    for a, b in ((slice(None, -1), slice(1, None)), (slice(1, None), slice(None, -1))):
+        dist = np.abs(loci[a][:, :, None] - loci[b][:, None, :])
+        nearest = np.argmin(dist, axis=2)
+        moved = np.take_along_axis(dist, nearest[:, :, None], axis=2)[:, :, 0]
+        limit = rel_tol * np.minimum(scale[a], np.take_along_axis(scale[b], nearest, axis=1))
+        coarse |= (moved > limit).any(axis=1)
+    return np.flatnonzero(coarse)
+
+def trace_branches(num, den, k_max=None, rel_tol=0.02, n_initial=100, max_points=20000):
+    """
+    Root-locus branches of 1 + k*num/den for k in [0, k_max].
+
+    Starts from a log-spaced gain grid and refines it where a pole moves
+    fast relative to its local scale (near the origin, a dipole, or another
+    pole about to break away): every pass bisects (in log k) all the
+    intervals that are too coarse and computes the new poles in one batched
+    eigvals call. The poles of the final grid are then tracked along k by
+    assignment, so each column of loci is one continuous branch.
+
+    Returns (gains, loci): (m,) and (m, n), gains[0] = 0 (open-loop poles);
+    the last three gains are 10, 100 and 1000 times k_max.
+    """
+    num, den = np.trim_zeros(np.asarray(num, dtype=float), 'f'), np.asarray(den, dtype=float)
+    k_max = _k_max(num, den) if k_max is None else k_max
+    singular = np.abs(np.concatenate([np.roots(den), np.roots(num)]))
+    floor = 0.1 * np.min(singular[singular > 0], initial=1.0)
+
+    gains = np.concatenate([[0.0], np.geomspace(k_max * 1e-8, k_max, n_initial)])
+    loci = closed_loop_poles(_char_polys(num, den, gains))
+    while len(gains) < max_points:
+        coarse = _too_far(loci, rel_tol, floor)
+        if not len(coarse):
+            break
+        coarse = coarse[:max_points - len(gains)]
+        lo, hi = gains[coarse], gains[coarse + 1]
+        new = np.where(lo > 0, np.sqrt(lo * hi), hi / 16)
+        gains = np.insert(gains, coarse + 1, new)
+        loci = np.insert(loci, coarse + 1, closed_loop_poles(_char_polys(num, den, new)), axis=0)
+
+    # Coarse tail along the asymptotes, so the far branches leave any view
+    tail = k_max * np.array([1e1, 1e2, 1e3])
+    gains = np.concatenate([gains, tail])
+    loci = np.concatenate([loci, closed_loop_poles(_char_polys(num, den, tail))])
+    return gains, _track(loci)
+
+def root_locus(sys):
+    """
+    Memoized root locus of one loop, as ct.PoleZeroData (accepted by
+    ct.root_locus_plot): the full view and any zoomed view are drawn from
+    the same branches, which are fine enough at every scale.
+    """
+    num, den = loop_polys(sys)
+    key = (num.tobytes(), den.tobytes())
+    if key not in _LOCUS_CACHE:
+        _LOCUS_CACHE[key] = trace_branches(num, den)
+    gains, loci = _LOCUS_CACHE[key]
+    return ct.PoleZeroData(sys.poles(), sys.zeros(), gains, loci, dt=sys.dt,
+                           sysname=sys.name, sys=sys, sort_loci=False)
+
+def full_view(data, expansion=1.8):
+    """
+    (xlim, ylim) of the full view of a root locus: the open-loop poles and
+    zeros and the origin, widened by expansion (ct's default factor), in a
+    square window (equal spans, as the equal-aspect locus axes draw it).
+    ct derives the limits from local extrema of the branches, which a finely
+    sampled dipole loop turns into a window a few tenths wide.
+    """
+    points = np.concatenate([data.poles, data.zeros, [0.0]]).real
+    xlim = [expansion * points.min(), expansion * points.max()]
+    half = np.max(np.abs(xlim))
+    center = 0.5 * (xlim[0] + xlim[1])
+    return [center - half, center + half], [-half, half]
+
+def clear_cache():
+    _LOCUS_CACHE.clear()
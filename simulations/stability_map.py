@@ -0,0 +1,55 @@
+import numpy as np
+from residue_sim import closed_loop_poles
+from monte_carlo import controller_polys, plant_closed_loop
+
+def dominant_poles(poles):
+    """
+    Rightmost pole of each row of a (batch, n) pole array, its damping ratio
+    zeta = -Re(p)/|p| (1 for a pole at the origin) and the minimum damping
+    over all the poles of the row.
+    """
+    rows, i_dom = np.arange(len(poles)), np.argmax(poles.real, axis=1)
+    mag = np.abs(poles)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zeta_all = np.where(mag > 0, -poles.real / mag, 1.0)
+    return poles[rows, i_dom], zeta_all[rows, i_dom], zeta_all.min(axis=1)
+
+def stability_map(ctrl, K=1.0, Km=1.1, am=13.2, ae=950.0):
+    """
+    Closed-loop poles of K*ctrl with the robustness plant
+    G = Km*772 / (s (s + am) (s + ae)) over the full grid of the given values,
+    without any time simulation: one companion matrix per grid point and a
+    single batched np.linalg.eigvals call.
+
+    K, Km, am, ae: scalars or 1-D arrays; the grid axes are the non-scalar
+    ones, in this order (e.g. K x Km x ae).
+    Returns a dict of arrays with the grid shape:
+    stable       - every pole in the open left half-plane
+    alpha        - stability margin, -max Re(p) (negative if unstable)
+    dominant     - rightmost closed-loop pole (complex)
+    zeta         - damping ratio of the dominant pole
+    zeta_min     - minimum damping ratio over all poles
+    plus "axes": name -> values of each grid axis, and "poles" (grid + (n,)).
+    """
+    params = {"K": K, "Km": Km, "am": am, "ae": ae}
+    axes = {name: np.asarray(v, dtype=float) for name, v in params.items() if np.ndim(v) > 0}
+    grids = np.meshgrid(*[np.atleast_1d(np.asarray(v, dtype=float)) for v in params.values()], indexing='ij')
+    flat = {name: g.ravel() for name, g in zip(params, grids)}
+    shape = tuple(len(v) for v in axes.values())
+
+    # The controller gain only scales the loop gain, like Km does
+    num_c, den_c = controller_polys(ctrl)
+    _, den_cl = plant_closed_loop(num_c, den_c, flat["K"] * flat["Km"], flat["am"], flat["ae"])
+    poles = closed_loop_poles(den_cl)
+
+    dominant, zeta, zeta_min = dominant_poles(poles)
+    alpha = -dominant.real
+    return {
+        "axes": axes,
+        "poles": poles.reshape(shape + poles.shape[-1:]),
+        "stable": (alpha > 0).reshape(shape),
+        "alpha": alpha.reshape(shape),
+        "dominant": dominant.reshape(shape),
+        "zeta": zeta.reshape(shape),
+        "zeta_min": zeta_min.reshape(shape),
+    }
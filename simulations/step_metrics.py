@@ -0,0 +1,47 @@
+import numpy as np
+
+def step_metrics(t, y, reference=None, tol=0.02):
+    """
+    Step response metrics for every row of y in one pass (no Python loops).
+
+    t: (n_t,) time vector, y: (n_t,) or (batch, n_t) responses.
+    reference: value the overshoot and the settling band are measured against.
+               None -> final value of each row (design_* functions);
+               1.0  -> unit reference (dierson_search.py).
+    tol: settling band, relative to the reference (0.02 -> 2%).
+
+    Returns a dict of (batch,) arrays:
+    Mp  - overshoot in %
+    ts  - settling time: first sample after the last one outside the band
+          (np.inf if the last sample is still outside)
+    tr  - 10-90% rise time of the final value (np.inf if never reached)
+    ess - steady-state error to the unit step, |1 - y_final|
+    tp  - peak time
+    """
+    t = np.asarray(t, dtype=float)
+    y = np.atleast_2d(np.asarray(y, dtype=float))
+    n_t = len(t)
+
+    y_final = y[:, -1]
+    ref = y_final if reference is None else np.full(len(y), float(reference))
+
+    i_peak = np.argmax(y, axis=1)
+    y_peak = y[np.arange(len(y)), i_peak]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        Mp = np.where(ref != 0, (y_peak - ref) / ref * 100, 0.0)
+    tp = t[i_peak]
+
+    outside = np.abs(y - ref[:, None]) > tol * np.abs(ref[:, None])
+    # Index of the last sample outside the band (-1 if always inside)
+    last_out = np.where(outside.any(axis=1), n_t - 1 - np.argmax(outside[:, ::-1], axis=1), -1)
+    ts = np.where(outside[:, -1], np.inf, t[np.minimum(last_out + 1, n_t - 1)])
+
+    # 10-90% rise time (first crossings), measured on the final value
+    sign = np.where(y_final < 0, -1.0, 1.0)[:, None]
+    above_10 = sign * y >= 0.1 * np.abs(y_final)[:, None]
+    above_90 = sign * y >= 0.9 * np.abs(y_final)[:, None]
+    reached = above_90.any(axis=1) & (y_final != 0)
+    tr = np.where(reached, t[np.argmax(above_90, axis=1)] - t[np.argmax(above_10, axis=1)], np.inf)
+
+    ess = np.abs(1 - y_final)
+    return {"Mp": Mp, "ts": ts, "tr": tr, "ess": ess, "tp": tp}
@@ -0,0 +1,99 @@
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from result_store import grid_key, open_store, append_chunk, chunk_rows, load_columns
+
+def split_chunks(n_total, chunk_size):
+    """
+    Splits range(n_total) into consecutive slices of at most chunk_size rows.
+    """
+    return [slice(start, min(start + chunk_size, n_total))
+            for start in range(0, n_total, chunk_size)]
+
+def _merge(parts):
+    """
+    Concatenates a list of per-chunk result dicts, in list order.
+    """
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+def run_sweep(evaluate, columns, workers=None, chunk_size=None, progress=True, store=None):
+    """
+    Runs evaluate over a parameter grid split into chunks, in a process pool.
+
+    columns: dict name -> 1-D array, all of the same length (one row per candidate).
+    evaluate: module-level function called as evaluate(**chunk_columns), returning
+              a dict of 1-D arrays with one entry per row of the chunk.
+    workers: number of processes (None -> os.cpu_count(), 1 -> serial, no pool).
+    chunk_size: rows per job (None -> about 4 jobs per worker).
+    store: optional result_store directory. Every finished chunk is appended
+           to it (with its grid row numbers in a "row" column) and
+           checkpointed; rerunning the same grid on the same directory only
+           evaluates the chunks that are not there yet.
+
+    The merged result is in the same row order as a serial run, no matter in
+    which order the chunks finish.
+    """
+    columns = {name: np.asarray(values) for name, values in columns.items()}
+    n_total = len(next(iter(columns.values())))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = max(1, -(-n_total // (4 * workers)))
+
+    if store is not None:
+        store = open_store(store, grid_key(columns), chunk_size)
+        chunk_size = store["chunk_size"]
+
+    chunks = split_chunks(n_total, chunk_size)
+    parts = [None] * len(chunks)
+    written = {} if store is None else chunk_rows(store)
+    pending = [i for i, sl in enumerate(chunks) if (sl.start, sl.stop) not in written]
+    if progress and len(pending) < len(chunks):
+        print(f"  Retomando: {len(chunks) - len(pending)}/{len(chunks)} blocos já em {store['path']}")
+    t_start = time.time()
+
+    def report(done, rows_done):
+        if progress:
+            elapsed = time.time() - t_start
+            print(f"  [{done}/{len(chunks)}] {rows_done}/{n_total} candidatos ({elapsed:.1f}s)")
+
+    def finish(i, part):
+        sl = chunks[i]
+        if store is None:
+            parts[i] = part
+        else:
+            append_chunk(store, sl, dict(part, row=np.arange(sl.start, sl.stop)))
+
+    done = len(chunks) - len(pending)
+    rows_done = n_total - sum(chunks[i].stop - chunks[i].start for i in pending)
+    if workers == 1 or len(pending) <= 1:
+        for i in pending:
+            sl = chunks[i]
+            finish(i, evaluate(**{name: values[sl] for name, values in columns.items()}))
+            done += 1
+            rows_done += sl.stop - sl.start
+            report(done, rows_done)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(evaluate, **{name: values[chunks[i]] for name, values in columns.items()}): i
+                for i in pending
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                finish(i, future.result())
+                done += 1
+                rows_done += chunks[i].stop - chunks[i].start
+                report(done, rows_done)
+
+    if store is not None:
+        if not store["rows"]:
+            return {}
+        # The store holds the chunks in completion order: back to grid order
+        stored = load_columns(store["path"])
+        order = np.argsort(stored.pop("row"), kind='stable')
+        return {key: np.asarray(values)[order] for key, values in stored.items()}
+    if not parts:
+        return {}
+    return _merge(parts)
@@ -0,0 +1,96 @@
+import warnings
+import numpy as np
+import control as ct
+from residue_sim import tf_to_polys, input_residues
+
+def mode_horizons(poles, residues, tol=1e-3):
+    """
+    Time after which each mode r*exp(p*t) stays below tol (absolute).
+    Non-decaying modes (poles at or right of the origin) and modes that are
+    already below tol get a horizon of 0.
+    """
+    decay = -np.real(poles)
+    mag = np.abs(residues)
+    significant = (decay > 0) & np.isfinite(mag) & (mag > tol)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        T = np.where(significant, np.log(mag / tol) / decay, 0.0)
+    return T, significant
+
+def _warn_capped(achieved, points_per_tau, max_points):
+    warnings.warn(f"time grid capped at max_points={max_points}: {achieved:.3g} samples per time "
+                  f"constant instead of points_per_tau={points_per_tau}", RuntimeWarning, stacklevel=3)
+
+def plan_time_grid(poles, residues, tol=1e-3, max_points=2000, points_per_tau=10,
+                   spacing='auto', t_min=0.1, t_max=1e4):
+    """
+    Simulation horizon and time grid from the modes of one system, or the
+    envelope of a batch (poles/residues of shape (batch, n)).
+
+    End time: when the slowest significant mode falls below tol, relative to
+    each system's largest residue, so every transient term is below tol there.
+    Step: points_per_tau samples per time constant (or radian, if oscillatory)
+    of the fastest mode that is still alive.
+
+    spacing:
+    'uniform'   - one step for the whole horizon
+    'log'       - geometric spacing from the fastest time constant to t_end
+    'piecewise' - uniform segments between the mode horizons, each with the
+                  step required by the modes still alive in it
+    'auto'      - uniform if it fits in max_points, otherwise piecewise
+    When 'uniform' or 'piecewise' need more than max_points samples, the
+    steps are enlarged to fit and a RuntimeWarning reports the samples per
+    time constant actually achieved (below points_per_tau).
+    Returns the time vector t (starting at 0).
+    """
+    poles = np.atleast_2d(poles)
+    residues = np.atleast_2d(residues)
+    finite = np.where(np.isfinite(residues), np.abs(residues), 0.0)
+    scale = np.maximum(np.max(finite, axis=1, keepdims=True), np.finfo(float).tiny)
+    T, significant = mode_horizons(poles, residues, tol * scale)
+
+    t_end = float(np.clip(np.max(T) if T.size else 0.0, t_min, t_max))
+    rate = np.abs(poles)
+    fast = rate[significant]
+    dt_fine = 1.0 / (points_per_tau * fast.max()) if fast.size else t_end / max_points
+
+    n_uniform = int(np.ceil(t_end / dt_fine)) + 1
+    if spacing == 'auto':
+        spacing = 'uniform' if n_uniform <= max_points else 'piecewise'
+
+    if spacing == 'uniform':
+        if n_uniform > max_points:
+            _warn_capped(points_per_tau * (max_points - 1) / (n_uniform - 1), points_per_tau, max_points)
+        return np.linspace(0, t_end, min(n_uniform, max_points))
+    if spacing == 'log':
+        return np.concatenate([[0.0], np.geomspace(dt_fine, t_end, max_points - 1)])
+    if spacing != 'piecewise':
+        raise ValueError(f"spacing must be 'auto', 'uniform', 'log' or 'piecewise', not {spacing!r}")
+
+    # Segment boundaries at the horizons of the significant modes
+    T_sig, rate_sig = T[significant], rate[significant]
+    bounds = np.unique(np.clip(np.concatenate([[0.0, t_end], T_sig]), 0, t_end))
+    seg_dt = []
+    for start in bounds[:-1]:
+        alive = T_sig > start
+        fastest = rate_sig[alive].max() if alive.any() else 1.0 / t_end
+        seg_dt.append(1.0 / (points_per_tau * fastest))
+    seg_len = np.diff(bounds)
+    seg_n = np.ceil(seg_len / np.array(seg_dt)).astype(int)
+
+    # Bound the total number of samples by coarsening every segment equally
+    total = seg_n.sum()
+    if total + 1 > max_points:
+        coarse_n = np.maximum(1, np.floor(seg_n * (max_points - 1) / total)).astype(int)
+        _warn_capped(points_per_tau * np.min(coarse_n / seg_n), points_per_tau, max_points)
+        seg_n = coarse_n
+
+    pieces = [np.linspace(a, b, n, endpoint=False) for a, b, n in zip(bounds[:-1], bounds[1:], seg_n)]
+    return np.concatenate(pieces + [[t_end]])
+
+def plan_for_system(sys, input='step', **kwargs):
+    """
+    Time grid for the step (or ramp) response of a single SISO system.
+    """
+    num, den = tf_to_polys([ct.tf(sys)])
+    poles, residues = input_residues(num, den, input)
+    return plan_time_grid(poles, residues, **kwargs)
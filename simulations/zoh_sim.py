@@ -0,0 +1,89 @@
+import numpy as np
+import control as ct
+from scipy.linalg import expm
+
+# (system key, dt, hold) -> (Ad, Gamma0, Gamma1, C, D)
+_DISCRETE_CACHE = {}
+
+def _system_key(sys):
+    """
+    Hashable key of a SISO system's coefficients (TF or SS).
+    """
+    if isinstance(sys, ct.TransferFunction):
+        num, den = sys.num[0][0], sys.den[0][0]
+        return ('tf', np.asarray(num, dtype=float).tobytes(), np.asarray(den, dtype=float).tobytes())
+    return ('ss',) + tuple(np.asarray(M, dtype=float).tobytes() for M in (sys.A, sys.B, sys.C, sys.D))
+
+def discretize(sys, dt, hold='zoh'):
+    """
+    Exact discretization of sys for a fixed step dt, cached per (system, dt, hold).
+
+    hold='zoh': x[k+1] = Ad x[k] + Gamma0 u[k]                (piecewise-constant u)
+    hold='foh': x[k+1] = Ad x[k] + Gamma0 u[k] + Gamma1 u[k+1] (piecewise-linear u)
+    Both come from a single matrix exponential of an augmented matrix.
+    """
+    key = (_system_key(sys), float(dt), hold)
+    if key in _DISCRETE_CACHE:
+        return _DISCRETE_CACHE[key]
+
+    ss = ct.ss(sys)
+    A, B = np.asarray(ss.A, dtype=float), np.asarray(ss.B, dtype=float)
+    C, D = np.asarray(ss.C, dtype=float), np.asarray(ss.D, dtype=float)
+    n, m = B.shape
+
+    if hold == 'zoh':
+        # expm([[A, B], [0, 0]] * dt) = [[Ad, Bd], [0, I]]
+        M = np.zeros((n + m, n + m))
+        M[:n, :n] = A * dt
+        M[:n, n:] = B * dt
+        Phi = expm(M)
+        Ad, Gamma0, Gamma1 = Phi[:n, :n], Phi[:n, n:], np.zeros((n, m))
+    elif hold == 'foh':
+        # expm([[A*dt, B*dt, 0], [0, 0, I], [0, 0, 0]]) = [[Ad, G1, G2], ...]
+        M = np.zeros((n + 2 * m, n + 2 * m))
+        M[:n, :n] = A * dt
+        M[:n, n:n + m] = B * dt
+        M[n:n + m, n + m:] = np.eye(m)
+        Phi = expm(M)
+        Ad, G1, G2 = Phi[:n, :n], Phi[:n, n:n + m], Phi[:n, n + m:]
+        Gamma0, Gamma1 = G1 - G2, G2
+    else:
+        raise ValueError(f"hold must be 'zoh' or 'foh', not {hold!r}")
+
+    _DISCRETE_CACHE[key] = (Ad, Gamma0, Gamma1, C, D)
+    return _DISCRETE_CACHE[key]
+
+def clear_discretization_cache():
+    _DISCRETE_CACHE.clear()
+
+def forced_response(sys, t, u, hold='zoh'):
+    """
+    Response of a SISO system from zero initial state on a uniform grid t,
+    propagated with plain matrix products. Exact at the samples for
+    piecewise-constant (zoh) or piecewise-linear (foh) inputs.
+    Returns (t, y) like ct.forced_response.
+    """
+    t = np.asarray(t, dtype=float)
+    u = np.broadcast_to(np.asarray(u, dtype=float), t.shape)
+    dt = t[1] - t[0]
+    if not np.allclose(np.diff(t), dt, rtol=1e-6, atol=0):
+        raise ValueError("forced_response needs a uniform time grid")
+
+    Ad, Gamma0, Gamma1, C, D = discretize(sys, dt, hold)
+    g0, g1 = Gamma0[:, 0], Gamma1[:, 0]
+    c, d = C[0], D[0, 0]
+
+    x = np.zeros(Ad.shape[0])
+    X = np.empty((len(t), len(x)))
+    for k in range(len(t)):
+        X[k] = x
+        if k + 1 < len(t):
+            x = Ad @ x + g0 * u[k] + g1 * u[k + 1]
+    y = X @ c + d * u
+    return t, y
+
+def step_response(sys, t):
+    """
+    Unit step response on a uniform grid t (exact, ZOH).
+    """
+    return forced_response(sys, t, 1.0, hold='zoh')